@@ -0,0 +1 @@
+"""Benchmarks for the hot paths of the ESQ robot. Run the modules with python -m benchmarks.<module>."""
@@ -0,0 +1,84 @@
+"""
+Micro-benchmark of answer normalisation: the ast.literal_eval based normaliser used before answer_parsing,
+the dedicated list-literal parser on a cold cache, and the memoised normaliser on a warm cache.
+
+    python -m benchmarks.answer_parsing [value count]
+"""
+
+import ast
+import random
+import sys
+import timeit
+
+from benchmarks import synthetic
+
+from robot_framework.sub_processes import answer_parsing
+
+
+def normalize_literal_eval(value):
+    """The normaliser transform_form_submission used before answer_parsing."""
+
+    if isinstance(value, list):
+        value = ", ".join(str(item) for item in value)
+
+    elif isinstance(value, str):
+        value = value.replace("\r\n", ". ").replace("\n", ". ")
+
+        if value.startswith("[") and value.endswith("]"):
+            try:
+                parsed = ast.literal_eval(value)
+
+                if isinstance(parsed, list):
+                    value = ", ".join(str(item) for item in parsed)
+
+            except Exception:
+                value = value.strip("[]").replace("'", "").replace('"', "").strip()
+
+    return value
+
+
+def make_values(count: int, seed: int = 42) -> list:
+    """A mix of the answers seen in the forms: repeated list-like treatment names, free text and plain answers."""
+
+    rng = random.Random(seed)
+
+    pool = list(synthetic.TREATMENTS) + list(synthetic.FREE_TEXT) + [answer for answer in synthetic.ANSWERS if answer]
+
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def run(count: int = 200000, repeat: int = 3) -> dict:
+    """Time each normaliser over count values and return the best time per normaliser in seconds."""
+
+    values = make_values(count)
+
+    # The normaliser without its LRU cache, to isolate the parser
+    normalize_uncached = answer_parsing.normalize_list_like.__wrapped__
+
+    def uncached(value):
+        value = value.replace("\r\n", ". ").replace("\n", ". ")
+
+        return normalize_uncached(value) if value.startswith("[") and value.endswith("]") else value
+
+    # Warm the cache before timing the memoised normaliser
+    for value in values:
+        answer_parsing.normalize_value(value)
+
+    return {
+        "ast.literal_eval": min(timeit.repeat(lambda: [normalize_literal_eval(value) for value in values], number=1, repeat=repeat)),
+        "parse_list_literal (no cache)": min(timeit.repeat(lambda: [uncached(value) for value in values], number=1, repeat=repeat)),
+        "normalize_value (warm cache)": min(timeit.repeat(lambda: [answer_parsing.normalize_value(value) for value in values], number=1, repeat=repeat)),
+    }
+
+
+if __name__ == "__main__":
+    value_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    results = run(value_count)
+
+    baseline = results["ast.literal_eval"]
+
+    for name, seconds in results.items():
+        print(f"{name:<32} {seconds * 1000:10.1f} ms  {baseline / seconds:6.2f}x")
+
+    print(answer_parsing.normalize_list_like.cache_info())
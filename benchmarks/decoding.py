@@ -0,0 +1,85 @@
+"""
+Benchmark of form_data decoding: the stdlib json path used by get_forms_data before form_decoding, the pluggable
+backend (form_decoding.loads) and the schema-targeted mode (FormSchema.decode).
+
+    python -m benchmarks.decoding [submission count]
+"""
+
+import json
+import sys
+import timeit
+
+from benchmarks import synthetic
+
+from robot_framework.sub_processes import form_decoding
+from robot_framework.sub_processes import formular_mappings
+
+
+def decode_stdlib(rows) -> list[dict]:
+    """The decoding loop get_forms_data used before the decoder abstraction."""
+
+    extracted_data = []
+
+    for row in rows:
+        parsed = json.loads(row.form_data)
+
+        if "purged" not in parsed:
+            extracted_data.append(parsed)
+
+    return extracted_data
+
+
+def decode_backend(rows) -> list[dict]:
+    """The same loop using form_decoding.loads."""
+
+    extracted_data = []
+
+    for row in rows:
+        parsed = form_decoding.loads(row.form_data)
+
+        if "purged" not in parsed:
+            extracted_data.append(parsed)
+
+    return extracted_data
+
+
+def decode_schema(rows, schema: form_decoding.FormSchema) -> list[dict]:
+    """The schema-targeted decoding used by process.process."""
+
+    extracted_data = []
+
+    for row in rows:
+        parsed = schema.decode(row.form_data)
+
+        if parsed is not None:
+            extracted_data.append(parsed)
+
+    return extracted_data
+
+
+def run(count: int = 20000, repeat: int = 3) -> dict:
+    """Time each decoding path over count synthetic rows and return the best time per path in seconds."""
+
+    rows = synthetic.generate_rows(count)
+
+    schema = form_decoding.FormSchema.from_mappings(
+        formular_mappings.center_for_trivsel_esq_barn_mapping,
+        formular_mappings.center_for_trivsel_esq_foraelder_mapping
+    )
+
+    return {
+        "stdlib json": min(timeit.repeat(lambda: decode_stdlib(rows), number=1, repeat=repeat)),
+        f"form_decoding.loads ({form_decoding.JSON_BACKEND})": min(timeit.repeat(lambda: decode_backend(rows), number=1, repeat=repeat)),
+        f"FormSchema.decode ({form_decoding.JSON_BACKEND})": min(timeit.repeat(lambda: decode_schema(rows, schema), number=1, repeat=repeat)),
+    }
+
+
+if __name__ == "__main__":
+    submission_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    results = run(submission_count)
+
+    baseline = results["stdlib json"]
+
+    for name, seconds in results.items():
+        print(f"{name:<40} {seconds * 1000:10.1f} ms  {baseline / seconds:5.2f}x  {submission_count / seconds:12,.0f} rows/s")
@@ -0,0 +1,122 @@
+"""
+Throughput of rendering the daily email bodies: the table_att dicts and += concatenation in format_html_table used
+before email_rendering, against the precompiled section templates rendered in one batch.
+
+    python -m benchmarks.email_rendering [section count]
+"""
+
+import sys
+import timeit
+
+from benchmarks import synthetic
+
+from robot_framework.sub_processes import email_rendering
+from robot_framework.sub_processes import formular_mappings
+
+
+MAPPINGS = {
+    email_rendering.YOUTH_ROLE: formular_mappings.center_for_trivsel_esq_barn_mapping,
+    email_rendering.PARENT_ROLE: formular_mappings.center_for_trivsel_esq_foraelder_mapping,
+}
+
+
+def format_html_table_concatenated(table_att: dict) -> str:
+    """format_html_table as it was before email_rendering."""
+
+    html = '<table border="1" cellpadding="5" cellspacing="0" style="border-collapse: collapse;">\n'
+
+    for key, value in table_att.items():
+        html += f'  <tr><td><strong>{key}</strong></td><td>{value}</td></tr>\n'
+
+    html += '</table>'
+
+    return html
+
+
+def render_with_concatenation(entries_by_cpr: dict) -> dict:
+    """The rendering process.process did before email_rendering."""
+
+    email_bodies = {}
+
+    for cpr, entries in entries_by_cpr.items():
+        sections = []
+
+        for entry in entries:
+            transformed_row = entry["transformed"]
+            role = entry["role"]
+            mapping = MAPPINGS[role]
+
+            table_att = {
+                "Udfyldt": transformed_row["Gennemført"],
+                "Behandling": transformed_row["Behandling"],
+                "Barnets/Den unges navn": transformed_row["Barnets/Den unges navn"],
+                "Barnets/Den unges CPR-nummer": transformed_row["Barnets/Den unges CPR-nummer"],
+                "Barnets/Den unges alder": transformed_row["Barnets/Den unges alder"],
+            }
+
+            if role == email_rendering.PARENT_ROLE:
+                table_att["Forælder navn"] = transformed_row["Navn"]
+                table_att["Forælder cpr-Nummer"] = transformed_row["CPR-nummer"]
+
+                for _, spg in mapping["spoergsmaal_foraelder_tabel"].items():
+                    table_att[spg] = transformed_row.get(spg)
+
+                for text in email_rendering.PARENT_FREE_TEXT:
+                    table_att[text] = transformed_row[text]
+
+            else:
+                for _, spg in mapping["spoergsmaal_barn_tabel"].items():
+                    table_att[spg] = transformed_row.get(spg)
+
+                for text in email_rendering.YOUTH_FREE_TEXT:
+                    table_att[text] = transformed_row[text]
+
+            table_att["Average answer score"] = transformed_row["Average answer score"]
+
+            html_table = format_html_table_concatenated(table_att)
+
+            sections.append(f"<p><strong>Udfylder rolle:</strong> {role}</p><br>{html_table}<br><br>")
+
+        email_bodies[cpr] = f"<p>Ny(e) besvarelse(r) til ESQ formular for barn med CPR: <strong>{cpr}</strong></p>" + "<hr>".join(sections)
+
+    return email_bodies
+
+
+def make_entries(count: int) -> dict:
+    """Transform count synthetic submissions and group them by CPR number like the daily flow."""
+
+    entries_by_cpr = {}
+
+    for submission in synthetic.generate_submissions(count):
+        role = submission["data"]["hvem_udfylder_spoergeskemaet"]
+
+        transformed_row = formular_mappings.transform_form_submission(submission["entity"]["serial"][0]["value"], submission, MAPPINGS[role])
+
+        entries_by_cpr.setdefault(transformed_row["Barnets/Den unges CPR-nummer"], []).append({"transformed": transformed_row, "role": role})
+
+    return entries_by_cpr
+
+
+def run(count: int = 5000, repeat: int = 5) -> dict:
+    """Time both rendering paths over count synthetic sections and return the best time per path in seconds."""
+
+    entries_by_cpr = make_entries(count)
+
+    # Warm the template cache, as a run compiles each role once
+    email_rendering.render_emails(entries_by_cpr)
+
+    return {
+        "table_att + format_html_table": min(timeit.repeat(lambda: render_with_concatenation(entries_by_cpr), number=1, repeat=repeat)),
+        "email_rendering.render_emails": min(timeit.repeat(lambda: email_rendering.render_emails(entries_by_cpr), number=1, repeat=repeat)),
+    }
+
+
+if __name__ == "__main__":
+    section_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    results = run(section_count)
+
+    baseline = results["table_att + format_html_table"]
+
+    for name, seconds in results.items():
+        print(f"{name:<32} {seconds * 1000:8.1f} ms  {section_count / seconds:10.0f} sections/s  {baseline / seconds:6.2f}x")
@@ -0,0 +1,73 @@
+"""
+Peak memory of writing a full-history workbook: DataFrame.to_excel into a BytesIO plus getvalue() (the previous
+create-new path) against the streaming write-only writer.
+
+    python -m benchmarks.excel_writing [submission count]
+"""
+
+import sys
+import time
+import tracemalloc
+
+from io import BytesIO
+
+from benchmarks import synthetic
+
+from robot_framework.sub_processes import excel_writer
+from robot_framework.sub_processes import formular_mappings
+from robot_framework.sub_processes import helper_functions
+from robot_framework.sub_processes import parallel_transform
+
+
+ROLE = "Forælder (inklusiv plejeforældre)"
+MAPPING = formular_mappings.center_for_trivsel_esq_foraelder_mapping
+
+
+def write_with_dataframe(rows) -> int:
+    """The previous create-new path: build a DataFrame, write it to a BytesIO and copy the bytes out."""
+
+    submissions = helper_functions.decode_form_rows(rows)
+    all_submissions_df = helper_functions.build_df(submissions, ROLE, MAPPING)
+
+    excel_stream = BytesIO()
+    all_submissions_df.to_excel(excel_stream, index=False, engine="openpyxl", sheet_name="Besvarelser")
+
+    return len(excel_stream.getvalue())
+
+
+def write_streaming(rows) -> int:
+    """The streaming path: transformed rows go straight into a write-only sheet spooled to a temporary file."""
+
+    workbook_file = excel_writer.write_workbook(parallel_transform.iter_transformed_rows(rows, ROLE, MAPPING, workers=1))
+
+    size = len(workbook_file.read())
+
+    workbook_file.close()
+
+    return size
+
+
+def measure(function, rows) -> tuple[float, float]:
+    """Return (seconds, peak traced memory in MB) for one call."""
+
+    tracemalloc.start()
+
+    start = time.perf_counter()
+    function(rows)
+    seconds = time.perf_counter() - start
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return seconds, peak / 1024 / 1024
+
+
+if __name__ == "__main__":
+    submission_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    raw_rows = synthetic.generate_rows(submission_count)
+
+    for name, writer in (("DataFrame.to_excel", write_with_dataframe), ("excel_writer.write_workbook", write_streaming)):
+        elapsed, peak_mb = measure(writer, raw_rows)
+
+        print(f"{name:<30} {elapsed:8.2f} s  peak {peak_mb:8.1f} MB")
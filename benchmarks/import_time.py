@@ -0,0 +1,143 @@
+"""
+Import-time check for robot start-up.
+
+Imports robot_framework.linear_framework - everything "python -m robot_framework" loads before the robot starts
+working - in a fresh interpreter with -X importtime, and reports:
+
+    the time the import took (the median of --repeat fresh interpreters)
+    the packages that took the longest, by the import time of all their modules
+    every package in config.LAZY_IMPORTS that was imported anyway
+
+Which modules were imported is read from sys.modules in that interpreter - the -X importtime table also lists
+imports that failed, such as the optional pyarrow import of parquet_archive, and is only used for the timings.
+
+    python -m benchmarks.import_time [--budget 1.5] [--repeat 3] [--top 15]
+
+The exit code is 1 if the import takes longer than the budget (config.IMPORT_TIME_BUDGET_SECONDS by default) or
+pulls in a package that should be loaded lazily. tests/test_import_time.py runs the same check in the test suite.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from dataclasses import dataclass
+
+from robot_framework import config
+
+
+ENTRY_MODULE = "robot_framework.linear_framework"
+
+# Prints the wall time of the import and the imported modules as JSON on stdout - -X importtime writes its table to stderr
+IMPORT_SCRIPT = (
+    "import json, sys, time; started = time.perf_counter(); "
+    f"import {ENTRY_MODULE}; "
+    "print(json.dumps({'seconds': time.perf_counter() - started, 'modules': sorted(sys.modules)}))"
+)
+
+
+@dataclass
+class Measurement:
+    """
+    One import of the robot - the wall time in seconds, the modules in sys.modules afterwards and the self time in
+    microseconds of each of those modules.
+    """
+
+    seconds: float
+    modules: set[str]
+    module_times: dict[str, int]
+
+
+def measure() -> Measurement:
+    """Import the robot in a fresh interpreter."""
+
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_SCRIPT], capture_output=True, text=True, check=False)
+
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {ENTRY_MODULE} failed:\n{completed.stderr[-2000:]}")
+
+    module_times = {}
+
+    for line in completed.stderr.splitlines():
+        # import time:       self [us] |  cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+
+        self_time, _, module = line[len("import time:"):].split("|")
+
+        if not self_time.strip().isdigit():
+            continue
+
+        module_times[module.strip()] = int(self_time)
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    modules = set(result["modules"])
+
+    # Failed imports have a row in the table too, but are not in sys.modules
+    return Measurement(
+        seconds=result["seconds"],
+        modules=modules,
+        module_times={module: self_time for module, self_time in module_times.items() if module in modules}
+    )
+
+
+def time_by_package(module_times: dict[str, int]) -> dict[str, int]:
+    """Sum the self time of every module per top-level package."""
+
+    packages = {}
+
+    for module, self_time in module_times.items():
+        package = module.split(".")[0]
+
+        packages[package] = packages.get(package, 0) + self_time
+
+    return packages
+
+
+def lazy_violations(modules, lazy_imports=config.LAZY_IMPORTS) -> list[str]:
+    """The packages of lazy_imports that are among the imported modules."""
+
+    return [
+        package for package in lazy_imports
+        if any(module == package or module.startswith(f"{package}.") for module in modules)
+    ]
+
+
+def main(argv=None) -> int:
+    """Run the check from the command line and return the exit code."""
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.import_time", description="Check the import time of robot start-up.")
+    parser.add_argument("--budget", type=float, default=config.IMPORT_TIME_BUDGET_SECONDS, help="allowed import time in seconds")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters to measure - the median is used")
+    parser.add_argument("--top", type=int, default=15, help="packages to list by import time")
+
+    arguments = parser.parse_args(argv)
+
+    measurements = [measure() for _ in range(max(1, arguments.repeat))]
+
+    seconds = statistics.median(measurement.seconds for measurement in measurements)
+
+    # The last run - the first one may include writing the .pyc files
+    last = measurements[-1]
+
+    print(f"Importing {ENTRY_MODULE} took {seconds:.3f}s (budget {arguments.budget:.3f}s), {len(last.modules)} modules.")
+
+    for package, self_time in sorted(time_by_package(last.module_times).items(), key=lambda item: item[1], reverse=True)[:arguments.top]:
+        print(f"  {package:<40} {self_time / 1000:8.1f} ms")
+
+    violations = lazy_violations(last.modules)
+
+    for package in violations:
+        print(f"'{package}' is imported at start-up, but should only be imported where it is used.")
+
+    if seconds > arguments.budget:
+        print(f"Start-up imports are {seconds - arguments.budget:.3f}s over the budget.")
+
+    return 1 if violations or seconds > arguments.budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
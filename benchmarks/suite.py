@@ -0,0 +1,279 @@
+"""
+Benchmark suite for the ESQ hot paths, with a machine-readable baseline for regression checks.
+
+For every size, synthetic submissions (see benchmarks.synthetic) are written to a local SQLite stand-in for the Forms
+table and read back through the robot's own reader. The cases are:
+
+    get_forms_data            reading and decoding every row (iter_forms_data, which get_forms_data collects)
+    transform_form_submission transforming every decoded submission with its role's mapping
+    build_df                  helper_functions.build_df for both roles, row-wise
+    build_df_columnar         helper_functions.build_df for both roles, columnar
+    format_html_table         rendering the email table of every transformed submission
+    group_by_cpr              the transform and group-by-CPR loop of the daily email flow
+
+Decoded submissions are streamed from SQLite in chunks of --chunk-size, and every case except get_forms_data is timed
+per chunk and summed, so a million submissions never have to be held in memory at once.
+
+    python -m benchmarks.suite [--sizes 1000,100000,1000000] [--output baseline.json]
+    python -m benchmarks.suite --sizes 1000,100000 --compare baseline.json [--tolerance 0.2]
+
+With --compare, every case that is more than --tolerance slower than in the baseline is reported, and the exit code
+is 1 if there are any.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+
+from datetime import datetime
+
+from benchmarks import synthetic
+
+from robot_framework.sub_processes import email_pipeline
+from robot_framework.sub_processes import form_decoding
+from robot_framework.sub_processes import formular_mappings
+from robot_framework.sub_processes import helper_functions
+
+
+FORM_TYPE = "center_for_trivsel_esq_formular"
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+DEFAULT_CHUNK_SIZE = 50000
+
+ROLE_MAPPINGS = formular_mappings.ROLE_MAPPINGS
+
+SCHEMA = form_decoding.FormSchema.from_mappings(*ROLE_MAPPINGS.values())
+
+
+def forms_database(size: int, data_dir: str, seed: int = 42) -> str:
+    """
+    Return the path of a SQLite file with size synthetic rows in a Forms table, generating it if it does not exist.
+    """
+
+    path = os.path.join(data_dir, f"forms_{size}_{seed}.sqlite3")
+
+    if os.path.exists(path):
+        return path
+
+    temporary_path = f"{path}.tmp"
+
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+
+    with sqlite3.connect(temporary_path) as connection:
+        connection.execute("CREATE TABLE Forms (form_id TEXT, form_type TEXT, form_data TEXT, form_submitted_date TEXT)")
+
+        rows = synthetic.iter_rows(size, seed=seed)
+
+        while batch := list(itertools.islice(rows, 10000)):
+            connection.executemany(
+                "INSERT INTO Forms VALUES (?, ?, ?, ?)",
+                [(row.form_id, FORM_TYPE, row.form_data, row.form_submitted_date.isoformat(sep=" ")) for row in batch]
+            )
+
+        connection.execute("CREATE INDEX ix_forms_type_date ON Forms (form_type, form_submitted_date)")
+
+    os.replace(temporary_path, path)
+
+    return path
+
+
+def iter_submission_chunks(conn_string: str, chunk_size: int):
+    """Yield the schema-decoded submissions in lists of at most chunk_size."""
+
+    chunk = []
+
+    for batch in helper_functions.iter_form_rows(conn_string, FORM_TYPE):
+        chunk.extend(helper_functions.decode_form_rows(batch, schema=SCHEMA))
+
+        if len(chunk) >= chunk_size:
+            yield chunk
+
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def time_get_forms_data(conn_string: str) -> tuple[float, int]:
+    """Read and fully decode every row."""
+
+    started = time.perf_counter()
+
+    count = sum(1 for _ in helper_functions.iter_forms_data(conn_string, FORM_TYPE))
+
+    return time.perf_counter() - started, count
+
+
+def transform_chunk(submissions: list[dict]) -> list[dict]:
+    """transform_form_submission for every submission, with its role's mapping."""
+
+    return [
+        transformed_row
+        for role, mapping in ROLE_MAPPINGS.items()
+        for transformed_row in helper_functions.transform_submissions(submissions, role, mapping)
+    ]
+
+
+def build_df_chunk(submissions: list[dict], columnar: bool) -> int:
+    """build_df for both roles."""
+
+    return sum(len(helper_functions.build_df(submissions, role, mapping, columnar=columnar)) for role, mapping in ROLE_MAPPINGS.items())
+
+
+def format_tables_chunk(transformed_rows: list[dict]) -> int:
+    """format_html_table over every transformed row."""
+
+    return sum(len(helper_functions.format_html_table(transformed_row)) for transformed_row in transformed_rows)
+
+
+def group_by_cpr_chunk(submissions: list[dict], forms_by_cpr: dict) -> None:
+    """The transform and group-by-CPR loop of the daily email flow."""
+
+    for submission in submissions:
+        entry = email_pipeline.email_entry(submission, lambda transformed_row: "center_for_trivsel@example.dk")
+
+        if entry is not None:
+            cpr, email_entry = entry
+
+            forms_by_cpr.setdefault(cpr, []).append(email_entry)
+
+
+def run_size(size: int, data_dir: str, chunk_size: int) -> dict[str, dict]:
+    """Run every case for one size and return {case: {"seconds": ..., "items": ...}}."""
+
+    conn_string = f"sqlite:///{forms_database(size, data_dir)}"
+
+    seconds, count = time_get_forms_data(conn_string)
+
+    timings = {"get_forms_data": [seconds, count]}
+
+    for name in ("transform_form_submission", "build_df", "build_df_columnar", "format_html_table", "group_by_cpr"):
+        timings[name] = [0.0, 0]
+
+    forms_by_cpr = {}
+
+    for submissions in iter_submission_chunks(conn_string, chunk_size):
+        started = time.perf_counter()
+        transformed_rows = transform_chunk(submissions)
+        timings["transform_form_submission"][0] += time.perf_counter() - started
+        timings["transform_form_submission"][1] += len(submissions)
+
+        for name, columnar in (("build_df", False), ("build_df_columnar", True)):
+            started = time.perf_counter()
+            build_df_chunk(submissions, columnar)
+            timings[name][0] += time.perf_counter() - started
+            timings[name][1] += len(submissions)
+
+        started = time.perf_counter()
+        format_tables_chunk(transformed_rows)
+        timings["format_html_table"][0] += time.perf_counter() - started
+        timings["format_html_table"][1] += len(transformed_rows)
+
+        started = time.perf_counter()
+        group_by_cpr_chunk(submissions, forms_by_cpr)
+        timings["group_by_cpr"][0] += time.perf_counter() - started
+        timings["group_by_cpr"][1] += len(submissions)
+
+    return {
+        name: {"seconds": round(seconds, 6), "items": items, "items_per_second": round(items / seconds, 1) if seconds else None}
+        for name, (seconds, items) in timings.items()
+    }
+
+
+def run(sizes, data_dir: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """Run the suite and return the baseline document."""
+
+    # Point the reader at the Forms table of the SQLite stand-in
+    helper_functions.FORMS_TABLE = "Forms"
+
+    results = {}
+
+    for size in sizes:
+        print(f"Running {size} submissions...")
+
+        results[str(size)] = run_size(size, data_dir, chunk_size)
+
+        for name, result in results[str(size)].items():
+            print(f"  {name:<28} {result['seconds']:10.3f} s  {result['items_per_second'] or 0:12,.0f} items/s")
+
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "json_backend": form_decoding.JSON_BACKEND,
+            "chunk_size": chunk_size,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return a line per case and size that is more than tolerance slower than in the baseline."""
+
+    regressions = []
+
+    for size, cases in current["results"].items():
+        for name, result in cases.items():
+            previous = baseline["results"].get(size, {}).get(name)
+
+            if previous is None or not previous["seconds"]:
+                continue
+
+            ratio = result["seconds"] / previous["seconds"]
+
+            if ratio > 1 + tolerance:
+                regressions.append(f"{name} at {size}: {previous['seconds']:.3f} s -> {result['seconds']:.3f} s ({ratio:.2f}x)")
+
+    return regressions
+
+
+def main(argv=None) -> int:
+    """Run the suite from the command line and return the exit code."""
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description="Benchmark the ESQ hot paths on synthetic data.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES), help="comma separated submission counts")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="decoded submissions per timed chunk")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "esq_benchmarks"), help="folder for the generated SQLite files, reused between runs")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare the results with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline, e.g. 0.2 for 20%%")
+
+    arguments = parser.parse_args(argv)
+
+    os.makedirs(arguments.data_dir, exist_ok=True)
+
+    current = run([int(size) for size in arguments.sizes.split(",")], arguments.data_dir, arguments.chunk_size)
+
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as output_file:
+            json.dump(current, output_file, indent=2)
+
+        print(f"Results written to '{arguments.output}'.")
+
+    if arguments.compare:
+        with open(arguments.compare, encoding="utf-8") as baseline_file:
+            regressions = compare(current, json.load(baseline_file), arguments.tolerance)
+
+        if regressions:
+            print(f"{len(regressions)} case(s) slower than the baseline by more than {arguments.tolerance:.0%}:")
+
+            for line in regressions:
+                print(f"  {line}")
+
+            return 1
+
+        print(f"No case is slower than the baseline by more than {arguments.tolerance:.0%}.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Seeded generator of synthetic ESQ submissions.
+
+The documents mimic the OS2Forms payloads stored in form_data: both roles, the nested spoergsmaal_*_tabel answers,
+list-like answer strings, free text with newlines, webform fields the mappings do not read, and purged entries.
+"""
+
+import json
+import random
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from robot_framework.sub_processes import formular_mappings
+
+
+SyntheticRow = namedtuple("SyntheticRow", ["form_id", "form_data", "form_submitted_date"])
+
+ROLES = ("Ung/selvbesvarelse", "Forælder (inklusiv plejeforældre)")
+
+ANSWERS = ("Ikke sandt", "Delvist sandt", "Sandt", "Ved ikke", None)
+
+TREATMENTS = (
+    "Individuel samtale",
+    "['Forældresamtale', 'Familiesamtale']",
+    "['Gruppeforløb']",
+    "Netværksmøde",
+    "['Individuel samtale', 'Forældresamtale', 'Skolesamarbejde']",
+)
+
+FREE_TEXT = (
+    "",
+    "Det var rigtig godt.",
+    "Behandleren lyttede.\r\nVi fik redskaber vi kan bruge derhjemme.",
+    "Ventetiden var lang.\nMen forløbet var godt.\nTak for hjælpen.",
+    "[Ingen kommentarer]",
+)
+
+START = datetime(2021, 1, 1, 8, 0, 0)
+
+
+def _entity(rng: random.Random, serial: int, submitted: datetime) -> dict:
+    """The entity part of a submission, including the fields the robot never reads."""
+
+    created = submitted - timedelta(minutes=rng.randint(2, 40))
+
+    return {
+        "uuid": [{"value": f"{rng.getrandbits(128):032x}"}],
+        "langcode": [{"value": "da"}],
+        "serial": [{"value": serial}],
+        "sid": [{"value": serial + 100000}],
+        "uri": [{"value": "/form/center-for-trivsel-esq"}],
+        "created": [{"value": created.isoformat() + "+02:00"}],
+        "completed": [{"value": submitted.isoformat() + "+02:00"}],
+        "changed": [{"value": submitted.isoformat() + "+02:00"}],
+        "in_draft": [{"value": False}],
+        "current_page": [],
+        "remote_addr": [{"value": "10.0.0.1"}],
+        "uid": [{"target_id": 0}],
+        "webform_id": [{"target_id": "center_for_trivsel_esq_formular"}],
+        "entity_type": [],
+        "entity_id": [],
+        "locked": [{"value": False}],
+        "sticky": [{"value": False}],
+        "notes": [{"value": ""}],
+    }
+
+
+def _answers(rng: random.Random, mapping: dict, table_key: str) -> dict:
+    """Answers for one of the nested spoergsmaal tables."""
+
+    return {question_key: rng.choice(ANSWERS) for question_key in mapping[table_key]}
+
+
+def _cpr(rng: random.Random) -> str:
+    return f"{rng.randint(1, 28):02d}{rng.randint(1, 12):02d}{rng.randint(0, 99):02d}{rng.randint(0, 9999):04d}"
+
+
+def make_submission(rng: random.Random, serial: int, submitted: datetime) -> dict:
+    """Build one non-purged submission document."""
+
+    role = rng.choice(ROLES)
+
+    data = {
+        "az": f"AZ{rng.randint(10000, 99999)}",
+        "hvem_udfylder_spoergeskemaet": role,
+        "behandling": rng.choice(TREATMENTS),
+        "beregnet_alder": str(rng.randint(6, 17)),
+        "samtykke": ["Jeg giver samtykke"],
+        "kommune": "Aarhus",
+        "adresse": {"street": "Testvej", "number": str(rng.randint(1, 200)), "postal_code": "8000"},
+        "actions": "submit",
+    }
+
+    if role == ROLES[0]:
+        mapping = formular_mappings.center_for_trivsel_esq_barn_mapping
+
+        data["navn_manuelt"] = f"Ung {serial}"
+        data["cpr_nummer_manuelt"] = _cpr(rng)
+        data["spoergsmaal_barn_tabel"] = _answers(rng, mapping, "spoergsmaal_barn_tabel")
+        data["her_er_plads_til_at_du_kan_skrive_hvad_du_taenker_eller_foeler_o"] = rng.choice(FREE_TEXT)
+
+    else:
+        mapping = formular_mappings.center_for_trivsel_esq_foraelder_mapping
+
+        data["navn_manuelt"] = f"Forælder {serial}"
+        data["cpr_nummer_manuelt"] = _cpr(rng)
+        data["barnets_navn_manuelt"] = f"Barn {serial}"
+        data["cpr_nummer_barnet_manuelt"] = _cpr(rng)
+        data["spoergsmaal_foraelder_tabel"] = _answers(rng, mapping, "spoergsmaal_foraelder_tabel")
+        data["hvad_var_rigtig_godt_ved_forloebet"] = rng.choice(FREE_TEXT)
+        data["var_der_noget_du_ikke_syntes_om_eller_noget_der_kan_forbedres"] = rng.choice(FREE_TEXT)
+        data["er_der_andet_du_oensker_at_fortaelle_os_om_det_forloeb_du_har_haft"] = rng.choice(FREE_TEXT)
+
+    return {
+        "entity": _entity(rng, serial, submitted),
+        "data": data,
+    }
+
+
+def iter_rows(count: int, seed: int = 42, purged_ratio: float = 0.02) -> Iterator[SyntheticRow]:
+    """
+    Yield count raw (form_id, form_data, form_submitted_date) rows, oldest first, without holding them in memory.
+    """
+
+    rng = random.Random(seed)
+
+    for serial in range(1, count + 1):
+        submitted = START + timedelta(minutes=serial * 7)
+
+        if rng.random() < purged_ratio:
+            document = {"purged": submitted.isoformat()}
+
+        else:
+            document = make_submission(rng, serial, submitted)
+
+        yield SyntheticRow(str(serial), json.dumps(document, ensure_ascii=False), submitted)
+
+
+def generate_rows(count: int, seed: int = 42, purged_ratio: float = 0.02) -> list:
+    """
+    Generate count raw (form_id, form_data, form_submitted_date) rows, newest first, like helper_functions.iter_form_rows.
+    """
+
+    rows = list(iter_rows(count, seed=seed, purged_ratio=purged_ratio))
+
+    rows.reverse()
+
+    return rows
+
+
+def generate_submissions(count: int, seed: int = 42) -> list[dict]:
+    """Generate count decoded, non-purged submission documents, newest first."""
+
+    return [json.loads(row.form_data) for row in generate_rows(count, seed=seed, purged_ratio=0.0)]
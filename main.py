@@ -1,17 +1,133 @@
 """The main file of the robot which will install all requirements in
 a virtual environment and then start the actual process.
+
+Creating the virtual environment and installing every dependency takes tens of seconds, so it is only done when
+needed. After a successful install, the hashes of the dependencies (pyproject.toml and the Python version) and of the
+robot's own code are stored inside the virtual environment. On the next start:
+
+    both hashes match      -> the virtual environment is used as is
+    only the code changed  -> the robot is reinstalled without its dependencies (pip install --no-deps .)
+    the dependencies changed, or the environment is missing or broken -> it is deleted and built from scratch
+
+The time the bootstrap took is printed before the robot starts.
 """
 
-import subprocess
+import hashlib
+import json
 import os
+import shutil
+import subprocess
 import sys
+import time
+
+VENV_FOLDER = ".venv"
+STAMP_FILE = "robot_bootstrap.json"
+
+# Everything setuptools builds the robot from, besides pyproject.toml
+CODE_FOLDERS = ("robot_framework",)
+
+SCRIPTS_FOLDER = "Scripts" if os.name == "nt" else "bin"
+
+
+def dependency_hash() -> str:
+    """Hash of what the installed dependencies depend on - pyproject.toml and the Python version."""
+
+    digest = hashlib.sha256()
+
+    with open("pyproject.toml", "rb") as pyproject:
+        digest.update(pyproject.read())
+
+    digest.update(sys.version.encode())
+
+    return digest.hexdigest()
+
+
+def code_hash() -> str:
+    """Hash of the path and content of every source file of the robot."""
+
+    digest = hashlib.sha256()
+
+    for folder in CODE_FOLDERS:
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = sorted(directory for directory in dirs if directory != "__pycache__")
+
+            for file_name in sorted(files):
+                if file_name.endswith((".pyc", ".pyo")):
+                    continue
+
+                path = os.path.join(root, file_name)
+
+                digest.update(path.replace(os.sep, "/").encode())
+
+                with open(path, "rb") as source:
+                    digest.update(source.read())
+
+    return digest.hexdigest()
+
+
+def read_stamp() -> dict:
+    """The hashes stored by the last successful install, or {} if there are none."""
+
+    try:
+        with open(os.path.join(VENV_FOLDER, STAMP_FILE), encoding="utf-8") as stamp:
+            return json.load(stamp)
+
+    except (OSError, ValueError):
+        return {}
+
+
+def write_stamp(hashes: dict) -> None:
+    """Store the hashes inside the virtual environment, through a temporary file."""
+
+    path = os.path.join(VENV_FOLDER, STAMP_FILE)
+
+    with open(f"{path}.tmp", "w", encoding="utf-8") as stamp:
+        json.dump(hashes, stamp)
+
+    os.replace(f"{path}.tmp", path)
+
+
+def bootstrap() -> str:
+    """Make sure the virtual environment is up to date and return what was done."""
+
+    venv_python = os.path.join(VENV_FOLDER, SCRIPTS_FOLDER, "python")
+    venv_pip = os.path.join(VENV_FOLDER, SCRIPTS_FOLDER, "pip")
+
+    hashes = {"dependencies": dependency_hash(), "code": code_hash()}
+
+    stamp = read_stamp()
+
+    venv_exists = os.path.exists(f"{venv_python}.exe" if os.name == "nt" else venv_python)
+
+    if venv_exists and stamp == hashes:
+        return "reused the virtual environment"
+
+    if venv_exists and stamp.get("dependencies") == hashes["dependencies"]:
+        subprocess.run([venv_pip, "install", "--no-deps", "."], check=True)
+        action = "reinstalled the robot"
+
+    else:
+        shutil.rmtree(VENV_FOLDER, ignore_errors=True)
+
+        subprocess.run([sys.executable, "-m", "venv", VENV_FOLDER], check=True)
+        subprocess.run([venv_pip, "install", "."], check=True)
+        action = "rebuilt the virtual environment"
+
+    write_stamp(hashes)
+
+    return action
+
+
+if __name__ == "__main__":
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(script_directory)
+
+    started = time.perf_counter()
 
-script_directory = os.path.dirname(os.path.realpath(__file__))
-os.chdir(script_directory)
+    bootstrap_action = bootstrap()
 
-subprocess.run("python -m venv .venv", check=True)
-subprocess.run(r'.venv\Scripts\pip install .', check=True)
+    print(f"Bootstrap {bootstrap_action} in {time.perf_counter() - started:.2f}s.")
 
-command_args = [r".venv\Scripts\python", "-m", "robot_framework"] + sys.argv[1:]
+    command_args = [os.path.join(VENV_FOLDER, SCRIPTS_FOLDER, "python"), "-m", "robot_framework"] + sys.argv[1:]
 
-subprocess.run(command_args, check=True)
+    subprocess.run(command_args, check=True)
@@ -11,12 +11,99 @@ SMTP_SERVER = "smtp.adm.aarhuskommune.dk"
 SMTP_PORT = 25
 SCREENSHOT_SENDER = "robot@friend.dk"
 
+# Error screenshots are downscaled to fit within SCREENSHOT_MAX_SIZE and attached in SCREENSHOT_FORMAT. The reports are
+# sent in the background - clean_up at the end of the run waits up to SCREENSHOT_FLUSH_TIMEOUT_SECONDS for them.
+SCREENSHOT_MAX_SIZE = (1280, 1280)
+SCREENSHOT_FORMAT = "JPEG"
+SCREENSHOT_QUALITY = 70
+SCREENSHOT_FLUSH_TIMEOUT_SECONDS = 30
+
+# Database connection pool config
+DB_POOL_SIZE = 2
+DB_POOL_MAX_OVERFLOW = 2
+DB_POOL_PRE_PING = True
+DB_POOL_RECYCLE_SECONDS = 1800
+
+# Local submission cache config
+# The cache stores raw form_data - CPR numbers and answers - unencrypted, so it is opt-in. Only enable it with
+# SUBMISSION_CACHE_PATH on an encrypted volume that only the robot's account can read (see submission_cache).
+# The path is relative to the robot's folder, which main.py makes the working directory.
+SUBMISSION_CACHE_ENABLED = False
+SUBMISSION_CACHE_PATH = ".cache/esq_submissions.sqlite3"
+# Rows submitted up to this many days before the high-water mark are fetched again on every sync, to catch late journalizing
+SUBMISSION_CACHE_OVERLAP_DAYS = 7
+# Days between full-history scans for submissions purged after they were cached - None never scans
+SUBMISSION_CACHE_RECONCILE_INTERVAL_DAYS = 30
+
+# The submissions of a run are spooled to a private folder, readable by the robot's account only, that is deleted when
+# the run ends (see run_plan.SubmissionsSnapshot). The spool holds raw form_data, so point this at a folder on an
+# encrypted volume to keep it out of the system temp folder - None uses the system temp folder.
+SNAPSHOT_SPOOL_FOLDER = None
+
+# Parallel transform config for full-history workbook rebuilds
+# None uses one worker per CPU core
+TRANSFORM_WORKERS = None
+TRANSFORM_CHUNK_SIZE = 2000
+# Inputs smaller than this are transformed serially, as starting the pool would cost more than it saves
+TRANSFORM_MIN_PARALLEL_ROWS = 20000
+
+# Workbooks written by the streaming Excel writer move from memory to a temporary file past this size
+EXCEL_SPOOL_THRESHOLD_BYTES = 16 * 1024 * 1024
+
+# SharePoint upload config
+# Files larger than this are uploaded in chunks through an upload session
+UPLOAD_CHUNK_THRESHOLD_BYTES = 8 * 1024 * 1024
+UPLOAD_CHUNK_SIZE_BYTES = 4 * 1024 * 1024
+# Number of attempts per chunk, and the delay before the first retry (doubled for every further retry)
+UPLOAD_CHUNK_ATTEMPTS = 4
+UPLOAD_RETRY_DELAY_SECONDS = 2
+
+# Workbook layout - "single" keeps the whole history in one workbook per role, "year" or "month" splits each workbook
+# into one file per period plus an index workbook, so the monthly update only touches the newest partition
+WORKBOOK_LAYOUT = "single"
+
+# Parquet archive of transformed submissions, partitioned by role and month - requires the optional pyarrow dependency.
+# It is opt-in: it holds personal data, so enable it only with an absolute path to a folder that is protected and backed up
+PARQUET_ARCHIVE_ENABLED = False
+PARQUET_ARCHIVE_PATH = None
+
+# Daily email flow - number of concurrent SMTP connections, attempts per message (each on a fresh connection) and socket timeout
+MAIL_CONNECTIONS = 1
+MAIL_SEND_ATTEMPTS = 2
+MAIL_TIMEOUT_SECONDS = 30
+# Run the daily email flow as an asyncio pipeline instead of step by step - can also be set with the
+# "async_email_pipeline" process argument. MAIL_CONNECTIONS is the pipeline's send concurrency.
+EMAIL_PIPELINE_ENABLED = False
+EMAIL_PIPELINE_QUEUE_SIZE = 64
+EMAIL_PIPELINE_FETCH_BATCH_SIZE = 100
+
+# Send each submission to the approved email of its AZ-ident from "Godkendte emails.xlsx" instead of to the
+# center_for_trivsel_mail constant, which stays the recipient of AZ-idents without an approved email
+APPROVED_EMAILS_ROUTING_ENABLED = False
+# Parsed "Godkendte emails.xlsx" index, reused while the workbook's SharePoint ETag is unchanged
+APPROVED_EMAILS_CACHE_PATH = ".cache/approved_emails.json"
+
+# Output folder and tracemalloc stack depth for the opt-in "profile" process argument ("cprofile" or "tracemalloc")
+PROFILE_OUTPUT_FOLDER = "profiles"
+TRACEMALLOC_FRAMES = 1
+
+# Import-time budget for robot start-up, checked by benchmarks.import_time and tests/test_import_time.py, and the heavy
+# packages start-up must not import - they are loaded where they are used
+IMPORT_TIME_BUDGET_SECONDS = 1.5
+LAZY_IMPORTS = ("pandas", "numpy", "PIL", "pyarrow", "openpyxl", "office365", "mbu_dev_shared_components.msoffice365")
+
+# Number of distinct list-like answer strings kept by the answer normaliser's LRU cache
+ANSWER_PARSE_CACHE_SIZE = 4096
+
 # Constant/Credential names
 ERROR_EMAIL = "Error Email"
 
 SERVICE_NOW_API_DEV_USER = "service_now_dev_user"
 SERVICE_NOW_API_PROD_USER = "service_now_prod_user"
 
+# Seconds before a cached constant or credential is fetched again - None keeps it for the whole run
+RUN_CACHE_TTL_SECONDS = None
+
 # Queue specific configs
 # ----------------------
 
@@ -1,45 +1,78 @@
-"""This module has functionality to send error screenshots via smtp."""
+"""This module has functionality to send error screenshots via smtp.
 
-import smtplib
-from email.message import EmailMessage
-import base64
+The screenshot is taken when the error is reported, so it shows the screen as the error left it. Downscaling,
+encoding and sending then happen on a background thread, so the robot's next retry does not wait for the SMTP server.
+The screenshot is sent as an attachment in the configured size and format (config.SCREENSHOT_*) instead of a
+full-resolution PNG inlined in the HTML body. Reports still being sent are waited for, with a timeout, by flush.
+"""
+
+import threading
+import time
 import traceback
-from io import BytesIO
 
-from PIL import ImageGrab
+from dataclasses import dataclass
+from email.message import EmailMessage
+from html import escape
+from io import BytesIO
+from typing import Callable
 
 from robot_framework import config
+from robot_framework.sub_processes.mail_dispatcher import SmtpSettings
 
 
-def send_error_screenshot(to_address: str | list[str], exception: Exception, process_name: str):
-    """Sends an email with an error report, including a screenshot, when an exception occurs.
-    Configuration details such as SMTP server, port, sender email, etc., should be set in 'config' module.
+@dataclass(frozen=True)
+class ScreenshotSettings:
+    """The size, format and quality screenshots are attached in."""
+
+    max_size: tuple[int, int] = config.SCREENSHOT_MAX_SIZE
+    image_format: str = config.SCREENSHOT_FORMAT
+    quality: int = config.SCREENSHOT_QUALITY
+
+
+def grab_screenshot():
+    """Take a screenshot of the whole screen as a PIL image."""
+
+    # PIL is only imported once there is an error to report
+    from PIL import ImageGrab  # pylint: disable=import-outside-toplevel
+
+    return ImageGrab.grab()
+
+
+def encode_screenshot(
+    image,
+    max_size: tuple[int, int] = config.SCREENSHOT_MAX_SIZE,
+    image_format: str = config.SCREENSHOT_FORMAT,
+    quality: int = config.SCREENSHOT_QUALITY
+) -> bytes:
+    """Downscale the image to fit within max_size, keeping its aspect ratio, and encode it in image_format."""
+
+    image.thumbnail(max_size)
+
+    # JPEG has no alpha channel
+    if image_format.upper() == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, quality=quality, optimize=True)
+
+    return buffer.getvalue()
+
+
+def build_error_email(to_address: str | list[str], sender: str, process_name: str, exception: Exception, trace: str, screenshot: bytes | None, image_format: str) -> EmailMessage:
+    """Build the error report with the screenshot, if any, as an attachment."""
 
-    Args:
-        to_address: Email address or list of addresses to send the error report.
-        exception: The exception that triggered the error.
-        process_name: Name of the process from OpenOrchestrator.
-    """
-    # Create message
     msg = EmailMessage()
     msg['to'] = to_address
-    msg['from'] = config.SCREENSHOT_SENDER
+    msg['from'] = sender
     msg['subject'] = f"Error screenshot: {process_name}"
 
-    # Take screenshot and convert to base64
-    screenshot = ImageGrab.grab()
-    buffer = BytesIO()
-    screenshot.save(buffer, format='PNG')
-    screenshot_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-
-    # Create an HTML message with the exception and screenshot
     html_message = f"""
     <html>
         <body>
-            <p>Error type: {type(exception).__name__}</p>
-            <p>Error message: {exception}</p>
-            <p>{traceback.format_exc()}</p>
-            <img src="data:image/png;base64,{screenshot_base64}" alt="Screenshot">
+            <p>Error type: {escape(type(exception).__name__)}</p>
+            <p>Error message: {escape(str(exception))}</p>
+            <pre>{escape(trace)}</pre>
+            <p>{"The screenshot is attached." if screenshot else "No screenshot could be taken."}</p>
         </body>
     </html>
     """
@@ -47,7 +80,128 @@ def send_error_screenshot(to_address: str | list[str], exception: Exception, pro
     msg.set_content("Please enable HTML to view this message.")
     msg.add_alternative(html_message, subtype='html')
 
-    # Send message
-    with smtplib.SMTP(config.SMTP_SERVER, config.SMTP_PORT) as smtp:
-        smtp.starttls()
-        smtp.send_message(msg)
+    if screenshot:
+        subtype = image_format.lower()
+
+        msg.add_attachment(screenshot, maintype="image", subtype=subtype, filename=f"screenshot.{'jpg' if subtype == 'jpeg' else subtype}")
+
+    return msg
+
+
+class ErrorReporter:
+    """
+    Sends error reports with a screenshot on background threads. Each report uses its own SMTP connection, as reports
+    are rare and may overlap.
+    """
+
+    def __init__(
+        self,
+        smtp: SmtpSettings = SmtpSettings(server=config.SMTP_SERVER, port=config.SMTP_PORT, sender=config.SCREENSHOT_SENDER),
+        image_source: Callable = grab_screenshot,
+        screenshot: ScreenshotSettings = ScreenshotSettings()
+    ):
+        self.smtp = smtp
+        self.image_source = image_source
+        self.screenshot = screenshot
+
+        self._threads = []
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "reports_sent": 0,
+            "reports_failed": 0,
+        }
+
+    def report(self, to_address: str | list[str], exception: Exception, process_name: str) -> None:
+        """Take a screenshot now and send the report on a background thread."""
+
+        # The trace and screenshot are captured on the calling thread, while they still describe the error
+        trace = "".join(traceback.format_exception(exception))
+
+        try:
+            image = self.image_source()
+
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Could not take an error screenshot: {e}")
+
+            image = None
+
+        thread = threading.Thread(
+            target=self._send,
+            args=(to_address, exception, process_name, trace, image),
+            name="error-screenshot",
+            daemon=True
+        )
+
+        with self._lock:
+            self._threads = [running for running in self._threads if running.is_alive()]
+            self._threads.append(thread)
+
+        thread.start()
+
+    def flush(self, timeout: float | None = config.SCREENSHOT_FLUSH_TIMEOUT_SECONDS) -> int:
+        """Wait up to timeout seconds in total for the reports being sent and return how many are still pending."""
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._lock:
+            threads = list(self._threads)
+
+        for thread in threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+        with self._lock:
+            self._threads = [running for running in self._threads if running.is_alive()]
+
+            return len(self._threads)
+
+    def _send(self, to_address, exception: Exception, process_name: str, trace: str, image) -> None:
+        """Encode the screenshot and send the report. Errors are printed, as there is no caller to raise them to."""
+
+        try:
+            screenshot = None
+
+            if image is not None:
+                try:
+                    screenshot = encode_screenshot(image, self.screenshot.max_size, self.screenshot.image_format, self.screenshot.quality)
+
+                except (OSError, ValueError) as e:
+                    print(f"Could not encode the error screenshot: {e}")
+
+            msg = build_error_email(to_address, self.smtp.sender, process_name, exception, trace, screenshot, self.screenshot.image_format)
+
+            with self.smtp.connect() as smtp:
+                smtp.send_message(msg)
+
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Could not send the error screenshot: {e}")
+
+            with self._lock:
+                self.stats["reports_failed"] += 1
+
+            return
+
+        with self._lock:
+            self.stats["reports_sent"] += 1
+
+
+_reporter = ErrorReporter()
+
+
+def send_error_screenshot(to_address: str | list[str], exception: Exception, process_name: str):
+    """Sends an email with an error report, including a screenshot, when an exception occurs.
+    Configuration details such as SMTP server, port, sender email, etc., should be set in 'config' module.
+    The email is sent on a background thread - use flush to wait for it.
+
+    Args:
+        to_address: Email address or list of addresses to send the error report.
+        exception: The exception that triggered the error.
+        process_name: Name of the process from OpenOrchestrator.
+    """
+    _reporter.report(to_address, exception, process_name)
+
+
+def flush(timeout: float | None = config.SCREENSHOT_FLUSH_TIMEOUT_SECONDS) -> int:
+    """Wait up to timeout seconds for the error reports being sent and return how many are still pending."""
+
+    return _reporter.flush(timeout)
@@ -3,19 +3,24 @@
 import json
 import traceback
 
-from OpenOrchestrator.database.queues import QueueElement, QueueStatus
+from typing import TYPE_CHECKING
+
 from OpenOrchestrator.orchestrator_connection.connection import OrchestratorConnection
 
 from robot_framework import config
 from robot_framework import error_screenshot
+from robot_framework import run_cache
 # from robot_framework import servicenow_handler
 
+if TYPE_CHECKING:
+    from OpenOrchestrator.database.queues import QueueElement
+
 
 class BusinessError(Exception):
     """An empty exception used to identify errors caused by breaking business rules"""
 
 
-def handle_error(message: str, error_count: str | None, error: Exception, queue_element: QueueElement | None, orchestrator_connection: OrchestratorConnection) -> None:
+def handle_error(message: str, error_count: str | None, error: Exception, queue_element: "QueueElement | None", orchestrator_connection: OrchestratorConnection) -> None:
     """Handles an error caught during the process.
     Logs an error to OpenOrchestrator.
     Marks the queue element (if any) as failed.
@@ -39,10 +44,12 @@ def handle_error(message: str, error_count: str | None, error: Exception, queue_
         if len(error_msg) > 1000
         else error_msg
     )  # Shorten error msg such that it can be sent to SQL database
-    error_email = orchestrator_connection.get_constant(config.ERROR_EMAIL).value
+    error_email = run_cache.get(orchestrator_connection).get_constant(config.ERROR_EMAIL).value
 
     orchestrator_connection.log_error(error_msg)
     if queue_element:
+        from OpenOrchestrator.database.queues import QueueStatus  # pylint: disable=import-outside-toplevel
+
         orchestrator_connection.set_queue_element_status(queue_element.id, QueueStatus.FAILED, error_msg)
     if error != BusinessError:
         error_screenshot.send_error_screenshot(error_email, error, orchestrator_connection.process_name)
@@ -0,0 +1,157 @@
+"""
+Run-scoped timing spans, counters and an opt-in profiler.
+
+Code marks the work it does with named spans and counters:
+
+    with instrumentation.span("db_fetch"):
+        ...
+
+    instrumentation.count("rows_fetched", len(rows))
+
+Spans record how often they ran, their total and their longest duration. Both are kept in process-wide totals
+for the current run, are safe to update from worker threads, and are summarised as JSON at the end of the run.
+Spans of the process pool of parallel_transform are not counted, as they run in other processes - its workers send
+their counters back with every chunk.
+
+profiled wraps a block in cProfile or tracemalloc and saves the result, for the "profile" process argument.
+"""
+
+import cProfile
+import os
+import threading
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+from datetime import datetime
+
+from robot_framework import config
+
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+_lock = threading.Lock()
+
+# name -> [calls, total seconds, longest seconds]
+_spans: dict[str, list] = {}
+
+_counters: dict[str, int] = {}
+
+_started = time.perf_counter()
+
+
+@contextmanager
+def span(name: str):
+    """Time the block as one call of the named span - the time is recorded even if the block raises."""
+
+    started = time.perf_counter()
+
+    try:
+        yield
+
+    finally:
+        elapsed = time.perf_counter() - started
+
+        with _lock:
+            totals = _spans.setdefault(name, [0, 0.0, 0.0])
+
+            totals[0] += 1
+            totals[1] += elapsed
+            totals[2] = max(totals[2], elapsed)
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Add amount to the named counter."""
+
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def take_counters() -> dict[str, int]:
+    """Return the counters and clear them - a worker process hands its counts to the parent this way."""
+
+    with _lock:
+        counters = dict(_counters)
+
+        _counters.clear()
+
+    return counters
+
+
+def reset() -> None:
+    """Forget every span and counter and restart the run clock."""
+
+    global _started  # pylint: disable=global-statement
+
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+        _started = time.perf_counter()
+
+
+def summary() -> dict:
+    """The run so far as a JSON-serialisable dict - seconds are rounded to milliseconds."""
+
+    with _lock:
+        return {
+            "elapsed_seconds": round(time.perf_counter() - _started, 3),
+            "spans": {
+                name: {"calls": calls, "total_seconds": round(total, 3), "max_seconds": round(longest, 3)}
+                for name, (calls, total, longest) in sorted(_spans.items())
+            },
+            "counters": dict(sorted(_counters.items())),
+        }
+
+
+@contextmanager
+def profiled(mode: str | None, process_name: str = "robot", output_folder: str = config.PROFILE_OUTPUT_FOLDER):
+    """
+    Run the block under cProfile ("cprofile") or tracemalloc ("tracemalloc") and save the result in output_folder.
+    cProfile stats are saved as .prof (open with pstats or snakeviz), tracemalloc as a .txt of the 50 largest
+    allocation sites. With no mode, the block runs as is. Yields the path the result is saved to, or None.
+    """
+
+    if not mode:
+        yield None
+
+        return
+
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}' - expected one of {PROFILE_MODES}")
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    stem = f"{''.join(character if character.isalnum() else '_' for character in process_name)}_{datetime.now():%Y%m%d_%H%M%S}"
+
+    if mode == "cprofile":
+        path = os.path.join(output_folder, f"{stem}.prof")
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        try:
+            yield path
+
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+
+    else:
+        path = os.path.join(output_folder, f"{stem}.tracemalloc.txt")
+
+        tracemalloc.start(config.TRACEMALLOC_FRAMES)
+
+        try:
+            yield path
+
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            with open(path, "w", encoding="utf-8") as report:
+                report.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MB\n\n")
+
+                for statistic in snapshot.statistics("lineno")[:50]:
+                    report.write(f"{statistic}\n")
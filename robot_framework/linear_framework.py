@@ -3,6 +3,7 @@
 # This module is not meant to exist next to queue_framework.py in production:
 # pylint: disable=duplicate-code
 
+import json
 import sys
 
 from OpenOrchestrator.orchestrator_connection.connection import OrchestratorConnection
@@ -12,6 +13,7 @@ from robot_framework import reset
 from robot_framework.exceptions import BusinessError, handle_error, log_exception
 from robot_framework import process
 from robot_framework import config
+from robot_framework import instrumentation
 
 
 def main():
@@ -40,27 +42,53 @@ def main():
     orchestrator_connection.log_trace("Robot Framework started.")
     initialize.initialize(orchestrator_connection)
 
-    error_count = 0
-    for _ in range(config.MAX_RETRY_COUNT):
-        try:
-            reset.reset(orchestrator_connection)
-            process.process(orchestrator_connection)
-            break
+    # "profile": "cprofile" or "tracemalloc" in the process arguments runs the robot under that profiler
+    profile_mode = _process_arguments(orchestrator_connection).get("profile")
 
-        # If any business rules are broken the robot should stop entirely.
-        except BusinessError as error:
-            handle_error("BusinessException", None, error, None, orchestrator_connection)
-            break
+    with instrumentation.profiled(profile_mode, orchestrator_connection.process_name) as profile_path:
+        error_count = 0
+        for attempt in range(1, config.MAX_RETRY_COUNT + 1):
+            # Timings and counters are per attempt, so the run summary only covers the attempt that finished the run
+            instrumentation.reset()
 
-        # We actually want to catch all exceptions possible here.
-        # pylint: disable-next = broad-exception-caught
-        except Exception as error:
-            error_count += 1
-            handle_error("ApplicationException", error_count, error, None, orchestrator_connection)
+            try:
+                reset.reset(orchestrator_connection)
+                process.process(orchestrator_connection)
+                break
+
+            # If any business rules are broken the robot should stop entirely.
+            except BusinessError as error:
+                handle_error("BusinessException", None, error, None, orchestrator_connection)
+                break
+
+            # We actually want to catch all exceptions possible here.
+            # pylint: disable-next = broad-exception-caught
+            except Exception as error:
+                error_count += 1
+                handle_error("ApplicationException", error_count, error, None, orchestrator_connection)
+
+                orchestrator_connection.log_trace(f"Attempt {attempt} summary: {json.dumps(instrumentation.summary(), ensure_ascii=False)}")
 
     reset.clean_up(orchestrator_connection)
     reset.close_all(orchestrator_connection)
     reset.kill_all(orchestrator_connection)
 
+    if profile_path:
+        orchestrator_connection.log_trace(f"Profile saved to '{profile_path}'.")
+
+    orchestrator_connection.log_trace(f"Run summary: {json.dumps(instrumentation.summary(), ensure_ascii=False)}")
+
     if config.FAIL_ROBOT_ON_TOO_MANY_ERRORS and error_count == config.MAX_RETRY_COUNT:
         raise RuntimeError("Process failed too many times.")
+
+
+def _process_arguments(orchestrator_connection: OrchestratorConnection) -> dict:
+    """The process arguments as a dict - empty if they are missing or not a JSON object."""
+
+    try:
+        arguments = json.loads(orchestrator_connection.process_arguments or "{}")
+
+    except ValueError:
+        return {}
+
+    return arguments if isinstance(arguments, dict) else {}
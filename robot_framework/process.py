@@ -2,24 +2,55 @@
 
 # import sys
 
+import functools
 import json
 
 import traceback
 
-from io import BytesIO
-
-import pandas as pd
+from datetime import datetime
 
 from OpenOrchestrator.orchestrator_connection.connection import OrchestratorConnection
 
-from itk_dev_shared_components.smtp import smtp_util
+from robot_framework import config
+from robot_framework import instrumentation
+from robot_framework import run_cache
+from robot_framework.sub_processes import email_pipeline
+from robot_framework.sub_processes import email_rendering
+from robot_framework.sub_processes import form_decoding
+from robot_framework.sub_processes import helper_functions
+from robot_framework.sub_processes import formular_mappings
+from robot_framework.sub_processes import mail_dispatcher
+from robot_framework.sub_processes import parallel_transform
+from robot_framework.sub_processes import recipient_resolver
+from robot_framework.sub_processes import run_plan
+from robot_framework.sub_processes import submission_cache
 
-from mbu_dev_shared_components.database import constants
+# The SharePoint client, openpyxl, pandas and pyarrow are only used on the first of the month, so the modules that need
+# them are imported where they are used and the daily run starts without them.
 
-from mbu_dev_shared_components.msoffice365.sharepoint_api.files import Sharepoint
 
-from robot_framework.sub_processes import helper_functions
-from robot_framework.sub_processes import formular_mappings
+def connect_sharepoint(credential):
+    """Create the SharePoint client for the Center for Trivsel site."""
+
+    from mbu_dev_shared_components.msoffice365.sharepoint_api.files import Sharepoint  # pylint: disable=import-outside-toplevel
+
+    return Sharepoint(
+        username=credential.username,
+        password=credential.password,
+        site_url="https://aarhuskommune.sharepoint.com",
+        site_name="CenterforTrivsel",
+        document_library="Delte dokumenter"
+    )
+
+
+def smtp_settings(settings) -> mail_dispatcher.SmtpSettings:
+    """The SMTP server and sender of the daily emails - the mail settings are served from the run cache."""
+
+    return mail_dispatcher.SmtpSettings(
+        server=settings.get_shared_constant("smtp_server", db_env="PROD")["value"],
+        port=settings.get_shared_constant("smtp_port", db_env="PROD")["value"],
+        sender=settings.get_shared_constant("e-mail_noreply")["value"]
+    )
 
 
 def process(orchestrator_connection: OrchestratorConnection) -> None:
@@ -28,242 +59,285 @@ def process(orchestrator_connection: OrchestratorConnection) -> None:
     orchestrator_connection.log_trace("Running process.")
     print("Running process.")
 
-    sql_server_connection_string = orchestrator_connection.get_constant("DbConnectionString").value
+    settings = run_cache.get(orchestrator_connection)
 
-    os2_webform_id = json.loads(orchestrator_connection.process_arguments)["os2_webform_id"]
+    sql_server_connection_string = settings.get_constant("DbConnectionString").value
 
-    date_today = pd.Timestamp.now().date()
+    process_arguments = json.loads(orchestrator_connection.process_arguments)
 
-    username = orchestrator_connection.get_credential("SvcRpaMBU002").username
-    password = orchestrator_connection.get_credential("SvcRpaMBU002").password
+    os2_webform_id = process_arguments["os2_webform_id"]
 
-    sharepoint_api = Sharepoint(
-        username=username,
-        password=password,
-        site_url="https://aarhuskommune.sharepoint.com",
-        site_name="CenterforTrivsel",
-        document_library="Delte dokumenter"
-    )
+    now = datetime.now()
+
+    date_today = now.date()
+
+    credential = settings.get_credential("SvcRpaMBU002")
+
+    sharepoint_api = None
 
     folder_name = "General/ESQ"
 
-    current_day_of_month = str(pd.Timestamp.now().day)
-    if current_day_of_month == "1":
-        print("Today is the first of the month - we will update the Excel files with new submissions.")
-        orchestrator_connection.log_trace("Today is the first of the month - we will update the Excel files with new submissions.")
+    unge_excel_file_name = "Center for trivsel - ESQ besvarelser fra unge.xlsx"
+    foraeldre_excel_file_name = "Center for trivsel - ESQ besvarelser fra forældre.xlsx"
 
-        # Last + first day of last month
-        end_date = date_today.replace(day=1) - pd.Timedelta(days=1)
-        start_date = end_date.replace(day=1)
+    file_names = []
+    missing_workbooks = []
 
-        unge_excel_file_name = "Center for trivsel - ESQ besvarelser fra unge.xlsx"
-        foraeldre_excel_file_name = "Center for trivsel - ESQ besvarelser fra forældre.xlsx"
+    current_day_of_month = str(now.day)
+    if current_day_of_month == "1":
+        # pylint: disable-next = import-outside-toplevel
+        from robot_framework.sub_processes import workbook_partitions
+
+        sharepoint_api = connect_sharepoint(credential)
 
-        files_in_sharepoint = sharepoint_api.fetch_files_list(folder_name=folder_name)
+        with instrumentation.span("sharepoint_list"):
+            files_in_sharepoint = sharepoint_api.fetch_files_list(folder_name=folder_name)
         file_names = [f["Name"] for f in files_in_sharepoint]
 
-        for excel_file_name in [unge_excel_file_name, foraeldre_excel_file_name]:
-            if excel_file_name not in file_names:
-                print(f"Excel file '{excel_file_name}' not found - creating new.")
-                orchestrator_connection.log_trace(f"Excel file '{excel_file_name}' not found - creating new.")
+        workbook_names = [unge_excel_file_name, foraeldre_excel_file_name]
+        if config.WORKBOOK_LAYOUT == "single":
+            missing_workbooks = [excel_file_name for excel_file_name in workbook_names if excel_file_name not in file_names]
 
-                # Fetch all submissions once for the whole period
-                all_submissions = helper_functions.get_forms_data(sql_server_connection_string, os2_webform_id)
+        else:
+            # A partitioned workbook without an index is rebuilt from the whole history, partition by partition
+            missing_workbooks = [excel_file_name for excel_file_name in workbook_names if workbook_partitions.index_file_name(excel_file_name) not in file_names]
 
-                if excel_file_name == unge_excel_file_name:
-                    all_submissions_df = helper_functions.build_df(all_submissions, "Ung/selvbesvarelse", formular_mappings.center_for_trivsel_esq_barn_mapping)
+        plan = run_plan.plan_run(date_today, workbook_names, missing_workbooks)
 
-                else:
-                    all_submissions_df = helper_functions.build_df(all_submissions, "Forælder (inklusiv plejeforældre)", formular_mappings.center_for_trivsel_esq_foraelder_mapping)
+    else:
+        plan = run_plan.plan_run(date_today)
 
-                excel_stream = BytesIO()
-                all_submissions_df.to_excel(excel_stream, index=False, engine="openpyxl", sheet_name="Besvarelser")
-                excel_stream.seek(0)
+    # Fetch every submission needed for the run once - the workbooks and the daily email flow read filtered views of it
+    fetch_window = plan.fetch_window
+    print(f"Fetching forms from {fetch_window.start or 'the beginning'} to {fetch_window.end or 'today'}.")
+    orchestrator_connection.log_trace(f"Fetching forms from {fetch_window.start or 'the beginning'} to {fetch_window.end or 'today'}.")
 
-                sharepoint_api.upload_file_from_bytes(
-                    binary_content=excel_stream.getvalue(),
-                    file_name=excel_file_name,
-                    folder_name=folder_name
-                )
+    if config.SUBMISSION_CACHE_ENABLED:
+        with submission_cache.SubmissionCache() as cache:
+            if process_arguments.get("rebuild_submission_cache"):
+                orchestrator_connection.log_trace("Rebuilding the local submission cache.")
 
-            else:
-                print(f"Fetching forms from {start_date} to {end_date} for '{excel_file_name}'.")
+                cache.invalidate(os2_webform_id)
 
-                ranged_submissions = helper_functions.get_forms_data(
-                    sql_server_connection_string,
-                    os2_webform_id,
-                    start_date=start_date,
-                    end_date=end_date
-                )
+            snapshot = run_plan.fetch_snapshot(sql_server_connection_string, os2_webform_id, fetch_window, cache=cache)
+
+    else:
+        snapshot = run_plan.fetch_snapshot(sql_server_connection_string, os2_webform_id, fetch_window)
+
+    # Every consumer reads its view inside the block - the spooled snapshot is deleted when it ends, also on errors
+    with snapshot:
+        # Only decode the fields the mappings read
+        form_schema = form_decoding.FormSchema.from_mappings(
+            formular_mappings.center_for_trivsel_esq_barn_mapping,
+            formular_mappings.center_for_trivsel_esq_foraelder_mapping
+        )
+
+        if plan.workbook_windows:
+            print("Today is the first of the month - we will update the Excel files with new submissions.")
+            orchestrator_connection.log_trace("Today is the first of the month - we will update the Excel files with new submissions.")
+
+            # pylint: disable-next = import-outside-toplevel
+            from robot_framework.sub_processes import excel_writer, parquet_archive, workbook_partitions, workbook_update
 
-                # Filter/transform for just this file
+            archive = None
+
+            if config.PARQUET_ARCHIVE_ENABLED:
+                if parquet_archive.is_available():
+                    archive = parquet_archive.ParquetArchive(config.PARQUET_ARCHIVE_PATH)
+
+                else:
+                    orchestrator_connection.log_trace("pyarrow is not installed - skipping the Parquet archive.")
+
+            for excel_file_name, workbook_window in plan.workbook_windows.items():
                 if excel_file_name == unge_excel_file_name:
-                    new_rows_df = helper_functions.build_df(ranged_submissions, "Ung/selvbesvarelse", formular_mappings.center_for_trivsel_esq_barn_mapping)
+                    role, mapping = "Ung/selvbesvarelse", formular_mappings.center_for_trivsel_esq_barn_mapping
 
                 else:
-                    new_rows_df = helper_functions.build_df(ranged_submissions, "Forælder (inklusiv plejeforældre)", formular_mappings.center_for_trivsel_esq_foraelder_mapping)
-
-                if not new_rows_df.empty:
-                    sharepoint_api.append_row_to_sharepoint_excel(
-                        folder_name=folder_name,
-                        excel_file_name=excel_file_name,
-                        sheet_name="Besvarelser",
-                        new_rows=new_rows_df.to_dict(orient="records")
-                    )
+                    role, mapping = "Forælder (inklusiv plejeforældre)", formular_mappings.center_for_trivsel_esq_foraelder_mapping
 
-            # Format after create/append
-            sharepoint_api.format_and_sort_excel_file(
-                folder_name=folder_name,
-                excel_file_name=excel_file_name,
-                sheet_name="Besvarelser",
-                sorting_keys=[{"key": "A", "ascending": False, "type": "str"}],
-                bold_rows=[1],
-                align_horizontal="left",
-                align_vertical="top",
-                italic_rows=None,
-                font_config=None,
-                column_widths=100,
-                freeze_panes="A2"
-            )
+                if excel_file_name in missing_workbooks:
+                    print(f"Excel file '{excel_file_name}' not found - creating new.")
+                    orchestrator_connection.log_trace(f"Excel file '{excel_file_name}' not found - creating new.")
 
-            print()
-            print()
+                    # All submissions for the whole period, read back from the snapshot spool - decoded and transformed
+                    # in parallel for large histories
+                    all_rows = snapshot.rows_in(workbook_window)
 
-    # ALWAYS RUN DAILY EMAIL SUBMISSION FLOW
-    orchestrator_connection.log_trace("Running daily email submission flow.")
-    print("Running daily email submission flow.")
+                    transform = functools.partial(parallel_transform.iter_transformed_rows, role=role, mapping=mapping, schema=form_schema)
 
-    forms_by_cpr = {}
+                    archive_rebuild = archive.rebuild_role(role) if archive is not None else None
 
-    date_yesterday = (pd.Timestamp.now() - pd.Timedelta(days=1)).date()
-    all_yesterdays_forms = helper_functions.get_forms_data(sql_server_connection_string, os2_webform_id, target_date=date_yesterday)
+                    if archive_rebuild is not None:
+                        # The archive is rebuilt from the same transformed rows on their way into the workbook
+                        transform = archive_rebuild.recording(transform)
 
-    ### REMEMBER TO UNCOMMENT THIS
-    # approved_emails_bytes = sharepoint_api.fetch_file_using_open_binary(
-    #     file_name="Godkendte emails.xlsx",
-    #     folder_name=folder_name
-    # )
+                    if config.WORKBOOK_LAYOUT == "single":
+                        # Sorted and formatted on the way into the workbook, so it is uploaded once
+                        workbook_file = workbook_update.write_workbook(transform(all_rows), sheet_name="Besvarelser", column_width_cap=100, freeze_panes="A2")
 
-    # approved_emails_df = pd.read_excel(BytesIO(approved_emails_bytes))
+                        excel_writer.upload_workbook(sharepoint_api, workbook_file, file_name=excel_file_name, folder_name=folder_name)
 
-    # # Create dictionary {az-ident: email}, dropping NaNs and stripping/normalizing
-    # approved_emails_dict = dict(
-    #     zip(
-    #         approved_emails_df['az-ident'].dropna().str.strip(),
-    #         approved_emails_df['email'].dropna().str.strip().str.lower()
-    #     )
-    # )
-    ### REMEMBER TO UNCOMMENT THIS
+                    else:
+                        workbook_partitions.rebuild_partitions(
+                            sharepoint_api,
+                            folder_name=folder_name,
+                            workbook_name=excel_file_name,
+                            rows=all_rows,
+                            transform=transform,
+                            granularity=config.WORKBOOK_LAYOUT
+                        )
 
-    if len(all_yesterdays_forms) > 0:
-        for form in all_yesterdays_forms:
-            try:
-                serial = form["entity"]["serial"][0]["value"]
+                    if archive_rebuild is not None:
+                        # Swap in every month of the role - an error above leaves the previous archive in place
+                        archive_rebuild.finish()
 
-                udfylder_rolle = form["data"]["hvem_udfylder_spoergeskemaet"]
+                else:
+                    print(f"Using forms from {workbook_window.start} to {workbook_window.end} for '{excel_file_name}'.")
+
+                    ranged_submissions = snapshot.forms(workbook_window, schema=form_schema)
+
+                    # Filter/transform for just this file
+                    with instrumentation.span("transform"):
+                        new_rows_df = helper_functions.build_df(ranged_submissions, role, mapping, columnar=True)
+
+                    if config.WORKBOOK_LAYOUT == "single":
+                        # Append, sort and format locally - the workbook is downloaded and uploaded once
+                        workbook_update.update_workbook(
+                            sharepoint_api,
+                            folder_name=folder_name,
+                            excel_file_name=excel_file_name,
+                            sheet_name="Besvarelser",
+                            new_rows=new_rows_df.to_dict(orient="records"),
+                            column_width_cap=100,
+                            freeze_panes="A2"
+                        )
+
+                    else:
+                        # Only the partitions of the new rows - last month's - and the index are downloaded and uploaded
+                        workbook_partitions.append_to_partition(
+                            sharepoint_api,
+                            folder_name=folder_name,
+                            workbook_name=excel_file_name,
+                            new_rows=new_rows_df.to_dict(orient="records"),
+                            existing_files=file_names,
+                            granularity=config.WORKBOOK_LAYOUT
+                        )
+
+                    if archive is not None:
+                        archive.merge_rows(role, new_rows_df)
+
+                print()
+                print()
+
+        # ALWAYS RUN DAILY EMAIL SUBMISSION FLOW
+        orchestrator_connection.log_trace("Running daily email submission flow.")
+        print("Running daily email submission flow.")
+
+        if config.APPROVED_EMAILS_ROUTING_ENABLED:
+            # Approved emails per AZ-ident - only downloaded and parsed again when the workbook has changed on SharePoint
+            recipients = recipient_resolver.RecipientResolver.load(
+                sharepoint_api or connect_sharepoint(credential),
+                folder_name=folder_name,
+                fallback=settings.get_constant("center_for_trivsel_mail").value
+            )
 
-                if udfylder_rolle == "Ung/selvbesvarelse":
-                    mapping = formular_mappings.center_for_trivsel_esq_barn_mapping
+        else:
+            # Every email goes to the center's mailbox
+            recipients = recipient_resolver.RecipientResolver({}, fallback=settings.get_constant("center_for_trivsel_mail").value)
 
-                elif udfylder_rolle == "Forælder (inklusiv plejeforældre)":
-                    mapping = formular_mappings.center_for_trivsel_esq_foraelder_mapping
+        deliveries = []
+        connections_opened = 0
 
-                else:
-                    continue
+        if process_arguments.get("async_email_pipeline", config.EMAIL_PIPELINE_ENABLED):
+            # Fetch, transform, group, render and send as overlapping stages - rendering continues while emails are sent
+            with mail_dispatcher.MailDispatcher(smtp_settings(settings)) as dispatcher:
+                pipeline_result = email_pipeline.run_pipeline(
+                    snapshot.forms(plan.email_window, schema=form_schema),
+                    recipient_for=recipients.recipient_for,
+                    dispatcher=dispatcher
+                )
 
-                transformed_row = formular_mappings.transform_form_submission(serial, form, mapping)
+            deliveries = pipeline_result.deliveries
+            connections_opened = dispatcher.stats["connections_opened"]
 
-                ### REMEMBER TO UNCOMMENT THIS
-                # if transformed_row["AZ-ident"].strip() not in approved_emails_dict:
-                #     transformed_row["Tilkoblet email"] = orchestrator_connection.get_constant("center_for_trivsel_mail").value
+            print(pipeline_result.summary())
+            orchestrator_connection.log_trace(f"Email pipeline finished in {pipeline_result.elapsed_seconds:.2f}s.")
 
-                # else:
-                #     transformed_row["Tilkoblet email"] = approved_emails_dict[transformed_row["AZ-ident"].strip().lower()]
-                ### REMEMBER TO UNCOMMENT THIS
+        else:
+            forms_by_cpr = {}
 
-                transformed_row["Tilkoblet email"] = orchestrator_connection.get_constant("center_for_trivsel_mail").value
+            all_yesterdays_forms = list(snapshot.forms(plan.email_window, schema=form_schema))
 
-                cpr = transformed_row["Barnets/Den unges CPR-nummer"]
+            if len(all_yesterdays_forms) > 0:
+                with instrumentation.span("transform"):
+                    for form in all_yesterdays_forms:
+                        try:
+                            serial = form["entity"]["serial"][0]["value"]
 
-                if cpr not in forms_by_cpr:
-                    forms_by_cpr[cpr] = []
+                            udfylder_rolle = form["data"]["hvem_udfylder_spoergeskemaet"]
 
-                forms_by_cpr[cpr].append({
-                    "form": form,
-                    "transformed": transformed_row,
-                    "role": udfylder_rolle,
-                    "mapping": mapping
-                })
+                            if udfylder_rolle == "Ung/selvbesvarelse":
+                                mapping = formular_mappings.center_for_trivsel_esq_barn_mapping
 
-            except Exception as e:
-                print(f"Error processing form: {e}")
+                            elif udfylder_rolle == "Forælder (inklusiv plejeforældre)":
+                                mapping = formular_mappings.center_for_trivsel_esq_foraelder_mapping
 
-                continue
+                            else:
+                                continue
 
-        for cpr, entries in forms_by_cpr.items():
-            sections = []
+                            transformed_row = formular_mappings.transform_form_submission(serial, form, mapping)
 
-            for entry in entries:
-                transformed_row = entry["transformed"]
-                role = entry["role"]
-                mapping = entry["mapping"]
+                            transformed_row["Tilkoblet email"] = recipients.recipient_for(transformed_row)
 
-                table_att = {
-                    "Udfyldt": transformed_row["Gennemført"],
-                    "Behandling": transformed_row["Behandling"],
-                    "Barnets/Den unges navn": transformed_row["Barnets/Den unges navn"],
-                    "Barnets/Den unges CPR-nummer": transformed_row["Barnets/Den unges CPR-nummer"],
-                    "Barnets/Den unges alder": transformed_row["Barnets/Den unges alder"],
-                }
+                            cpr = transformed_row["Barnets/Den unges CPR-nummer"]
 
-                if role == "Forælder (inklusiv plejeforældre)":
-                    table_att["Forælder navn"] = transformed_row["Navn"]
-                    table_att["Forælder cpr-Nummer"] = transformed_row["CPR-nummer"]
+                            if cpr not in forms_by_cpr:
+                                forms_by_cpr[cpr] = []
 
-                    for _, spg in mapping["spoergsmaal_foraelder_tabel"].items():
-                        table_att[spg] = transformed_row.get(spg)
+                            forms_by_cpr[cpr].append({
+                                "form": form,
+                                "transformed": transformed_row,
+                                "role": udfylder_rolle
+                            })
 
-                    table_att["Hvad var rigtig godt ved behandlingen?"] = transformed_row["Hvad var rigtig godt ved behandlingen?"]
-                    table_att["Var der noget du ikke synes om eller noget der kan forbedres?"] = transformed_row["Var der noget du ikke synes om eller noget der kan forbedres?"]
-                    table_att["Er der andet du ønsker at fortælle os, om det forløb I har haft?"] = transformed_row["Er der andet du ønsker at fortælle os, om det forløb I har haft?"]
+                        except Exception as e:
+                            print(f"Error processing form: {e}")
 
-                else:
-                    for _, spg in mapping["spoergsmaal_barn_tabel"].items():
-                        table_att[spg] = transformed_row.get(spg)
+                            instrumentation.count("forms_failed_transform")
 
-                    table_att["Her er plads til, at du kan skrive, hvad du tænker eller føler om behandlingen"] = transformed_row["Her er plads til, at du kan skrive, hvad du tænker eller føler om behandlingen"]
+                            continue
 
-                table_att["Average answer score"] = transformed_row["Average answer score"]
+                # Render every email of the run in one batch from the precompiled role sections
+                email_bodies = email_rendering.render_emails(forms_by_cpr)
 
-                html_table = helper_functions.format_html_table(table_att)
+                emails = [
+                    mail_dispatcher.OutgoingEmail(
+                        receiver=entries[-1]["transformed"]["Tilkoblet email"],
+                        subject="Ny(e) ESQ besvarelse(r)",
+                        html_body=email_bodies[cpr]
+                    )
+                    for cpr, entries in forms_by_cpr.items()
+                ]
 
-                sections.append(
-                    f"<p><strong>Udfylder rolle:</strong> {role}</p><br>{html_table}<br><br>"
-                )
+                # Send every email over the same SMTP session
+                with mail_dispatcher.MailDispatcher(smtp_settings(settings)) as dispatcher:
+                    deliveries = dispatcher.send_all(emails)
 
-            email_body = (
-                f"<p>Ny(e) besvarelse(r) til ESQ formular for barn med CPR: <strong>{cpr}</strong></p>"
-                + "<hr>".join(sections)
-            )
+                connections_opened = dispatcher.stats["connections_opened"]
 
-            try:
-                smtp_util.send_email(
-                    receiver=transformed_row["Tilkoblet email"],
-                    sender=constants.get_constant("e-mail_noreply")["value"],
-                    subject="Ny(e) ESQ besvarelse(r)",
-                    body=email_body,
-                    html_body=email_body,
-                    smtp_server=constants.get_constant("smtp_server", db_env="PROD")["value"],
-                    smtp_port=constants.get_constant("smtp_port", db_env="PROD")["value"],
-                    attachments=None,
-                )
+    for delivery in deliveries:
+        if not delivery.ok:
+            print("❌ Failed to send email")
+
+            print(f"➡️ Error: {delivery.error}")
 
-            except Exception as e:
-                print("❌ Failed to send email")
+            traceback.print_exception(delivery.error)
 
-                print(f"➡️ Error: {e}")
+    failed_count = sum(1 for delivery in deliveries if not delivery.ok)
+    slowest = max((delivery.latency_seconds for delivery in deliveries), default=0.0)
 
-                traceback.print_exc()
+    print(f"Sent {len(deliveries) - failed_count} of {len(deliveries)} emails over {connections_opened} SMTP connection(s) - slowest took {slowest:.2f}s.")
+    orchestrator_connection.log_trace(f"Sent {len(deliveries) - failed_count} of {len(deliveries)} emails, {failed_count} failed.")
 
     orchestrator_connection.log_trace("Process completed successfully.")
     print("Process completed successfully.")
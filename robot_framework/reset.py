@@ -2,20 +2,38 @@
 
 from OpenOrchestrator.orchestrator_connection.connection import OrchestratorConnection
 
+from robot_framework import config
+from robot_framework import error_screenshot
+from robot_framework import run_cache
+from robot_framework.sub_processes import database_engines
+
 
 def reset(orchestrator_connection: OrchestratorConnection) -> None:
     """Clean up, close/kill all programs and start them again. """
     orchestrator_connection.log_trace("Resetting.")
-    clean_up(orchestrator_connection)
+    # Error reports from the previous attempt keep sending in the background - the retry does not wait for them
+    clean_up(orchestrator_connection, report_timeout=0)
     close_all(orchestrator_connection)
     kill_all(orchestrator_connection)
     open_all(orchestrator_connection)
 
+    # Constants and credentials are read again on their first lookup in the new attempt
+    run_cache.get(orchestrator_connection).clear()
+
 
-def clean_up(orchestrator_connection: OrchestratorConnection) -> None:
-    """Do any cleanup needed to leave a blank slate."""
+def clean_up(orchestrator_connection: OrchestratorConnection, report_timeout: float = config.SCREENSHOT_FLUSH_TIMEOUT_SECONDS) -> None:
+    """Do any cleanup needed to leave a blank slate.
+    Waits up to report_timeout seconds for error screenshots that are still being sent."""
     orchestrator_connection.log_trace("Doing cleanup.")
 
+    pending_reports = error_screenshot.flush(report_timeout)
+    if pending_reports and report_timeout:
+        orchestrator_connection.log_trace(f"{pending_reports} error screenshot(s) were still being sent after {report_timeout}s.")
+
+    orchestrator_connection.log_trace(f"Database connection stats: {database_engines.get_connection_stats()}")
+    database_engines.dispose_engines()
+    database_engines.reset_connection_stats()
+
 
 def close_all(orchestrator_connection: OrchestratorConnection) -> None:
     """Gracefully close all applications used by the robot."""
@@ -0,0 +1,107 @@
+"""
+Run-scoped cache of OpenOrchestrator constants and credentials and the shared RPA database constants.
+
+Every get_constant/get_credential call is a database round trip. The cache fetches each name the robot looks up on its
+first use, through the same OrchestratorConnection/shared constants lookups the robot made before, and serves every
+later lookup of it from memory. Only the names the robot actually uses are read - constants and credentials of other
+processes never leave the database. The cache is cleared at the start of every attempt, and with a TTL entries older
+than the TTL are fetched again, so a long run picks up rotated passwords.
+
+There is one cache per OrchestratorConnection, shared by every module that is given the connection:
+
+    run_cache.get(orchestrator_connection).get_constant("DbConnectionString").value
+"""
+
+import time
+import weakref
+
+from OpenOrchestrator.database.constants import Constant, Credential
+from OpenOrchestrator.orchestrator_connection.connection import OrchestratorConnection
+
+from mbu_dev_shared_components.database import constants
+
+from robot_framework import config
+
+
+_caches: "weakref.WeakKeyDictionary[OrchestratorConnection, RunCache]" = weakref.WeakKeyDictionary()
+
+
+def get(orchestrator_connection: OrchestratorConnection) -> "RunCache":
+    """Return the cache of the given connection, creating it on first use."""
+
+    cache = _caches.get(orchestrator_connection)
+
+    if cache is None:
+        cache = RunCache(orchestrator_connection)
+
+        _caches[orchestrator_connection] = cache
+
+    return cache
+
+
+class RunCache:
+    """
+    Constants and credentials of one run, kept in memory with an optional TTL in seconds.
+    """
+
+    def __init__(self, orchestrator_connection: OrchestratorConnection, ttl: float | None = config.RUN_CACHE_TTL_SECONDS):
+        self.orchestrator_connection = orchestrator_connection
+        self.ttl = ttl
+
+        self._constants: dict[str, tuple[float, Constant]] = {}
+        self._credentials: dict[str, tuple[float, Credential]] = {}
+        self._shared_constants: dict[tuple[str, str | None], tuple[float, dict]] = {}
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+        }
+
+    def get_constant(self, name: str) -> Constant:
+        """The OpenOrchestrator constant with the given name, as returned by OrchestratorConnection.get_constant."""
+
+        return self._lookup(self._constants, name, self.orchestrator_connection.get_constant)
+
+    def get_credential(self, name: str) -> Credential:
+        """The OpenOrchestrator credential with the given name, as returned by OrchestratorConnection.get_credential."""
+
+        return self._lookup(self._credentials, name, self.orchestrator_connection.get_credential)
+
+    def get_shared_constant(self, name: str, db_env: str | None = None) -> dict:
+        """The shared RPA database constant with the given name, as returned by constants.get_constant."""
+
+        return self._lookup(self._shared_constants, (name, db_env), lambda key: self._fetch_shared_constant(*key))
+
+    def clear(self) -> None:
+        """Forget every cached value."""
+
+        self._constants.clear()
+        self._credentials.clear()
+        self._shared_constants.clear()
+
+    def _lookup(self, entries: dict, key, fetch):
+        """Serve key from entries if it is there and fresh, otherwise fetch and store it."""
+
+        entry = entries.get(key)
+
+        if entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+            self.stats["hits"] += 1
+
+            return entry[1]
+
+        self.stats["misses"] += 1
+
+        value = fetch(key)
+
+        entries[key] = (time.monotonic(), value)
+
+        return value
+
+    @staticmethod
+    def _fetch_shared_constant(name: str, db_env: str | None) -> dict:
+        """Read a constant from the shared RPA database, leaving db_env to its default when it is not given."""
+
+        if db_env is None:
+            return constants.get_constant(name)
+
+        return constants.get_constant(name, db_env=db_env)
@@ -0,0 +1,124 @@
+"""
+Normalisation of answer values, shared by the flat and nested fields of transform_form_submission.
+
+Webform answers that hold several choices arrive either as lists or as list-like strings such as "['a', 'b']".
+Those strings used to go through ast.literal_eval, which compiles a Python expression for every value. This module
+parses the common shapes - lists of quoted strings and integers - with a small dedicated parser, and hands anything
+else to ast.literal_eval, so the result is always the same as before. Answers repeat heavily across submissions
+(checkbox values, treatment names), so normalised list-like strings are memoised in a bounded LRU cache.
+"""
+
+import ast
+import re
+
+from functools import lru_cache
+
+from robot_framework import config
+
+
+# Returned by parse_list_literal for input it does not handle itself
+UNSUPPORTED = object()
+
+_WHITESPACE = " \t"
+
+_ITEM_PATTERN = re.compile(
+    r"""
+    '([^'\\\r\n]*)'                         # single quoted string without escapes
+    | "([^"\\\r\n]*)"                       # double quoted string without escapes
+    | (-?(?:0|[1-9][0-9]*))(?![0-9A-Za-z_.'"(\[{])  # plain integer
+    """,
+    re.VERBOSE
+)
+
+
+def parse_list_literal(text: str):
+    """
+    Parse a list literal made of quoted strings and integers, e.g. "['a', \\"b\\", 3]".
+    Returns the parsed list, or UNSUPPORTED for anything else (escapes, floats, nested literals, malformed input, ...),
+    in which case the caller must fall back to ast.literal_eval.
+    """
+
+    if not (text.startswith("[") and text.endswith("]")):
+        return UNSUPPORTED
+
+    end = len(text) - 1
+    pos = _skip_whitespace(text, 1)
+
+    items = []
+
+    if pos == end:
+        return items
+
+    while True:
+        match = _ITEM_PATTERN.match(text, pos)
+
+        if match is None:
+            return UNSUPPORTED
+
+        single_quoted, double_quoted, integer = match.groups()
+
+        if integer is not None:
+            items.append(int(integer))
+
+        else:
+            items.append(single_quoted if single_quoted is not None else double_quoted)
+
+        pos = _skip_whitespace(text, match.end())
+
+        if text[pos] == "]":
+            return items if pos == end else UNSUPPORTED
+
+        if text[pos] != ",":
+            return UNSUPPORTED
+
+        pos = _skip_whitespace(text, pos + 1)
+
+        # A trailing comma is allowed before the closing bracket
+        if pos == end:
+            return items
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    while text[pos] in _WHITESPACE:
+        pos += 1
+
+    return pos
+
+
+@lru_cache(maxsize=config.ANSWER_PARSE_CACHE_SIZE)
+def normalize_list_like(value: str) -> str:
+    """
+    Normalise a string that starts with "[" and ends with "]": a list literal is joined with ", ", anything that can
+    not be parsed is stripped of brackets and quotes. Results are memoised.
+    """
+
+    parsed = parse_list_literal(value)
+
+    if parsed is UNSUPPORTED:
+        try:
+            parsed = ast.literal_eval(value)
+
+        except Exception:
+            return value.strip("[]").replace("'", "").replace('"', "").strip()
+
+    if isinstance(parsed, list):
+        return ", ".join(str(item) for item in parsed)
+
+    return value
+
+
+def normalize_value(value):
+    """
+    Format an answer for the Excel file and emails: lists and list-like strings are joined with ", " and newlines are replaced with ". ".
+    """
+
+    if isinstance(value, list):
+        return ", ".join(str(item) for item in value)
+
+    if isinstance(value, str):
+        value = value.replace("\r\n", ". ").replace("\n", ". ")
+
+        if value.startswith("[") and value.endswith("]"):
+            return normalize_list_like(value)
+
+    return value
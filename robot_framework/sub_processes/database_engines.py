@@ -0,0 +1,100 @@
+"""
+Process-wide registry of pooled SQLAlchemy engines.
+
+Engines are created lazily the first time a connection string is used and kept until dispose_engines is called,
+so repeated queries during a run reuse the pooled ODBC connections instead of logging in again.
+"""
+
+import urllib.parse
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+from robot_framework import config
+
+
+_engines: dict[str, Engine] = {}
+
+_stats = {
+    "engines_created": 0,
+    "connections_opened": 0,
+    "connections_reused": 0,
+}
+
+
+def get_engine(conn_string: str) -> Engine:
+    """
+    Return the pooled engine for the given connection string, creating it on first use.
+    Plain ODBC connection strings are wrapped in an mssql+pyodbc URL - strings that already are SQLAlchemy URLs
+    (e.g. "sqlite:///forms.db" for a local stand-in) are used as they are.
+    """
+
+    engine = _engines.get(conn_string)
+
+    if engine is None:
+        if "://" in conn_string:
+            url = conn_string
+
+        else:
+            encoded_conn_str = urllib.parse.quote_plus(conn_string)
+            url = f"mssql+pyodbc:///?odbc_connect={encoded_conn_str}"
+
+        engine = create_engine(
+            url,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_POOL_MAX_OVERFLOW,
+            pool_pre_ping=config.DB_POOL_PRE_PING,
+            pool_recycle=config.DB_POOL_RECYCLE_SECONDS,
+        )
+
+        event.listen(engine, "connect", _on_connect)
+        event.listen(engine, "checkout", _on_checkout)
+
+        _engines[conn_string] = engine
+        _stats["engines_created"] += 1
+
+    return engine
+
+
+def dispose_engines() -> None:
+    """
+    Close all pooled connections and forget the registered engines.
+    """
+
+    for engine in _engines.values():
+        engine.dispose()
+
+    _engines.clear()
+
+
+def get_connection_stats() -> dict:
+    """
+    Return a copy of the counters for engines created and connections opened/reused since the last reset.
+    """
+
+    return dict(_stats)
+
+
+def reset_connection_stats() -> None:
+    """
+    Set all connection counters back to zero.
+    """
+
+    for key in _stats:
+        _stats[key] = 0
+
+
+def _on_connect(_dbapi_connection, _connection_record) -> None:
+    """Count every new DBAPI connection, i.e. every ODBC connection setup and login."""
+
+    _stats["connections_opened"] += 1
+
+
+def _on_checkout(_dbapi_connection, connection_record, _connection_proxy) -> None:
+    """Count checkouts that are served by a connection already opened earlier."""
+
+    if connection_record.info.get("checked_out_before"):
+        _stats["connections_reused"] += 1
+
+    else:
+        connection_record.info["checked_out_before"] = True
@@ -0,0 +1,275 @@
+"""
+Asyncio pipeline for the daily email flow.
+
+The synchronous flow in process.process fetches and transforms every submission, renders every email and only then
+starts sending. The pipeline runs the same steps as stages connected by bounded queues:
+
+    fetch -> transform -> group by CPR -> render -> send (send_concurrency workers)
+
+Fetching (decoding) and sending run in worker threads, so rendering the next email overlaps with waiting on SMTP.
+A full queue blocks the stage feeding it, which bounds the memory held between stages. Grouping has to see every
+submission before a CPR's email is complete, so it releases the groups once the transform stage is done.
+
+The run reports its end-to-end time, the send latency per email and, per stage, the time spent waiting for input
+and the time spent blocked on a full output queue.
+"""
+
+import asyncio
+import itertools
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from robot_framework import config
+from robot_framework import instrumentation
+from robot_framework.sub_processes import email_rendering
+from robot_framework.sub_processes import formular_mappings
+from robot_framework.sub_processes import mail_dispatcher
+
+
+SUBJECT = "Ny(e) ESQ besvarelse(r)"
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+@dataclass
+class StageTimings:
+    """Seconds a stage spent waiting for input and blocked on its full output queue, and the items it handled."""
+
+    waiting_for_input: float = 0.0
+    blocked_on_output: float = 0.0
+    items: int = 0
+
+
+@dataclass
+class PipelineResult:
+    """The deliveries of a pipeline run and its timings."""
+
+    deliveries: list = field(default_factory=list)
+    stages: dict[str, StageTimings] = field(default_factory=dict)
+    elapsed_seconds: float = 0.0
+    skipped_forms: int = 0
+
+    def summary(self) -> str:
+        """A one-line-per-stage report of the run."""
+
+        latencies = [delivery.latency_seconds for delivery in self.deliveries]
+
+        lines = [
+            f"Email pipeline sent {sum(1 for delivery in self.deliveries if delivery.ok)} of {len(self.deliveries)} emails in {self.elapsed_seconds:.2f}s"
+            f" - send latency avg {sum(latencies) / len(latencies) if latencies else 0.0:.2f}s, max {max(latencies, default=0.0):.2f}s."
+        ]
+
+        for name, timings in self.stages.items():
+            lines.append(f"  {name:<10} {timings.items:6d} items  waited {timings.waiting_for_input:7.2f}s for input  blocked {timings.blocked_on_output:7.2f}s on output")
+
+        return "\n".join(lines)
+
+
+def email_entry(form: dict, recipient_for: Callable[[dict], str]) -> tuple[str, dict] | None:
+    """
+    Transform a submission for the daily email and return (cpr, entry), or None for roles without an email.
+    """
+
+    role = form["data"]["hvem_udfylder_spoergeskemaet"]
+
+    mapping = formular_mappings.ROLE_MAPPINGS.get(role)
+
+    if mapping is None:
+        return None
+
+    transformed_row = formular_mappings.transform_form_submission(form["entity"]["serial"][0]["value"], form, mapping)
+
+    transformed_row["Tilkoblet email"] = recipient_for(transformed_row)
+
+    return transformed_row["Barnets/Den unges CPR-nummer"], {"form": form, "transformed": transformed_row, "role": role}
+
+
+def run_pipeline(
+    forms: Iterable[dict],
+    recipient_for: Callable[[dict], str],
+    dispatcher: mail_dispatcher.MailDispatcher,
+    send_concurrency: int = config.MAIL_CONNECTIONS,
+    queue_size: int = config.EMAIL_PIPELINE_QUEUE_SIZE,
+    fetch_batch_size: int = config.EMAIL_PIPELINE_FETCH_BATCH_SIZE
+) -> PipelineResult:
+    """
+    Run the pipeline over the decoded submissions and return its deliveries and timings.
+    forms is consumed lazily from a worker thread, so it can be a generator that decodes as it goes.
+    recipient_for returns the email address of a transformed row.
+    """
+
+    return asyncio.run(_run(forms, recipient_for, dispatcher, max(1, send_concurrency), queue_size, fetch_batch_size))
+
+
+async def _run(forms, recipient_for, dispatcher, send_concurrency: int, queue_size: int, fetch_batch_size: int) -> PipelineResult:
+    """Start every stage and wait for all of them."""
+
+    result = PipelineResult(stages={name: StageTimings() for name in ("fetch", "transform", "group", "render", "send")})
+
+    started = time.perf_counter()
+
+    form_queue = asyncio.Queue(maxsize=queue_size)
+    entry_queue = asyncio.Queue(maxsize=queue_size)
+    group_queue = asyncio.Queue(maxsize=queue_size)
+    email_queue = asyncio.Queue(maxsize=queue_size)
+
+    # The dispatcher keeps one SMTP connection per thread, so the send pool size is the number of connections
+    with ThreadPoolExecutor(max_workers=1) as fetch_executor, ThreadPoolExecutor(max_workers=send_concurrency) as send_executor:
+        await asyncio.gather(
+            _fetch(iter(forms), form_queue, fetch_executor, fetch_batch_size, result.stages["fetch"]),
+            _transform(form_queue, entry_queue, recipient_for, result),
+            _group(entry_queue, group_queue, result.stages["group"]),
+            _render(group_queue, email_queue, send_concurrency, result.stages["render"]),
+            *[_send(email_queue, dispatcher, send_executor, result) for _ in range(send_concurrency)]
+        )
+
+    result.elapsed_seconds = time.perf_counter() - started
+
+    return result
+
+
+async def _get(queue: asyncio.Queue, timings: StageTimings):
+    """Take the next item from the queue, counting the wait as input wait."""
+
+    waiting = time.perf_counter()
+
+    item = await queue.get()
+
+    timings.waiting_for_input += time.perf_counter() - waiting
+
+    return item
+
+
+async def _put(queue: asyncio.Queue, item, timings: StageTimings) -> None:
+    """Put an item on the queue, counting the wait as backpressure."""
+
+    blocked = time.perf_counter()
+
+    await queue.put(item)
+
+    timings.blocked_on_output += time.perf_counter() - blocked
+
+
+async def _fetch(forms, output: asyncio.Queue, executor, batch_size: int, timings: StageTimings) -> None:
+    """Pull the submissions from the iterator in batches on a worker thread."""
+
+    loop = asyncio.get_running_loop()
+
+    while True:
+        waiting = time.perf_counter()
+
+        batch = await loop.run_in_executor(executor, lambda: list(itertools.islice(forms, batch_size)))
+
+        timings.waiting_for_input += time.perf_counter() - waiting
+
+        if not batch:
+            break
+
+        for form in batch:
+            await _put(output, form, timings)
+
+        timings.items += len(batch)
+
+    await _put(output, _DONE, timings)
+
+
+async def _transform(source: asyncio.Queue, output: asyncio.Queue, recipient_for, result: PipelineResult) -> None:
+    """Transform each submission into a (cpr, entry) pair, skipping the ones that cannot be transformed."""
+
+    timings = result.stages["transform"]
+
+    while (form := await _get(source, timings)) is not _DONE:
+        try:
+            entry = email_entry(form, recipient_for)
+
+        except Exception as e:
+            print(f"Error processing form: {e}")
+
+            instrumentation.count("forms_failed_transform")
+
+            entry = None
+
+        if entry is None:
+            result.skipped_forms += 1
+
+            continue
+
+        await _put(output, entry, timings)
+
+        timings.items += 1
+
+    await _put(output, _DONE, timings)
+
+
+async def _group(source: asyncio.Queue, output: asyncio.Queue, timings: StageTimings) -> None:
+    """Collect the entries per CPR number and release the groups once every submission has been seen."""
+
+    entries_by_cpr = {}
+
+    while (item := await _get(source, timings)) is not _DONE:
+        cpr, entry = item
+
+        entries_by_cpr.setdefault(cpr, []).append(entry)
+
+    for group in entries_by_cpr.items():
+        await _put(output, group, timings)
+
+        timings.items += 1
+
+    await _put(output, _DONE, timings)
+
+
+async def _render(source: asyncio.Queue, output: asyncio.Queue, consumers: int, timings: StageTimings) -> None:
+    """Render the email of each CPR group."""
+
+    while (group := await _get(source, timings)) is not _DONE:
+        cpr, entries = group
+
+        email = mail_dispatcher.OutgoingEmail(
+            receiver=entries[-1]["transformed"]["Tilkoblet email"],
+            subject=SUBJECT,
+            html_body=email_rendering.render_email(cpr, entries)
+        )
+
+        await _put(output, email, timings)
+
+        timings.items += 1
+
+        # Let the send workers pick up the email before the next one is rendered
+        await asyncio.sleep(0)
+
+    # One end marker per send worker
+    for _ in range(consumers):
+        await _put(output, _DONE, timings)
+
+
+async def _send(source: asyncio.Queue, dispatcher, executor, result: PipelineResult) -> None:
+    """
+    Send emails on the dispatcher from the send pool until the render stage is done. An error the dispatcher does not
+    record itself is recorded on the email's delivery, so the emails still queued are sent.
+    """
+
+    loop = asyncio.get_running_loop()
+
+    timings = result.stages["send"]
+
+    while (email := await _get(source, timings)) is not _DONE:
+        started = time.perf_counter()
+
+        try:
+            delivery = await loop.run_in_executor(executor, dispatcher.send, email)
+
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Error sending email: {e}")
+
+            instrumentation.count("emails_failed")
+
+            delivery = mail_dispatcher.Delivery(email, time.perf_counter() - started, attempts=0, error=e)
+
+        result.deliveries.append(delivery)
+
+        timings.items += 1
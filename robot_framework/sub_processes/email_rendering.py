@@ -0,0 +1,148 @@
+"""
+Rendering of the daily ESQ emails.
+
+Each role has a section template, compiled once from its formular mapping: the ordered (label, column) rows of the
+answer table, with the static HTML around every value - escaped labels included - prebuilt as strings. Rendering a
+section only escapes the values and appends the parts to a list, and an email is a single "".join over the parts of
+all its sections. Values are HTML-escaped, so free-text answers containing <, > or & are shown as written instead of
+breaking the table.
+
+The HTML is the same as the table_att/format_html_table code it replaces, apart from the escaping.
+"""
+
+import functools
+
+from dataclasses import dataclass
+from html import escape
+
+from robot_framework.sub_processes import formular_mappings
+
+
+YOUTH_ROLE = "Ung/selvbesvarelse"
+PARENT_ROLE = "Forælder (inklusiv plejeforældre)"
+
+TABLE_START = '<table border="1" cellpadding="5" cellspacing="0" style="border-collapse: collapse;">\n'
+TABLE_END = '</table>'
+
+ROW_END = '</td></tr>\n'
+
+# (label, column) rows shown for both roles, before the role specific rows
+COMMON_ROWS = (
+    ("Udfyldt", "Gennemført"),
+    ("Behandling", "Behandling"),
+    ("Barnets/Den unges navn", "Barnets/Den unges navn"),
+    ("Barnets/Den unges CPR-nummer", "Barnets/Den unges CPR-nummer"),
+    ("Barnets/Den unges alder", "Barnets/Den unges alder"),
+)
+
+PARENT_ROWS = (
+    ("Forælder navn", "Navn"),
+    ("Forælder cpr-Nummer", "CPR-nummer"),
+)
+
+PARENT_FREE_TEXT = (
+    "Hvad var rigtig godt ved behandlingen?",
+    "Var der noget du ikke synes om eller noget der kan forbedres?",
+    "Er der andet du ønsker at fortælle os, om det forløb I har haft?",
+)
+
+YOUTH_FREE_TEXT = (
+    "Her er plads til, at du kan skrive, hvad du tænker eller føler om behandlingen",
+)
+
+SCORE_COLUMN = "Average answer score"
+
+
+def row_prefix(label: str) -> str:
+    """The static HTML of a table row up to its value."""
+
+    return f'  <tr><td><strong>{escape(label)}</strong></td><td>'
+
+
+def escape_value(value) -> str:
+    """Escape a cell value - values are shown the way the previous f-string rendering showed them, None included."""
+
+    return escape(str(value))
+
+
+@dataclass(frozen=True)
+class SectionTemplate:
+    """
+    The compiled section of one role - the static head and tail, and a (column, row prefix) pair per table row.
+    """
+
+    head: str
+    rows: tuple[tuple[str, str], ...]
+    tail: str = f"{TABLE_END}<br><br>"
+
+    def render_into(self, parts: list[str], transformed_row: dict) -> None:
+        """Append the parts of the section for one transformed row."""
+
+        parts.append(self.head)
+
+        for column, prefix in self.rows:
+            parts.append(prefix)
+            parts.append(escape_value(transformed_row.get(column)))
+            parts.append(ROW_END)
+
+        parts.append(self.tail)
+
+
+def compile_section(role: str, mapping: dict) -> SectionTemplate:
+    """Compile the section template of a role from its formular mapping."""
+
+    if role == PARENT_ROLE:
+        columns = list(COMMON_ROWS) + list(PARENT_ROWS)
+        columns += [(question, question) for question in mapping["spoergsmaal_foraelder_tabel"].values()]
+        columns += [(text, text) for text in PARENT_FREE_TEXT]
+
+    elif role == YOUTH_ROLE:
+        columns = list(COMMON_ROWS)
+        columns += [(question, question) for question in mapping["spoergsmaal_barn_tabel"].values()]
+        columns += [(text, text) for text in YOUTH_FREE_TEXT]
+
+    else:
+        raise ValueError(f"No email section for role '{role}'")
+
+    columns.append((SCORE_COLUMN, SCORE_COLUMN))
+
+    # A label shown twice would have been a single dict entry in the table_att rendering - keep the last one
+    rows = {label: (column, row_prefix(label)) for label, column in columns}
+
+    return SectionTemplate(
+        head=f"<p><strong>Udfylder rolle:</strong> {escape(role)}</p><br>{TABLE_START}",
+        rows=tuple(rows.values())
+    )
+
+
+@functools.cache
+def section_template(role: str) -> SectionTemplate:
+    """The compiled section template of the role, compiled on first use."""
+
+    if role == PARENT_ROLE:
+        return compile_section(role, formular_mappings.center_for_trivsel_esq_foraelder_mapping)
+
+    return compile_section(role, formular_mappings.center_for_trivsel_esq_barn_mapping)
+
+
+def render_email(cpr: str, entries: list[dict]) -> str:
+    """
+    Render the email body for one CPR number from its entries - dicts with the "role" and "transformed" row
+    of a submission, as collected by the daily flow.
+    """
+
+    parts = [f"<p>Ny(e) besvarelse(r) til ESQ formular for barn med CPR: <strong>{escape_value(cpr)}</strong></p>"]
+
+    for position, entry in enumerate(entries):
+        if position:
+            parts.append("<hr>")
+
+        section_template(entry["role"]).render_into(parts, entry["transformed"])
+
+    return "".join(parts)
+
+
+def render_emails(entries_by_cpr: dict[str, list[dict]]) -> dict[str, str]:
+    """Render the email bodies of a whole run, keyed by CPR number."""
+
+    return {cpr: render_email(cpr, entries) for cpr, entries in entries_by_cpr.items()}
@@ -0,0 +1,83 @@
+"""
+Constant-memory workbook writer for the create-new path.
+
+Rows are written one at a time to an openpyxl write-only sheet straight from a row generator, so no DataFrame and no
+workbook object model is built. The workbook is saved into a SpooledTemporaryFile, which stays in memory for small
+workbooks and moves to a temporary file on disk past a size threshold. The caller gets a file-like object positioned
+at the start, ready to be handed to the upload.
+"""
+
+from tempfile import SpooledTemporaryFile
+from typing import Iterable
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from robot_framework import config
+from robot_framework import instrumentation
+from robot_framework.sub_processes import sharepoint_upload
+
+
+def write_workbook(
+    rows: Iterable[dict],
+    sheet_name: str = "Besvarelser",
+    spool_threshold: int = config.EXCEL_SPOOL_THRESHOLD_BYTES
+) -> SpooledTemporaryFile:
+    """
+    Write dict rows to a single-sheet workbook and return it as a file-like object.
+    The header is taken from the keys of the first row - like DataFrame.to_excel, an empty input gives an empty sheet.
+    The caller is responsible for closing the returned file.
+    """
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+
+    header = None
+
+    for row in rows:
+        if header is None:
+            header = list(row)
+
+            sheet.append([_header_cell(sheet, column) for column in header])
+
+        sheet.append([row.get(column) for column in header])
+
+    return save_workbook(workbook, spool_threshold)
+
+
+def save_workbook(workbook: Workbook, spool_threshold: int = config.EXCEL_SPOOL_THRESHOLD_BYTES) -> SpooledTemporaryFile:
+    """
+    Save a workbook to a SpooledTemporaryFile positioned at the start. The caller is responsible for closing it.
+    """
+
+    workbook_file = SpooledTemporaryFile(max_size=spool_threshold)  # pylint: disable=consider-using-with
+
+    with instrumentation.span("workbook_io"):
+        workbook.save(workbook_file)
+
+    workbook_file.seek(0)
+
+    return workbook_file
+
+
+def _header_cell(sheet, value: str) -> WriteOnlyCell:
+    """A bold header cell, matching the header style of DataFrame.to_excel."""
+
+    cell = WriteOnlyCell(sheet, value=value)
+    cell.font = Font(bold=True)
+
+    return cell
+
+
+def upload_workbook(sharepoint_api, workbook_file, file_name: str, folder_name: str) -> None:
+    """
+    Upload a workbook file object to SharePoint and close it. Large workbooks are uploaded in chunks.
+    """
+
+    try:
+        with instrumentation.span("sharepoint_upload"):
+            sharepoint_upload.upload_file(sharepoint_api, workbook_file, file_name, folder_name)
+
+    finally:
+        workbook_file.close()
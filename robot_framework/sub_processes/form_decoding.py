@@ -0,0 +1,122 @@
+"""
+Decoding of the raw form_data JSON stored in the Forms table.
+
+loads uses orjson when it is installed and falls back to the standard library json module otherwise.
+FormSchema adds a typed, schema-targeted mode: it keeps only the data fields referenced by the formular mappings plus
+entity.serial/created/completed, and recognises purged submissions from a cheap substring check before parsing.
+A form_data document that is valid JSON but not an object is rejected with a ValueError, like invalid JSON.
+"""
+
+import json
+
+try:
+    import orjson
+
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+from robot_framework.sub_processes import formular_mappings
+
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+# The entity fields read by transform_form_submission and build_df
+ENTITY_FIELDS = ("serial", "created", "completed")
+
+# The data field deciding which mapping a submission uses
+ROLE_FIELD = "hvem_udfylder_spoergeskemaet"
+
+
+def loads(raw: str | bytes):
+    """
+    Decode a JSON document with the fastest available backend.
+    Documents the fast backend rejects (e.g. integers wider than 64 bits) are retried with the standard library,
+    so the result - and the json.JSONDecodeError raised for invalid JSON - is the same as json.loads.
+    """
+
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+
+        except orjson.JSONDecodeError:
+            pass
+
+    return json.loads(raw)
+
+
+def loads_document(raw: str | bytes) -> dict:
+    """
+    Decode a form_data document, which must be a JSON object.
+    Raises json.JSONDecodeError for invalid JSON and ValueError for any other JSON value.
+    """
+
+    parsed = loads(raw)
+
+    if not isinstance(parsed, dict):
+        raise ValueError(f"Expected form_data to be a JSON object, but got {type(parsed).__name__}")
+
+    return parsed
+
+
+def is_purged(raw: str, parsed: dict | None = None) -> bool:
+    """
+    Check whether a raw form_data document is a purged submission, i.e. has a top-level "purged" key.
+    Documents that do not contain the string "purged" at all are rejected without being parsed.
+    """
+
+    if '"purged"' not in raw:
+        return False
+
+    if parsed is None:
+        try:
+            parsed = loads(raw)
+
+        except json.JSONDecodeError:
+            return False
+
+    return isinstance(parsed, dict) and "purged" in parsed
+
+
+class FormSchema:
+    """
+    The subset of a submission the robot reads: the listed data fields and entity.serial/created/completed.
+    decode returns a submission dict with the same shape as the full document, restricted to those fields,
+    so it can be passed to transform_form_submission and build_df unchanged.
+    """
+
+    def __init__(self, data_fields):
+        self.data_fields = tuple(dict.fromkeys(data_fields))
+
+    @classmethod
+    def from_mappings(cls, *mappings: dict) -> "FormSchema":
+        """Build the schema covering every source field referenced by the given formular mappings."""
+
+        data_fields = [ROLE_FIELD]
+
+        for mapping in mappings:
+            data_fields.extend(key for key in mapping if key not in formular_mappings.METADATA_KEYS)
+
+        return cls(data_fields)
+
+    def decode(self, raw: str) -> dict | None:
+        """
+        Decode a raw form_data document into the schema's fields.
+        Returns None for purged submissions, raises json.JSONDecodeError for invalid JSON and ValueError for a
+        document that is not a JSON object.
+        """
+
+        # Fast path - a document without the string "purged" can never be purged, so it is projected right away
+        might_be_purged = '"purged"' in raw
+
+        parsed = loads_document(raw)
+
+        if might_be_purged and is_purged(raw, parsed):
+            return None
+
+        data = parsed.get("data") or {}
+        entity = parsed.get("entity") or {}
+
+        return {
+            "data": {field: data[field] for field in self.data_fields if field in data},
+            "entity": {field: entity[field] for field in ENTITY_FIELDS if field in entity},
+        }
@@ -4,10 +4,21 @@ file to contain formular mappings
 Ideally we wouldn't have to hardcode the mappings, but we the column names from the API are inconsistent in spelling and casing - therefore we need to map them to the correct column names in the Excel file.
 """
 
-import ast
-
+from collections import namedtuple
 from datetime import datetime
 
+from robot_framework.sub_processes import answer_parsing
+
+# Mapping keys holding metadata about the mapping instead of a source field
+INVERTED_KEYS = "inverted_keys"
+METADATA_KEYS = {INVERTED_KEYS}
+
+ANSWER_SCORES = {
+    "Ikke sandt": 0,
+    "Delvist sandt": 1,
+    "Sandt": 2,
+}
+
 center_for_trivsel_esq_barn_mapping = {
     "serial": "Serial number",
     "created": "Oprettet",
@@ -28,6 +39,7 @@ center_for_trivsel_esq_barn_mapping = {
         "spg_barn_7": 'Efter behandlingen har jeg fået mere lyst til at være sammen med mine venner',
     },
     "her_er_plads_til_at_du_kan_skrive_hvad_du_taenker_eller_foeler_o": "Her er plads til, at du kan skrive, hvad du tænker eller føler om behandlingen",
+    "inverted_keys": {"spg_barn_6"},
 }
 
 center_for_trivsel_esq_foraelder_mapping = {
@@ -57,102 +69,114 @@ center_for_trivsel_esq_foraelder_mapping = {
     "hvad_var_rigtig_godt_ved_forloebet": "Hvad var rigtig godt ved behandlingen?",
     "var_der_noget_du_ikke_syntes_om_eller_noget_der_kan_forbedres": "Var der noget du ikke synes om eller noget der kan forbedres?",
     "er_der_andet_du_oensker_at_fortaelle_os_om_det_forloeb_du_har_haft": "Er der andet du ønsker at fortælle os, om det forløb I har haft?",
+    "inverted_keys": {"spg_foraelder_9", "spg_foraelder_10"},
 }
 
+# The mapping of each role that fills in the form
+ROLE_MAPPINGS = {
+    "Ung/selvbesvarelse": center_for_trivsel_esq_barn_mapping,
+    "Forælder (inklusiv plejeforældre)": center_for_trivsel_esq_foraelder_mapping,
+}
 
-def transform_form_submission(form_serial_number, form: dict, mapping: dict) -> dict:
+
+FieldPlan = namedtuple("FieldPlan", ["source_key", "target_column", "normalize", "score_weight"])
+
+TablePlan = namedtuple("TablePlan", ["table_key", "fields"])
+
+# Compiled plans keyed by id(mapping) - the mapping itself is kept alongside so its id can not be reused
+_compiled_plans: dict[int, tuple[dict, tuple]] = {}
+
+
+def compile_mapping(mapping: dict) -> tuple:
     """
-    Transforms a form submission dictionary using the provided mapping.
-    Adds 'Average answer score' based on responses.
+    Compile a formular mapping into a flat transformation plan, once per mapping.
+    The plan is a tuple of TablePlan groups in mapping order - table_key is None for a run of flat fields and the
+    source key of the nested table otherwise. Every field carries its target column, normalizer and score weight
+    (None for unscored fields, 1 for scored questions and -1 for the questions listed under INVERTED_KEYS).
+    The plan is cached, so a mapping must not be changed after it has been used.
     """
 
-    transformed = {}
-    form_data = form.get("data", {})
+    cached = _compiled_plans.get(id(mapping))
 
-    # For scoring
-    total_score = 0
-    score_count = 0
+    if cached is not None and cached[0] is mapping:
+        return cached[1]
+
+    inverted_keys = mapping.get(INVERTED_KEYS, ())
 
-    # Identify inverted keys per mapping
-    inverted_keys = set()
-    if mapping is center_for_trivsel_esq_barn_mapping:
-        inverted_keys = {"spg_barn_6"}
-    elif mapping is center_for_trivsel_esq_foraelder_mapping:
-        inverted_keys = {"spg_foraelder_9", "spg_foraelder_10"}
-
-    answer_scores = {
-        "Ikke sandt": 0,
-        "Delvist sandt": 1,
-        "Sandt": 2,
-    }
-
-    inverted_answer_scores = {
-        "Ikke sandt": 0,
-        "Delvist sandt": -1,
-        "Sandt": -2,
-    }
+    groups = []
 
     for source_key, target in mapping.items():
-        if isinstance(target, dict):  # Handle nested mapping like spoergsmaal_barn_tabel
-            nested_data = form_data.get(source_key, {})
+        if source_key in METADATA_KEYS:
+            continue
+
+        if isinstance(target, dict):  # Nested mapping like spoergsmaal_barn_tabel
+            fields = tuple(
+                FieldPlan(nested_key, nested_target_column, answer_parsing.normalize_value, -1 if nested_key in inverted_keys else 1)
+                for nested_key, nested_target_column in target.items()
+            )
 
-            if not isinstance(nested_data, dict):
-                raise TypeError(
-                    f"Expected nested data for '{source_key}' to be a dict, but got {type(nested_data).__name__}"
-                )
+            groups.append(TablePlan(source_key, fields))
 
-            for nested_key, nested_target_column in target.items():
-                value = nested_data.get(nested_key, None)
+        else:  # Flat field - consecutive flat fields share a group
+            field = FieldPlan(source_key, target, answer_parsing.normalize_value, None)
 
-                # Convert answers to scores
-                if value in answer_scores:
-                    if nested_key in inverted_keys:
-                        total_score += inverted_answer_scores[value]
+            if groups and groups[-1].table_key is None:
+                groups[-1] = TablePlan(None, groups[-1].fields + (field,))
 
-                    else:
-                        total_score += answer_scores[value]
+            else:
+                groups.append(TablePlan(None, (field,)))
 
-                    score_count += 1
+    plan = tuple(groups)
 
-                # Standard formatting logic
-                if isinstance(value, list):
-                    value = ", ".join(str(item) for item in value)
+    _compiled_plans[id(mapping)] = (mapping, plan)
 
-                elif isinstance(value, str):
-                    value = value.replace("\r\n", ". ").replace("\n", ". ")
+    return plan
 
-                    if value.startswith("[") and value.endswith("]"):
-                        try:
-                            parsed = ast.literal_eval(value)
 
-                            if isinstance(parsed, list):
-                                value = ", ".join(str(item) for item in parsed)
+def table_source(form_data: dict, table_key: str | None) -> dict:
+    """
+    Return the dict the fields of a compiled table are read from - the form data itself for flat fields, or the
+    nested table under table_key.
+    """
 
-                        except Exception:
-                            value = value.strip("[]").replace("'", "").replace('"', "").strip()
+    if table_key is None:
+        return form_data
 
-                transformed[nested_target_column] = value
+    source = form_data.get(table_key, {})
 
-        else:  # Handle flat fields
-            value = form_data.get(source_key, None)
+    if not isinstance(source, dict):
+        raise TypeError(
+            f"Expected nested data for '{table_key}' to be a dict, but got {type(source).__name__}"
+        )
+
+    return source
+
+
+def transform_form_submission(form_serial_number, form: dict, mapping: dict) -> dict:
+    """
+    Transforms a form submission dictionary using the provided mapping.
+    Adds 'Average answer score' based on responses.
+    """
 
-            if isinstance(value, list):
-                value = ", ".join(str(item) for item in value)
+    transformed = {}
+    form_data = form.get("data", {})
 
-            elif isinstance(value, str):
-                value = value.replace("\r\n", ". ").replace("\n", ". ")
+    # For scoring
+    total_score = 0
+    score_count = 0
 
-                if value.startswith("[") and value.endswith("]"):
-                    try:
-                        parsed = ast.literal_eval(value)
+    for table_key, fields in compile_mapping(mapping):
+        source = table_source(form_data, table_key)
 
-                        if isinstance(parsed, list):
-                            value = ", ".join(str(item) for item in parsed)
+        for source_key, target_column, normalize, score_weight in fields:
+            value = source.get(source_key, None)
 
-                    except Exception:
-                        value = value.strip("[]").replace("'", "").replace('"', "").strip()
+            # Convert answers to scores
+            if score_weight is not None and value in ANSWER_SCORES:
+                total_score += ANSWER_SCORES[value] * score_weight
+                score_count += 1
 
-            transformed[target] = value
+            transformed[target_column] = normalize(value)
 
     # Dates from "entity"
     try:
@@ -1,58 +1,89 @@
 """This module contains helper functions."""
 
-import json
-import urllib.parse
+from datetime import date, datetime, time, timedelta
 
-from typing import Dict, Any
-
-import pandas as pd
-
-from sqlalchemy import create_engine
+from typing import Dict, Any, Iterator
 
 from OpenOrchestrator.orchestrator_connection.connection import OrchestratorConnection
 
+from robot_framework import instrumentation
+from robot_framework import run_cache
+from robot_framework.sub_processes import database_engines
+from robot_framework.sub_processes import email_rendering
+from robot_framework.sub_processes import form_decoding
 from robot_framework.sub_processes import formular_mappings
 
 
-def get_forms_data(
-    conn_string: str,
+# The table holding the journalized form submissions
+FORMS_TABLE = "[RPA].[journalizing].[Forms]"
+
+# Number of rows pulled from the cursor and decoded at a time
+DEFAULT_BATCH_SIZE = 500
+
+
+# How form_submitted_date is filtered depends on its SQL type, which submitted_date_type looks up once per database:
+#   DATETIME_TYPES      - half-open ranges on the raw column, which select exactly the rows CAST(... AS date) does
+#   datetimeoffset      - raw comparisons are made in UTC, not in the stored offset, so a range widened by a day on each
+#                         side lets SQL Server seek the index and the exact CAST filter is applied to the rows it finds
+#   anything else, or an unknown type - the CAST filters the query has always used
+# Local SQLite stand-ins store the column as ISO formatted text, which compares like a datetime but must be selected
+# as it is, since SQLite turns CAST(... AS datetime) into a number.
+DATETIME_TYPES = ("datetime", "datetime2", "smalldatetime", "date", "iso_text")
+DATETIMEOFFSET_TYPE = "datetimeoffset"
+ISO_TEXT_TYPE = "iso_text"
+
+_column_types: dict[tuple[str, str], str | None] = {}
+
+
+def build_forms_query(
     form_type: str,
-    target_date: str = "",
-    start_date: str = "",
-    end_date: str = ""
-) -> list[dict]:
+    target_date: str | date = "",
+    start_date: str | date = "",
+    end_date: str | date = "",
+    since: datetime | None = None,
+    table: str = "",
+    column_type: str | None = None
+) -> tuple[str, tuple]:
     """
-    Retrieve form_data['data'] for all matching submissions for the given form type.
-    Supports either:
-      - exact date (target_date)
-      - date range (start_date + end_date)
-      - no date filter (all submissions for form_type)
-    Skips entries marked as purged.
+    Build the query and parameters for fetching submissions of the given form type.
+      - target_date: submissions of that day
+      - start_date + end_date: submissions from start to end, both days included
+    which selects exactly the same rows as CAST(form_submitted_date AS date) = day / BETWEEN start AND end.
+    column_type is the SQL type of form_submitted_date - for datetime types the filters are half-open ranges on the
+    raw column (day <= form_submitted_date < day + 1), so SQL Server can seek an index on (form_type, form_submitted_date).
+    since additionally restricts the result to rows submitted at or after the given point in time.
     """
 
     where_clause = ""
 
     # Build query depending on which filter type is used
     if start_date and end_date:
-        where_clause = "AND CAST(form_submitted_date AS date) BETWEEN ? AND ?"
-
-        query_params = (form_type, start_date, end_date)
+        where_clause, query_params = _date_range_filter(column_type, start_date, end_date)
 
     elif target_date:
-        where_clause = "AND CAST(form_submitted_date AS date) = ?"
-
-        query_params = (form_type, target_date)
+        where_clause, query_params = _date_range_filter(column_type, target_date, target_date)
 
     else:
-        query_params = (form_type,)
+        query_params = ()
+
+    query_params = (form_type,) + query_params
+
+    if since is not None:
+        since_clause, since_params = _since_filter(column_type, since)
+
+        where_clause += since_clause
+
+        query_params += since_params
+
+    submitted_column = "form_submitted_date" if column_type == ISO_TEXT_TYPE else "CAST(form_submitted_date AS datetime) AS form_submitted_date"
 
     query = f"""
         SELECT
             form_id,
             form_data,
-            CAST(form_submitted_date AS datetime) AS form_submitted_date
+            {submitted_column}
         FROM
-            [RPA].[journalizing].[Forms]
+            {table or FORMS_TABLE}
         WHERE
             form_type = ?
             AND form_data IS NOT NULL
@@ -62,42 +93,268 @@ def get_forms_data(
             form_submitted_date DESC
     """
 
-    # Create SQLAlchemy engine
-    encoded_conn_str = urllib.parse.quote_plus(conn_string)
-    engine = create_engine(f"mssql+pyodbc:///?odbc_connect={encoded_conn_str}")
+    return query, query_params
+
+
+def _date_range_filter(column_type: str | None, start: str | date, end: str | date) -> tuple[str, tuple]:
+    """The condition and parameters selecting the rows submitted from start to end, both days included."""
+
+    if column_type in DATETIME_TYPES:
+        return "AND form_submitted_date >= ? AND form_submitted_date < ?", (start_of_day(start), start_of_day(end, days_after=1))
+
+    if column_type == DATETIMEOFFSET_TYPE:
+        return (
+            "AND form_submitted_date >= ? AND form_submitted_date < ? AND CAST(form_submitted_date AS date) BETWEEN ? AND ?",
+            (start_of_day(start, days_after=-1), start_of_day(end, days_after=2), to_date(start), to_date(end))
+        )
+
+    return "AND CAST(form_submitted_date AS date) BETWEEN ? AND ?", (to_date(start), to_date(end))
+
+
+def _since_filter(column_type: str | None, since: datetime) -> tuple[str, tuple]:
+    """The condition and parameters selecting the rows whose selected form_submitted_date is at or after since."""
+
+    if column_type in DATETIME_TYPES:
+        return " AND form_submitted_date >= ?", (since,)
+
+    if column_type == DATETIMEOFFSET_TYPE:
+        return " AND form_submitted_date >= ? AND CAST(form_submitted_date AS datetime) >= ?", (since - timedelta(days=1), since)
+
+    return " AND CAST(form_submitted_date AS datetime) >= ?", (since,)
+
+
+def submitted_date_type(conn_string: str, table: str = "") -> str | None:
+    """
+    Return the SQL type of form_submitted_date in the Forms table, looked up once per connection string.
+    Local SQLAlchemy stand-ins (e.g. SQLite) are assumed to store the column as ISO formatted text.
+    Returns None if the type could not be read, so the query falls back to the CAST filters.
+    """
+
+    table = table or FORMS_TABLE
+
+    key = (conn_string, table)
+
+    if key in _column_types:
+        return _column_types[key]
+
+    engine = database_engines.get_engine(conn_string)
+
+    if engine.dialect.name != "mssql":
+        _column_types[key] = ISO_TEXT_TYPE
+
+        return ISO_TEXT_TYPE
+
+    # [database].[schema].[table]
+    database, schema, table_name = (part.strip("[]") for part in table.split("."))
+
+    query = f"""
+        SELECT DATA_TYPE
+        FROM [{database}].INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ? AND COLUMN_NAME = 'form_submitted_date'
+    """
 
     try:
-        df = pd.read_sql(sql=query, con=engine, params=query_params)
+        with engine.connect() as connection:
+            column_type = connection.exec_driver_sql(query, (schema, table_name)).scalar()
 
     except Exception as e:
-        print("Error during pd.read_sql:", e)
+        print(f"Could not read the type of form_submitted_date - using CAST filters: {e}")
+
+        column_type = None
+
+    _column_types[key] = column_type.lower() if column_type else None
+
+    return _column_types[key]
+
+
+def to_date(value: str | date) -> date:
+    """Return the day of a date, datetime or ISO formatted string."""
+
+    if isinstance(value, datetime):
+        return value.date()
+
+    if isinstance(value, date):
+        return value
+
+    return date.fromisoformat(str(value)[:10])
+
+
+def to_datetime(value: str | datetime) -> datetime:
+    """Return a submission time as a datetime - the Forms query returns datetimes, SQLite stand-ins ISO formatted text."""
+
+    if isinstance(value, datetime):
+        return value
+
+    return datetime.fromisoformat(str(value))
+
+
+def start_of_day(value: str | date, days_after: int = 0) -> datetime:
+    """
+    Return midnight of the given day (a date, datetime or ISO formatted string), optionally shifted a number of days ahead.
+    """
+
+    return datetime.combine(to_date(value) + timedelta(days=days_after), time.min)
+
+
+def iter_form_rows(
+    conn_string: str,
+    form_type: str,
+    target_date: str | date = "",
+    start_date: str | date = "",
+    end_date: str | date = "",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    since: datetime | None = None,
+    cache=None
+) -> Iterator[list]:
+    """
+    Yield the raw (form_id, form_data, form_submitted_date) rows for all matching submissions, newest first,
+    in batches of at most batch_size rows pulled straight from the cursor.
+    If a SubmissionCache is given, it is first synced with the rows newer than its high-water mark and the rows are then served from the cache.
+    """
+
+    if cache is not None:
+        cache.sync(conn_string, form_type)
+
+        yield from cache.iter_rows(form_type, target_date=target_date, start_date=start_date, end_date=end_date, batch_size=batch_size)
+
+        return
+
+    query, query_params = build_forms_query(
+        form_type,
+        target_date=target_date,
+        start_date=start_date,
+        end_date=end_date,
+        since=since,
+        column_type=submitted_date_type(conn_string)
+    )
+
+    # Reuse the pooled engine for this connection string
+    engine = database_engines.get_engine(conn_string)
+
+    found_rows = False
+
+    try:
+        with engine.connect() as connection:
+            result = connection.execution_options(yield_per=batch_size).exec_driver_sql(query, query_params)
+
+            for batch in result.partitions(batch_size):
+                found_rows = True
+
+                yield batch
+
+    except Exception as e:
+        print("Error while reading form submissions:", e)
 
         raise
 
-    if df.empty:
+    if not found_rows:
         print("No submissions found for the given date(s).")
 
-        return []
+
+def iter_forms_data(
+    conn_string: str,
+    form_type: str,
+    target_date: str | date = "",
+    start_date: str | date = "",
+    end_date: str | date = "",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    cache=None
+) -> Iterator[dict]:
+    """
+    Yield the parsed form_data for all matching submissions for the given form type, newest first.
+    Rows are pulled from the cursor and decoded batch_size at a time, so only a single batch is held in memory.
+    Supports either:
+      - exact date (target_date)
+      - date range (start_date + end_date)
+      - no date filter (all submissions for form_type)
+    Skips entries marked as purged.
+    """
+
+    for batch in iter_form_rows(conn_string, form_type, target_date=target_date, start_date=start_date, end_date=end_date, batch_size=batch_size, cache=cache):
+        yield from decode_form_rows(batch)
+
+
+def decode_form_rows(rows, schema: form_decoding.FormSchema | None = None) -> list[dict]:
+    """
+    Decode the form_data column of a batch of rows, skipping purged entries, invalid JSON and documents that are
+    not JSON objects.
+    If a FormSchema is given, each submission is reduced to the fields in the schema.
+    """
 
     extracted_data = []
 
-    for _, row in df.iterrows():
-        try:
-            parsed = json.loads(row["form_data"])
+    skipped = 0
+
+    with instrumentation.span("json_decode"):
+        for row in rows:
+            try:
+                if schema is not None:
+                    parsed = schema.decode(row.form_data)
+
+                    if parsed is not None:
+                        extracted_data.append(parsed)
+
+                    else:
+                        skipped += 1
+
+                    continue
 
-            if "purged" not in parsed:
-                extracted_data.append(parsed)
+                parsed = form_decoding.loads_document(row.form_data)
 
-        except json.JSONDecodeError:
-            print("Invalid JSON in form_data, skipping row.")
+                if "purged" not in parsed:
+                    extracted_data.append(parsed)
+
+                else:
+                    skipped += 1
+
+            # json.JSONDecodeError is a ValueError
+            except ValueError as e:
+                print(f"Invalid JSON in form_data, skipping row: {e}")
+
+                instrumentation.count("invalid_json_rows")
+
+    instrumentation.count("purged_rows_skipped", skipped)
 
     return extracted_data
 
 
-def build_df(submissions, role, mapping):
+def get_forms_data(
+    conn_string: str,
+    form_type: str,
+    target_date: str | date = "",
+    start_date: str | date = "",
+    end_date: str | date = "",
+    cache=None
+) -> list[dict]:
+    """
+    Retrieve form_data['data'] for all matching submissions for the given form type.
+    Thin wrapper collecting iter_forms_data into a list - prefer iter_forms_data for large histories.
+    """
+
+    return list(iter_forms_data(conn_string, form_type, target_date=target_date, start_date=start_date, end_date=end_date, cache=cache))
+
+
+def build_df(submissions, role, mapping, columnar: bool = False):
     """
     Build a DataFrame from the given submissions and mapping for the specified role.
     The role determines which mapping to use and which submissions to include.
+    With columnar=True the DataFrame is built column by column with vectorized operations - the result is identical.
+    """
+
+    # pandas is imported here rather than at module load, so runs that build no DataFrame never pay for it
+    if columnar:
+        from robot_framework.sub_processes import columnar_transform  # pylint: disable=import-outside-toplevel
+
+        return columnar_transform.build_df_columnar(submissions, role, mapping)
+
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    return pd.DataFrame(transform_submissions(submissions, role, mapping))
+
+
+def transform_submissions(submissions, role, mapping) -> list[dict]:
+    """
+    Transform the submissions made by the given role with the mapping, keeping their order.
     """
 
     rows = []
@@ -110,22 +367,24 @@ def build_df(submissions, role, mapping):
 
         rows.append(formular_mappings.transform_form_submission(serial, submission, mapping))
 
-    return pd.DataFrame(rows)
+    return rows
 
 
 def format_html_table(table_att: dict) -> str:
     """
-    Create an HTML table from a dictionary of attributes.
+    Create an HTML table from a dictionary of attributes. Keys and values are HTML-escaped.
     """
 
-    html = '<table border="1" cellpadding="5" cellspacing="0" style="border-collapse: collapse;">\n'
+    parts = [email_rendering.TABLE_START]
 
     for key, value in table_att.items():
-        html += f'  <tr><td><strong>{key}</strong></td><td>{value}</td></tr>\n'
+        parts.append(email_rendering.row_prefix(key))
+        parts.append(email_rendering.escape_value(value))
+        parts.append(email_rendering.ROW_END)
 
-    html += '</table>'
+    parts.append(email_rendering.TABLE_END)
 
-    return html
+    return "".join(parts)
 
 
 def get_credentials_and_constants(orchestrator_connection: OrchestratorConnection) -> Dict[str, Any]:
@@ -133,15 +392,17 @@ def get_credentials_and_constants(orchestrator_connection: OrchestratorConnectio
     Retrieve necessary credentials and constants from the orchestrator connection.
     """
 
+    settings = run_cache.get(orchestrator_connection)
+
     try:
         credentials = {
-            "go_api_endpoint": orchestrator_connection.get_constant('go_api_endpoint').value,
-            "go_api_username": orchestrator_connection.get_credential('go_api').username,
-            "go_api_password": orchestrator_connection.get_credential('go_api').password,
-            "os2_api_key": orchestrator_connection.get_credential('os2_api').password,
-            "sql_conn_string": orchestrator_connection.get_constant('DbConnectionString').value,
-            "journalizing_tmp_path": orchestrator_connection.get_constant('journalizing_tmp_path').value,
-            "rpa_mail": orchestrator_connection.get_constant('E-mail').value,
+            "go_api_endpoint": settings.get_constant('go_api_endpoint').value,
+            "go_api_username": settings.get_credential('go_api').username,
+            "go_api_password": settings.get_credential('go_api').password,
+            "os2_api_key": settings.get_credential('os2_api').password,
+            "sql_conn_string": settings.get_constant('DbConnectionString').value,
+            "journalizing_tmp_path": settings.get_constant('journalizing_tmp_path').value,
+            "rpa_mail": settings.get_constant('E-mail').value,
         }
 
         return credentials
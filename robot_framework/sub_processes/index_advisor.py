@@ -0,0 +1,130 @@
+"""
+Optional index advisor for the Forms table.
+
+get_forms_data filters on form_type and a half-open range on form_submitted_date, and reads form_id and form_data.
+A nonclustered index on (form_type, form_submitted_date) including those two columns lets SQL Server answer the
+daily and monthly queries with an index seek instead of scanning the form type's whole history.
+
+The robot never creates the index itself - run this module by hand to check the table and print the suggested DDL:
+
+    python -m robot_framework.sub_processes.index_advisor "<odbc connection string>"
+"""
+
+import sys
+
+from robot_framework.sub_processes import database_engines
+from robot_framework.sub_processes import helper_functions
+
+
+COVERING_INDEX_NAME = "IX_Forms_form_type_form_submitted_date"
+
+KEY_COLUMNS = ("form_type", "form_submitted_date")
+INCLUDED_COLUMNS = ("form_id", "form_data")
+
+
+def covering_index_ddl(table: str = "", index_name: str = COVERING_INDEX_NAME) -> str:
+    """
+    Return the CREATE INDEX statement for the covering index used by the Forms query.
+    """
+
+    table = table or helper_functions.FORMS_TABLE
+
+    return (
+        f"CREATE NONCLUSTERED INDEX [{index_name}]\n"
+        f"    ON {table} ({KEY_COLUMNS[0]}, {KEY_COLUMNS[1]} DESC)\n"
+        f"    INCLUDE ({', '.join(INCLUDED_COLUMNS)});"
+    )
+
+
+def find_covering_index(conn_string: str, table: str = "") -> str | None:
+    """
+    Return the name of an existing index whose leading key columns are (form_type, form_submitted_date)
+    and that includes form_id and form_data, or None if the table has no such index.
+    """
+
+    table = table or helper_functions.FORMS_TABLE
+
+    database = table.split(".")[0]
+
+    query = f"""
+        SELECT
+            i.name AS index_name,
+            c.name AS column_name,
+            ic.key_ordinal,
+            ic.is_included_column
+        FROM
+            {database}.sys.indexes AS i
+            JOIN {database}.sys.index_columns AS ic
+                ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+            JOIN {database}.sys.columns AS c
+                ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+        WHERE
+            i.object_id = OBJECT_ID(?)
+    """
+
+    engine = database_engines.get_engine(conn_string)
+
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(query, (table,)).fetchall()
+
+    indexes = {}
+
+    for row in rows:
+        index = indexes.setdefault(row.index_name, {"keys": {}, "included": set()})
+
+        if row.is_included_column:
+            index["included"].add(row.column_name.lower())
+
+        elif row.key_ordinal:
+            index["keys"][row.key_ordinal] = row.column_name.lower()
+
+    for index_name, index in indexes.items():
+        leading_keys = tuple(index["keys"][ordinal] for ordinal in sorted(index["keys"]))[:len(KEY_COLUMNS)]
+
+        # A clustered index or key columns also cover the "included" columns
+        covered = index["included"] | set(index["keys"].values())
+
+        if leading_keys == KEY_COLUMNS and set(INCLUDED_COLUMNS) <= covered:
+            return index_name
+
+    return None
+
+
+def advise(conn_string: str, table: str = "") -> str:
+    """
+    Return a short report on how form_submitted_date is filtered and whether the Forms query is covered by an index,
+    including the DDL to create it if not.
+    """
+
+    column_type = helper_functions.submitted_date_type(conn_string, table)
+
+    if column_type in helper_functions.DATETIME_TYPES:
+        filters = "the date filters are half-open ranges the index can seek"
+
+    elif column_type == helper_functions.DATETIMEOFFSET_TYPE:
+        filters = "the date filters seek a range widened by a day and apply CAST(... AS date) to the rows found"
+
+    else:
+        filters = "the date filters use CAST(... AS date), which the index cannot seek"
+
+    report = f"form_submitted_date is {column_type or 'of an unknown type'} - {filters}.\n"
+
+    existing_index = find_covering_index(conn_string, table)
+
+    if existing_index:
+        return report + f"The Forms query is covered by the existing index '{existing_index}'."
+
+    return (
+        report + "No covering index found for the Forms query. Suggested index:\n\n"
+        + covering_index_ddl(table)
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(covering_index_ddl())
+
+    else:
+        print(advise(sys.argv[1]))
+
+        database_engines.dispose_engines()
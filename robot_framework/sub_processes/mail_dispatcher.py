@@ -0,0 +1,241 @@
+"""
+Persistent SMTP sessions for the daily email flow.
+
+smtp_util.send_email opens, upgrades and closes a new SMTP connection for every message. MailDispatcher instead opens
+a connection the first time it is needed and keeps it for the rest of the run. A message that fails with a transient
+error - a dropped connection, a timeout or a 4xx reply - is retried on a fresh connection. Permanent errors (refused
+recipients and 5xx replies) would fail again, so they are not retried. With more than one connection, messages are sent
+concurrently from a small pool, one connection per worker thread.
+
+Every message gets a Delivery record with its send latency and error, if any - including a message that could not even
+be built - so the caller can report failures without aborting the remaining messages.
+"""
+
+import smtplib
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.message import EmailMessage
+
+from robot_framework import config
+from robot_framework import instrumentation
+
+
+@dataclass(frozen=True)
+class SmtpSettings:
+    """Where and how to connect to the SMTP server, and the sender of the emails."""
+
+    server: str
+    port: int
+    sender: str
+    starttls: bool = True
+    timeout: float = config.MAIL_TIMEOUT_SECONDS
+
+    def connect(self) -> smtplib.SMTP:
+        """Open a new connection, upgraded with STARTTLS if enabled."""
+
+        smtp = smtplib.SMTP(self.server, int(self.port), timeout=self.timeout)
+
+        try:
+            if self.starttls:
+                smtp.starttls()
+
+        except Exception:
+            smtp.close()
+
+            raise
+
+        return smtp
+
+
+@dataclass
+class OutgoingEmail:
+    """A single HTML email to send."""
+
+    receiver: str | list[str]
+    subject: str
+    html_body: str
+
+
+@dataclass
+class Delivery:
+    """The outcome of sending one email - error is None when it was accepted by the server."""
+
+    email: OutgoingEmail
+    latency_seconds: float
+    attempts: int
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the email was accepted by the server."""
+
+        return self.error is None
+
+
+def build_message(sender: str, email: OutgoingEmail) -> EmailMessage:
+    """Build the same message as smtp_util.send_email with an HTML body."""
+
+    msg = EmailMessage()
+    msg["to"] = email.receiver
+    msg["from"] = sender
+    msg["subject"] = email.subject
+
+    msg.set_content("Please enable HTML to view this message.")
+    msg.add_alternative(email.html_body, subtype="html")
+
+    return msg
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether sending again on a fresh connection may succeed - not for refused recipients or permanent (5xx) replies,
+    which the server would give again.
+    """
+
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code < 500
+
+    return isinstance(error, (smtplib.SMTPException, OSError))
+
+
+class MailDispatcher:
+    """
+    Sends emails over persistent SMTP connections. Use as a context manager, so the connections are closed at the end.
+    """
+
+    def __init__(
+        self,
+        settings: SmtpSettings,
+        connections: int = config.MAIL_CONNECTIONS,
+        attempts: int = config.MAIL_SEND_ATTEMPTS
+    ):
+        self.settings = settings
+        self.connections = max(1, connections)
+        self.attempts = max(1, attempts)
+
+        self._local = threading.local()
+        self._open_connections = []
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "connections_opened": 0,
+            "messages_sent": 0,
+            "messages_failed": 0,
+        }
+
+    def __enter__(self) -> "MailDispatcher":
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.close()
+
+    def send(self, email: OutgoingEmail) -> Delivery:
+        """
+        Send one email on this thread's connection, reconnecting and retrying on transient failures.
+        Errors are recorded on the returned Delivery instead of being raised.
+        """
+
+        started = time.perf_counter()
+
+        attempt = 0
+
+        try:
+            message = build_message(self.settings.sender, email)
+
+        except (ValueError, TypeError) as e:
+            # A malformed email, e.g. a header with a line break - it fails on its own, the rest are still sent
+            error = e
+
+        else:
+            for attempt in range(1, self.attempts + 1):
+                try:
+                    with instrumentation.span("smtp_send"):
+                        self._connection().send_message(message)
+
+                    error = None
+
+                    break
+
+                except (smtplib.SMTPException, OSError) as e:
+                    error = e
+
+                    if not is_transient(e):
+                        # smtplib resets the session after a refusal, so the connection can be used for the next email
+                        break
+
+                    # The connection may be in an unknown state - the next attempt (or message) starts a new one
+                    self._drop_connection()
+
+        delivery = Delivery(email, time.perf_counter() - started, attempt, error)
+
+        with self._lock:
+            self.stats["messages_sent" if delivery.ok else "messages_failed"] += 1
+
+        instrumentation.count("emails_sent" if delivery.ok else "emails_failed")
+
+        return delivery
+
+    def send_all(self, emails: list[OutgoingEmail]) -> list[Delivery]:
+        """
+        Send every email and return their deliveries in the same order.
+        With more than one connection, the emails are spread over a pool of that many worker threads.
+        """
+
+        if self.connections == 1 or len(emails) <= 1:
+            return [self.send(email) for email in emails]
+
+        with ThreadPoolExecutor(max_workers=min(self.connections, len(emails))) as executor:
+            return list(executor.map(self.send, emails))
+
+    def close(self) -> None:
+        """Close every open connection."""
+
+        with self._lock:
+            open_connections, self._open_connections = self._open_connections, []
+
+        for smtp in open_connections:
+            try:
+                smtp.quit()
+
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
+
+        self._local = threading.local()
+
+    def _connection(self) -> smtplib.SMTP:
+        """The connection of the current thread, opened on first use."""
+
+        smtp = getattr(self._local, "smtp", None)
+
+        if smtp is None:
+            smtp = self.settings.connect()
+
+            self._local.smtp = smtp
+
+            with self._lock:
+                self._open_connections.append(smtp)
+                self.stats["connections_opened"] += 1
+
+        return smtp
+
+    def _drop_connection(self) -> None:
+        """Close and forget the connection of the current thread."""
+
+        smtp = getattr(self._local, "smtp", None)
+
+        if smtp is None:
+            return
+
+        self._local.smtp = None
+
+        with self._lock:
+            if smtp in self._open_connections:
+                self._open_connections.remove(smtp)
+
+        smtp.close()
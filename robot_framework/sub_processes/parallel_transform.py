@@ -0,0 +1,126 @@
+"""
+Process-pool parallel decode and transform for full-history workbook rebuilds.
+
+JSON decoding and transform_form_submission are pure and CPU-bound, so the raw rows are split into chunks that are
+decoded and transformed in a ProcessPoolExecutor. Chunks are merged back in their original order, which keeps the
+form_submitted_date DESC order of the query. Small inputs are handled serially, where starting the pool would cost
+more than it saves.
+
+The counters a worker records while decoding (skipped purged rows, invalid JSON) are sent back with each chunk and
+added to the run's counters. Its spans are not - the time spent in the workers overlaps and is not part of the run's
+wall time.
+"""
+
+import itertools
+import os
+
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+from robot_framework import config
+from robot_framework import instrumentation
+from robot_framework.sub_processes import form_decoding
+from robot_framework.sub_processes import helper_functions
+
+
+FormDataRow = namedtuple("FormDataRow", ["form_data"])
+
+# Set once per worker process by _init_worker, so the mapping is not pickled with every chunk
+_worker_state = {}
+
+
+def iter_transformed_rows(
+    rows,
+    role: str,
+    mapping: dict,
+    schema: form_decoding.FormSchema | None = None,
+    workers: int | None = config.TRANSFORM_WORKERS,
+    chunk_size: int = config.TRANSFORM_CHUNK_SIZE,
+    min_parallel_rows: int = config.TRANSFORM_MIN_PARALLEL_ROWS
+) -> Iterator[dict]:
+    """
+    Decode and transform raw rows chunk by chunk and yield the transformed rows in the original order.
+    At most a couple of chunks per worker are in flight at a time, so a slow consumer (e.g. a streaming workbook writer)
+    keeps memory bounded.
+    """
+
+    rows = iter(rows)
+
+    workers = _worker_count(workers)
+
+    # Only look ahead when the pool may be started - the serial path streams the rows without buffering them
+    head = list(itertools.islice(rows, min_parallel_rows)) if workers >= 2 else []
+
+    chunks = _chunk_form_data(itertools.chain(head, rows), chunk_size)
+
+    if len(head) < min_parallel_rows or workers < 2:
+        for chunk in chunks:
+            yield from _decode_and_transform(chunk, role, mapping, schema)
+
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(role, mapping, schema)) as executor:
+        pending = deque()
+
+        for chunk in chunks:
+            pending.append(executor.submit(_decode_and_transform_chunk, chunk))
+
+            # Results are taken in submission order, which keeps the DESC order of the rows
+            if len(pending) >= workers * 2:
+                yield from _collect(pending.popleft())
+
+        while pending:
+            yield from _collect(pending.popleft())
+
+
+def _collect(future) -> list[dict]:
+    """The transformed rows of a finished chunk, adding the worker's counters to the run's counters."""
+
+    transformed_rows, counters = future.result()
+
+    for name, amount in counters.items():
+        instrumentation.count(name, amount)
+
+    return transformed_rows
+
+
+def _worker_count(workers: int | None) -> int:
+    return workers or os.cpu_count() or 1
+
+
+def _chunk_form_data(rows, chunk_size: int):
+    """Yield lists of at most chunk_size raw form_data strings - only the strings are sent to the workers."""
+
+    while chunk := [row.form_data for row in itertools.islice(rows, chunk_size)]:
+        yield chunk
+
+
+def _init_worker(role: str, mapping: dict, schema: form_decoding.FormSchema | None) -> None:
+    """Store the per-run arguments in the worker process."""
+
+    # A forked worker starts with a copy of the parent's spans and counters
+    instrumentation.reset()
+
+    _worker_state["role"] = role
+    _worker_state["mapping"] = mapping
+    _worker_state["schema"] = schema
+
+
+def _decode_and_transform_chunk(form_data_chunk: list[str]) -> tuple[list[dict], dict[str, int]]:
+    """
+    Decode and transform a chunk in a worker process, using the worker's role, mapping and schema.
+    Returns the transformed rows and the counters recorded for the chunk.
+    """
+
+    transformed_rows = _decode_and_transform(form_data_chunk, _worker_state["role"], _worker_state["mapping"], _worker_state["schema"])
+
+    return transformed_rows, instrumentation.take_counters()
+
+
+def _decode_and_transform(form_data_chunk: list[str], role: str, mapping: dict, schema: form_decoding.FormSchema | None) -> list[dict]:
+    """Decode a chunk of raw form_data strings and transform the submissions made by the given role."""
+
+    submissions = helper_functions.decode_form_rows([FormDataRow(form_data) for form_data in form_data_chunk], schema=schema)
+
+    return helper_functions.transform_submissions(submissions, role, mapping)
@@ -0,0 +1,478 @@
+"""
+Columnar Parquet archive of the transformed ESQ submissions.
+
+Next to the Excel workbooks the robot can keep every transformed row in a Parquet dataset, hive-partitioned by role and
+the month of the row's 'Gennemført' date - the same date the partitioned workbooks are split by:
+
+    <archive>/role=ung/month=2025-03/part-0.parquet
+    <archive>/role=foraelder/month=2025-03/part-0.parquet
+
+Rows without a usable date are kept in the hive null partition (month=__HIVE_DEFAULT_PARTITION__), which month filters
+never match.
+
+Columns are typed - 'Oprettet' and 'Gennemført' are timestamps, 'Average answer score' is a float, 'Serial number' an
+integer and every answer column a string - so reads can prune columns and push filters on role, month and the typed
+columns down to the files, e.g. the average score per Behandling for a year only touches two columns of twelve months.
+
+The archive is written from the rows the robot transforms for the workbooks anyway. The monthly run merges the new
+rows into their months, and a workbook rebuild records the rows on their way into the workbook and swaps in a complete
+new set of partitions for the role once they have all passed. The whole archive can also be rebuilt by hand from the
+local submission cache:
+
+    python -m robot_framework.sub_processes.parquet_archive rebuild <form_type> <archive folder>
+
+The archive is off by default. It is enabled with config.PARQUET_ARCHIVE_ENABLED and an absolute
+config.PARQUET_ARCHIVE_PATH. pyarrow is an optional dependency (pip install .[archive]); without it the archive is
+unavailable and skipped.
+"""
+
+import os
+import shutil
+import sys
+
+from datetime import date, datetime
+from typing import Callable, Iterable, Iterator
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+
+from robot_framework.sub_processes import formular_mappings
+
+
+# The hive partition value of each role - directory names are kept to plain ASCII
+ROLE_PARTITIONS = {
+    "Ung/selvbesvarelse": "ung",
+    "Forælder (inklusiv plejeforældre)": "foraelder",
+}
+
+TIMESTAMP_COLUMNS = ("Oprettet", "Gennemført")
+FLOAT_COLUMNS = ("Average answer score",)
+INTEGER_COLUMNS = ("Serial number",)
+
+# The column the month partition is taken from
+MONTH_COLUMN = "Gennemført"
+
+# The hive partition value pyarrow reads back as null
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+PART_FILE_NAME = "part-0.parquet"
+
+
+def is_available() -> bool:
+    """Whether pyarrow is installed, i.e. whether the archive can be written and read."""
+
+    return pa is not None
+
+
+def month_key(day: date) -> str:
+    """The month partition a submission day belongs to, e.g. "2025-03"."""
+
+    return f"{day.year}-{day.month:02d}"
+
+
+def row_month(row: dict) -> str | None:
+    """
+    The month partition of a transformed row from its 'Gennemført' value - a "%Y-%m-%d %H:%M:%S" string, or a
+    datetime/Timestamp - or None if it has no usable date.
+    """
+
+    value = row.get(MONTH_COLUMN)
+
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+
+        except ValueError:
+            return None
+
+    if isinstance(value, date) and not pd.isna(value):
+        return month_key(value)
+
+    return None
+
+
+def role_partition(role: str) -> str:
+    """The partition value of a role, e.g. "ung"."""
+
+    try:
+        return ROLE_PARTITIONS[role]
+
+    except KeyError:
+        raise ValueError(f"Unknown role '{role}' - expected one of {list(ROLE_PARTITIONS)}") from None
+
+
+def to_table(rows: pd.DataFrame | list[dict]) -> "pa.Table":
+    """
+    Convert transformed rows to a typed Arrow table, keeping the column order of the rows.
+    Values that cannot be converted to a column's type (e.g. an unparseable date) are stored as nulls.
+    """
+
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+
+    fields = []
+    arrays = []
+
+    for column in frame.columns:
+        values = frame[column]
+
+        if column in TIMESTAMP_COLUMNS:
+            arrow_type = pa.timestamp("s")
+            values = pd.to_datetime(values, format="%Y-%m-%d %H:%M:%S", errors="coerce")
+
+        elif column in FLOAT_COLUMNS:
+            arrow_type = pa.float64()
+            values = pd.to_numeric(values, errors="coerce")
+
+        elif column in INTEGER_COLUMNS:
+            arrow_type = pa.int64()
+            values = pd.to_numeric(values, errors="coerce").astype("Int64")
+
+        else:
+            arrow_type = pa.string()
+            values = values.map(lambda value: None if pd.api.types.is_scalar(value) and pd.isna(value) else str(value))
+
+        fields.append(pa.field(column, arrow_type))
+        arrays.append(pa.array(values, type=arrow_type, from_pandas=True))
+
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+class ParquetArchive:
+    """
+    A local folder holding the hive-partitioned Parquet dataset of transformed submissions.
+    """
+
+    def __init__(self, path: str | None):
+        if pa is None:
+            raise RuntimeError("The Parquet archive requires pyarrow - install the 'archive' extra.")
+
+        if not path or not os.path.isabs(path):
+            raise ValueError(f"The Parquet archive needs an absolute folder - set config.PARQUET_ARCHIVE_PATH (got {path!r}).")
+
+        self.path = path
+
+        for role in ROLE_PARTITIONS:
+            self._finish_interrupted_swap(role)
+
+    def role_path(self, role: str) -> str:
+        """The folder of every partition of a role."""
+
+        return os.path.join(self.path, f"role={role_partition(role)}")
+
+    def partition_path(self, role: str, key: str | None) -> str:
+        """The folder of a single role/month partition - key None is the partition of rows without a date."""
+
+        return os.path.join(self.role_path(role), f"month={key or NULL_PARTITION}")
+
+    def write_partition(self, role: str, key: str | None, rows: pd.DataFrame | list[dict]) -> int:
+        """
+        Replace a single role/month partition with the given rows. An empty set of rows removes the partition.
+        Returns the number of rows written.
+        """
+
+        folder = self.partition_path(role, key)
+
+        if len(rows) == 0:
+            shutil.rmtree(folder, ignore_errors=True)
+
+            return 0
+
+        os.makedirs(folder, exist_ok=True)
+
+        self._write_file(to_table(rows), os.path.join(folder, PART_FILE_NAME))
+
+        return len(rows)
+
+    def merge_rows(self, role: str, rows: pd.DataFrame | list[dict]) -> dict[str, int]:
+        """
+        Merge transformed rows into the months they belong to. A row replaces the archived row with the same
+        'Serial number', so running the same month twice gives the same archive. Returns the number of rows per month
+        after the merge.
+        """
+
+        records = rows.to_dict(orient="records") if isinstance(rows, pd.DataFrame) else list(rows)
+
+        months = {}
+
+        for record in records:
+            months.setdefault(row_month(record), []).append(record)
+
+        row_counts = {}
+
+        for key, month_rows in months.items():
+            file_path = os.path.join(self.partition_path(role, key), PART_FILE_NAME)
+
+            if os.path.exists(file_path):
+                new_serials = {str(row.get("Serial number")) for row in month_rows}
+
+                existing = pq.read_table(file_path).to_pandas(timestamp_as_object=True)
+
+                kept = existing[~existing["Serial number"].astype(str).isin(new_serials)]
+
+                month_rows = kept.astype(object).where(kept.notna(), None).to_dict(orient="records") + month_rows
+
+            row_counts[key] = self.write_partition(role, key, month_rows)
+
+        return row_counts
+
+    def rebuild_role(self, role: str) -> "RoleRebuild":
+        """
+        Start replacing every partition of a role - see RoleRebuild. Use it as a context manager:
+
+            with archive.rebuild_role(role) as rebuild:
+                excel_writer.write_workbook(rebuild.record(transformed_rows))
+
+        or call finish when every row has been recorded.
+        """
+
+        return RoleRebuild(self, role)
+
+    def dataset(self) -> "ds.Dataset":
+        """
+        Open the archive as a dataset with role and month as partition columns.
+        The two roles ask different questions, so the schema is the union of the schemas of all partition files.
+        """
+
+        partitioning = ds.partitioning(pa.schema([("role", pa.string()), ("month", pa.string())]), flavor="hive")
+
+        discovered = ds.dataset(self.path, format="parquet", partitioning=partitioning)
+
+        schema = pa.unify_schemas([fragment.physical_schema for fragment in discovered.get_fragments()] + [partitioning.schema])
+
+        return ds.dataset(self.path, schema=schema, format="parquet", partitioning=partitioning)
+
+    def read(self, columns: list[str] | None = None, filter_expression=None) -> pd.DataFrame:
+        """
+        Read the archive into a DataFrame. Only the given columns are read, and the filter expression
+        (e.g. pyarrow.dataset.field("month") >= "2025-01") is pushed down to skip partitions and row groups.
+        """
+
+        if not os.path.isdir(self.path):
+            return pd.DataFrame(columns=columns)
+
+        return self.dataset().to_table(columns=columns, filter=filter_expression).to_pandas()
+
+    def average_score(self, by: str = "Behandling", role: str | None = None, start: date | None = None, end: date | None = None) -> pd.DataFrame:
+        """
+        Average answer score and number of responses per value of the by column, for submissions in the
+        months from start to end (inclusive), optionally for a single role.
+        """
+
+        filter_expression = ds.field("Average answer score").is_valid()
+
+        if role is not None:
+            filter_expression &= ds.field("role") == role_partition(role)
+
+        if start is not None:
+            filter_expression &= ds.field("month") >= month_key(start)
+
+        if end is not None:
+            filter_expression &= ds.field("month") <= month_key(end)
+
+        table = self.dataset().to_table(columns=[by, "Average answer score"], filter=filter_expression)
+
+        grouped = table.group_by(by).aggregate([("Average answer score", "mean"), ("Average answer score", "count")])
+
+        grouped = grouped.select([by, "Average answer score_mean", "Average answer score_count"])
+
+        return grouped.rename_columns([by, "Average answer score", "Antal besvarelser"]).sort_by(by).to_pandas()
+
+    @staticmethod
+    def _write_file(table: "pa.Table", file_path: str) -> None:
+        """Write a table to file_path through a temporary file, so readers never see a half-written partition."""
+
+        temporary_path = os.path.join(os.path.dirname(file_path), f".{os.path.basename(file_path)}.tmp")
+
+        pq.write_table(table, temporary_path, compression="zstd")
+
+        os.replace(temporary_path, file_path)
+
+    def _finish_interrupted_swap(self, role: str) -> None:
+        """
+        Complete a role swap that was interrupted between moving the old partitions aside and deleting them - the old
+        partitions are restored if the new ones never took their place.
+        """
+
+        replaced_folder = _replaced_folder(self.path, role)
+
+        if not os.path.isdir(replaced_folder):
+            return
+
+        if os.path.isdir(self.role_path(role)):
+            shutil.rmtree(replaced_folder, ignore_errors=True)
+
+        else:
+            os.replace(replaced_folder, self.role_path(role))
+
+
+class RoleRebuild:
+    """
+    Writes a complete new set of partitions for one role into a staging folder as transformed rows pass through
+    record, and swaps them in on finish. Until then the previous partitions are left as they are - a rebuild that fails
+    or is abandoned never replaces them, and its staging folder is deleted by abort or by the next rebuild of the role.
+    As a context manager it finishes when the block completes and aborts when it raises.
+
+    Rows are buffered per month and written to the month's file when a row of another month arrives. The rows of a
+    rebuild come newest first, so only about a month of rows is held in memory at a time.
+    """
+
+    def __init__(self, archive: ParquetArchive, role: str):
+        self.role_folder = archive.role_path(role)
+
+        # Names starting with "_" or "." are skipped by dataset discovery, so readers never see the staging folder
+        self.staging_folder = os.path.join(archive.path, f"_rebuilding_{role_partition(role)}")
+        self.replaced_folder = _replaced_folder(archive.path, role)
+
+        self.row_counts = {}
+
+        self._pending = {}
+        self._writers = {}
+
+        shutil.rmtree(self.staging_folder, ignore_errors=True)
+
+    def __enter__(self) -> "RoleRebuild":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.finish()
+
+        else:
+            self.abort()
+
+    def finish(self) -> dict[str, int]:
+        """Write the remaining rows and swap the staged partitions in. Returns the number of rows per month."""
+
+        try:
+            for key in list(self._pending):
+                self._flush(key)
+
+        except Exception:
+            self.abort()
+
+            raise
+
+        self._close_writers()
+
+        self._swap()
+
+        return self.row_counts
+
+    def abort(self) -> None:
+        """Drop the staged partitions, keeping the previous ones."""
+
+        self._close_writers()
+
+        shutil.rmtree(self.staging_folder, ignore_errors=True)
+
+    def record(self, rows: Iterable[dict]) -> Iterator[dict]:
+        """Yield the rows unchanged, recording each of them for the archive on the way."""
+
+        last_key = None
+
+        for row in rows:
+            key = row_month(row)
+
+            if key != last_key and last_key in self._pending:
+                self._flush(last_key)
+
+            self._pending.setdefault(key, []).append(row)
+
+            last_key = key
+
+            yield row
+
+    def recording(self, transform: Callable[[Iterable], Iterable[dict]]) -> Callable[[Iterable], Iterator[dict]]:
+        """Wrap a transform of raw rows so every row it produces is recorded."""
+
+        return lambda rows: self.record(transform(rows))
+
+    def _close_writers(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+
+        self._writers = {}
+
+    def _flush(self, key: str | None) -> None:
+        """Append the buffered rows of a month to its staging file."""
+
+        rows = self._pending.pop(key)
+
+        table = to_table(rows)
+
+        if key not in self._writers:
+            folder = os.path.join(self.staging_folder, f"month={key or NULL_PARTITION}")
+
+            os.makedirs(folder, exist_ok=True)
+
+            self._writers[key] = pq.ParquetWriter(os.path.join(folder, PART_FILE_NAME), table.schema, compression="zstd")
+
+        self._writers[key].write_table(table)
+
+        self.row_counts[key] = self.row_counts.get(key, 0) + len(rows)
+
+    def _swap(self) -> None:
+        """
+        Replace the role's partitions with the staged ones. The old folder is moved aside before the new one takes its
+        place and only deleted afterwards, so an interruption never leaves the role without partitions - see
+        ParquetArchive._finish_interrupted_swap.
+        """
+
+        shutil.rmtree(self.replaced_folder, ignore_errors=True)
+
+        if os.path.isdir(self.role_folder):
+            os.replace(self.role_folder, self.replaced_folder)
+
+        if self.row_counts:
+            os.replace(self.staging_folder, self.role_folder)
+
+        else:
+            shutil.rmtree(self.staging_folder, ignore_errors=True)
+
+        shutil.rmtree(self.replaced_folder, ignore_errors=True)
+
+
+def _replaced_folder(path: str, role: str) -> str:
+    """Where the old partitions of a role are kept while a rebuild swaps in the new ones."""
+
+    return os.path.join(path, f"_replaced_{role_partition(role)}")
+
+
+def _rebuild_from_cache(form_type: str, path: str) -> dict[str, dict[str, int]]:
+    """Rebuild every role of the archive from the submissions in the local submission cache."""
+
+    # Imported here, as the cache and the transform pull in the database and multiprocessing layers
+    from robot_framework.sub_processes import parallel_transform  # pylint: disable=import-outside-toplevel
+    from robot_framework.sub_processes import submission_cache  # pylint: disable=import-outside-toplevel
+
+    with submission_cache.SubmissionCache() as cache:
+        rows = [row for batch in cache.iter_rows(form_type) for row in batch]
+
+    archive = ParquetArchive(os.path.abspath(path))
+
+    row_counts = {}
+
+    for role, mapping in formular_mappings.ROLE_MAPPINGS.items():
+        with archive.rebuild_role(role) as rebuild:
+            for _ in rebuild.record(parallel_transform.iter_transformed_rows(rows, role=role, mapping=mapping)):
+                pass
+
+        row_counts[role] = rebuild.row_counts
+
+    return row_counts
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "rebuild":
+        for archive_role, month_counts in _rebuild_from_cache(sys.argv[2], sys.argv[3]).items():
+            print(f"{archive_role}: {sum(month_counts.values())} rows in {len(month_counts)} months")
+
+    else:
+        print(__doc__)
@@ -0,0 +1,166 @@
+"""
+Routing of ESQ emails to the psychiatrist registered for an AZ-ident in "Godkendte emails.xlsx".
+
+The workbook is only downloaded and parsed when it has changed: its SharePoint ETag (or last-modified time) is compared
+with the version stored next to the parsed index in a local JSON file, and an unchanged workbook is served from that
+file. AZ-idents and emails are normalised once, when the index is built - both are stripped and lowercased - so the
+lookup is a single dict access. AZ-idents without an approved email fall back to a default recipient.
+"""
+
+import json
+import math
+import os
+
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+from robot_framework import config
+from robot_framework import instrumentation
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def normalise(value) -> str:
+    """Normalise an AZ-ident or email for the index - stripped and lowercased. Missing values become ""."""
+
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+
+    return str(value).strip().lower()
+
+
+def build_index(approved_emails_df: "pd.DataFrame") -> dict[str, str]:
+    """Build the normalised {az-ident: email} index, skipping rows without an AZ-ident or an email."""
+
+    index = {}
+
+    for az_ident, email in zip(approved_emails_df["az-ident"], approved_emails_df["email"]):
+        az_ident = normalise(az_ident)
+        email = normalise(email)
+
+        if az_ident and email:
+            index[az_ident] = email
+
+    return index
+
+
+def fetch_version(sharepoint_api, file_name: str, folder_name: str) -> str | None:
+    """
+    Return the ETag of the file on SharePoint, or its last-modified time if it has no ETag.
+    Returns None if the file properties could not be read.
+    """
+
+    file_url = f"/teams/{sharepoint_api.site_name}/{sharepoint_api.document_library}/{folder_name}/{file_name}"
+
+    try:
+        sharepoint_file = sharepoint_api.ctx.web.get_file_by_server_relative_url(file_url)
+
+        sharepoint_api.ctx.load(sharepoint_file, ["ETag", "TimeLastModified"])
+        sharepoint_api.ctx.execute_query()
+
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        print(f"Could not read the version of '{file_name}': {e}")
+
+        return None
+
+    version = sharepoint_file.properties.get("ETag") or sharepoint_file.properties.get("TimeLastModified")
+
+    return str(version) if version else None
+
+
+class RecipientResolver:
+    """
+    Resolves the email an AZ-ident's submissions are sent to, falling back to a default recipient.
+    """
+
+    def __init__(self, index: dict[str, str], fallback: str, version: str | None = None):
+        self.index = index
+        self.fallback = fallback
+        self.version = version
+
+    def resolve(self, az_ident) -> str:
+        """The approved email of the AZ-ident, or the fallback recipient if it has none."""
+
+        return self.index.get(normalise(az_ident), self.fallback)
+
+    def recipient_for(self, transformed_row: dict) -> str:
+        """The recipient of the email for a transformed submission, from its AZ-ident."""
+
+        return self.resolve(transformed_row.get("AZ-ident"))
+
+    @classmethod
+    def load(
+        cls,
+        sharepoint_api,
+        folder_name: str,
+        fallback: str,
+        file_name: str = "Godkendte emails.xlsx",
+        cache_path: str = config.APPROVED_EMAILS_CACHE_PATH
+    ) -> "RecipientResolver":
+        """
+        Load the index from the local cache if its version matches the file on SharePoint, otherwise download,
+        parse and cache the workbook. If the download fails, the cached index is used even if it is stale.
+        """
+
+        cached = _read_cache(cache_path)
+
+        version = fetch_version(sharepoint_api, file_name, folder_name)
+
+        if cached is not None and version is not None and cached["version"] == version:
+            print(f"'{file_name}' is unchanged - using the cached approved emails.")
+
+            return cls(cached["index"], fallback, version)
+
+        with instrumentation.span("sharepoint_download"):
+            binary_file = sharepoint_api.fetch_file_using_open_binary(file_name, folder_name)
+
+        if binary_file is None:
+            if cached is not None:
+                print(f"Could not download '{file_name}' - using the cached approved emails.")
+
+                return cls(cached["index"], fallback, cached["version"])
+
+            print(f"Could not download '{file_name}' - every email goes to the fallback recipient.")
+
+            return cls({}, fallback)
+
+        # pandas is only needed when the workbook has changed
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+
+        index = build_index(pd.read_excel(BytesIO(binary_file)))
+
+        # Without a version the next run cannot tell whether the file changed, so it is not cached
+        if version is not None:
+            _write_cache(cache_path, version, index)
+
+        return cls(index, fallback, version)
+
+
+def _read_cache(cache_path: str) -> dict | None:
+    """Read the cached {"version": ..., "index": {...}} document, or None if there is no usable cache."""
+
+    try:
+        with open(cache_path, encoding="utf-8") as cache_file:
+            cached = json.load(cache_file)
+
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(cached, dict) or not isinstance(cached.get("index"), dict):
+        return None
+
+    return cached
+
+
+def _write_cache(cache_path: str, version: str, index: dict[str, str]) -> None:
+    """Write the index and its version through a temporary file, so a failed write never leaves a broken cache."""
+
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+
+    temporary_path = f"{cache_path}.tmp"
+
+    with open(temporary_path, "w", encoding="utf-8") as cache_file:
+        json.dump({"version": version, "index": index}, cache_file, ensure_ascii=False)
+
+    os.replace(temporary_path, cache_path)
@@ -0,0 +1,270 @@
+"""
+Run planning for the ESQ robot.
+
+A run can need submissions for several consumers - the youth workbook, the parent workbook and the daily email flow.
+plan_run works out the date window each consumer needs and the union of those windows, so the submissions are fetched
+from the database once and every consumer reads its own filtered view of that single snapshot. The snapshot is spooled
+to a private temporary folder rather than held in memory, so fetching the whole history for a rebuild keeps memory use flat.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import weakref
+
+from collections import namedtuple
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Iterator
+
+from robot_framework import config
+from robot_framework import instrumentation
+from robot_framework.sub_processes import helper_functions
+
+
+@dataclass(frozen=True)
+class DateWindow:
+    """
+    An inclusive range of submission days. A missing start or end means the window is unbounded in that direction,
+    so DateWindow() covers the whole form history.
+    """
+
+    start: date | None = None
+    end: date | None = None
+
+    def contains(self, submitted: date | datetime) -> bool:
+        """Check whether a submission made at the given time falls inside the window."""
+
+        day = submitted.date() if isinstance(submitted, datetime) else submitted
+
+        if self.start is not None and day < self.start:
+            return False
+
+        if self.end is not None and day > self.end:
+            return False
+
+        return True
+
+    def union(self, other: "DateWindow") -> "DateWindow":
+        """Return the smallest window covering both this window and the other one."""
+
+        start = None if self.start is None or other.start is None else min(self.start, other.start)
+        end = None if self.end is None or other.end is None else max(self.end, other.end)
+
+        return DateWindow(start, end)
+
+
+@dataclass
+class RunPlan:
+    """
+    The date windows needed by each consumer of a run, and the single window to fetch from the database.
+    """
+
+    email_window: DateWindow
+    workbook_windows: dict[str, DateWindow] = field(default_factory=dict)
+
+    @property
+    def fetch_window(self) -> DateWindow:
+        """The union of all the windows needed during the run."""
+
+        window = self.email_window
+
+        for workbook_window in self.workbook_windows.values():
+            window = window.union(workbook_window)
+
+        return window
+
+
+def plan_run(date_today: date, workbook_names: list[str] | None = None, missing_workbooks: list[str] | None = None) -> RunPlan:
+    """
+    Plan the date windows for a run.
+    The daily email flow always needs yesterday's submissions. Workbooks that are missing are rebuilt from the whole
+    history, while existing workbooks are only extended with last month's submissions.
+    """
+
+    date_yesterday = date_today - timedelta(days=1)
+
+    plan = RunPlan(email_window=DateWindow(date_yesterday, date_yesterday))
+
+    # Last + first day of last month
+    end_date = date_today.replace(day=1) - timedelta(days=1)
+    start_date = end_date.replace(day=1)
+
+    for workbook_name in workbook_names or []:
+        if workbook_name in (missing_workbooks or []):
+            plan.workbook_windows[workbook_name] = DateWindow()
+
+        else:
+            plan.workbook_windows[workbook_name] = DateWindow(start_date, end_date)
+
+    return plan
+
+
+# Spool folders are named with this prefix, and ones older than SPOOL_LEFTOVER_AGE are left over from a killed run
+SPOOL_PREFIX = "esq_snapshot_"
+SPOOL_LEFTOVER_AGE = timedelta(days=1)
+
+SnapshotRow = namedtuple("SnapshotRow", ["form_id", "form_data", "form_submitted_date"])
+
+
+class SubmissionsSnapshot:
+    """
+    The raw submission rows fetched once for a run, newest first.
+    Rows are spooled to a temporary SQLite file as they arrive from the cursor, and every view reads its window back
+    in batches, so even a full-history run only holds one batch in memory. Rows are kept undecoded and only decoded
+    when a consumer iterates its view.
+
+    The spool holds raw form_data - CPR numbers and answers - so it is written to a private folder of its own, created
+    readable by the robot's user only, under config.SNAPSHOT_SPOOL_FOLDER (the system temp folder if None). SQLite's
+    journal files go in the same folder. The folder is deleted on close, when the snapshot is used as a context manager
+    or garbage collected, and folders left behind by a run that was killed are deleted by the next run.
+    """
+
+    def __init__(self, folder: str | None = None):
+        _remove_leftover_spools(folder)
+
+        self.folder = tempfile.mkdtemp(prefix=SPOOL_PREFIX, dir=folder)
+        self.path = os.path.join(self.folder, "snapshot.sqlite3")
+
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+
+        # Columns without a declared type keep form_id as the server returned it
+        self._connection.execute("CREATE TABLE rows (position INTEGER PRIMARY KEY, form_id, form_data, form_submitted_date TEXT NOT NULL)")
+
+        self._count = 0
+
+        self._finalizer = weakref.finalize(self, _remove_spool, self._connection, self.folder)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "SubmissionsSnapshot":
+        return self
+
+    def __exit__(self, *_exc_info) -> None:
+        self.close()
+
+    def add(self, rows) -> None:
+        """Append a batch of raw (form_id, form_data, form_submitted_date) rows, keeping their order."""
+
+        records = [(row.form_id, row.form_data, _to_iso(row.form_submitted_date)) for row in rows]
+
+        with self._connection:
+            self._connection.executemany("INSERT INTO rows (form_id, form_data, form_submitted_date) VALUES (?, ?, ?)", records)
+
+        self._count += len(records)
+
+    def batches(self, window: DateWindow, batch_size: int = helper_functions.DEFAULT_BATCH_SIZE) -> Iterator[list]:
+        """Yield the raw rows submitted inside the window in batches, keeping the newest first order."""
+
+        where_clause = ""
+        query_params = ()
+
+        if window.start is not None:
+            where_clause += " AND form_submitted_date >= ?"
+            query_params += (_to_iso(helper_functions.start_of_day(window.start)),)
+
+        if window.end is not None:
+            where_clause += " AND form_submitted_date < ?"
+            query_params += (_to_iso(helper_functions.start_of_day(window.end, days_after=1)),)
+
+        # A connection per view, so views can be read from worker threads and side by side
+        connection = sqlite3.connect(self.path)
+
+        try:
+            cursor = connection.execute(
+                f"SELECT form_id, form_data, form_submitted_date FROM rows WHERE 1 = 1 {where_clause} ORDER BY position",
+                query_params
+            )
+
+            while batch := cursor.fetchmany(batch_size):
+                yield [SnapshotRow(form_id, form_data, datetime.fromisoformat(submitted)) for form_id, form_data, submitted in batch]
+
+        finally:
+            connection.close()
+
+    def rows_in(self, window: DateWindow) -> Iterator[SnapshotRow]:
+        """Yield the raw rows submitted inside the given window, keeping the newest first order."""
+
+        for batch in self.batches(window):
+            yield from batch
+
+    def forms(self, window: DateWindow, schema=None) -> Iterator[dict]:
+        """
+        Yield the decoded, non-purged submissions inside the given window, newest first.
+        If a FormSchema is given, each submission is reduced to the fields in the schema.
+        """
+
+        for batch in self.batches(window):
+            yield from helper_functions.decode_form_rows(batch, schema=schema)
+
+    def close(self) -> None:
+        """Close and delete the spool folder."""
+
+        self._finalizer()
+
+
+def fetch_snapshot(conn_string: str, form_type: str, window: DateWindow, cache=None) -> SubmissionsSnapshot:
+    """
+    Fetch every submission inside the window with a single query, spooling the rows to disk as they arrive.
+    If a SubmissionCache is given, only rows newer than its high-water mark are fetched from the server.
+    """
+
+    snapshot = SubmissionsSnapshot(config.SNAPSHOT_SPOOL_FOLDER)
+
+    try:
+        with instrumentation.span("db_fetch"):
+            for batch in helper_functions.iter_form_rows(conn_string, form_type, start_date=window.start or "", end_date=window.end or "", cache=cache):
+                snapshot.add(batch)
+
+    except BaseException:
+        snapshot.close()
+
+        raise
+
+    instrumentation.count("rows_fetched", len(snapshot))
+
+    return snapshot
+
+
+def _to_iso(value) -> str:
+    """Format a submission time (a datetime or an ISO formatted string) so the stored strings sort chronologically."""
+
+    return helper_functions.to_datetime(value).isoformat(sep=" ", timespec="microseconds")
+
+
+def _remove_spool(connection: sqlite3.Connection, folder: str) -> None:
+    """Close the spool connection and delete the spool folder."""
+
+    connection.close()
+
+    shutil.rmtree(folder, onerror=_report_spool_error)
+
+
+def _remove_leftover_spools(folder: str | None) -> None:
+    """Delete spool folders older than SPOOL_LEFTOVER_AGE - left behind by a run that was killed before it could clean up."""
+
+    folder = folder or tempfile.gettempdir()
+
+    cutoff = datetime.now().timestamp() - SPOOL_LEFTOVER_AGE.total_seconds()
+
+    try:
+        entries = list(os.scandir(folder))
+
+    except OSError:
+        return
+
+    for entry in entries:
+        try:
+            if entry.name.startswith(SPOOL_PREFIX) and entry.is_dir(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                shutil.rmtree(entry.path, onerror=_report_spool_error)
+
+        except OSError as e:
+            _report_spool_error(None, entry.path, e)
+
+
+def _report_spool_error(_function, path: str, error) -> None:
+    """Report a spool file that could not be deleted."""
+
+    print(f"Could not delete the snapshot spool '{path}': {error[1] if isinstance(error, tuple) else error}")
@@ -0,0 +1,246 @@
+"""
+Chunked, resumable upload of files to SharePoint.
+
+Small files go through Sharepoint.upload_file_from_bytes as before. Files above a size threshold are uploaded through
+a SharePoint upload session (StartUpload, ContinueUpload, FinishUpload) on the client context the Sharepoint API
+object already holds. The session writes into a temporary file next to the target, which is only moved over the
+target once the last chunk is committed - the existing workbook stays intact until the new one is complete.
+
+Every chunk is retried on its own with a backoff. A failed request may still have reached the server, so before a
+retry the offset is read back from the server (GetUploadStatus), and a start that failed is retried as a new session
+with a new upload id. If a chunk keeps failing, the session is cancelled, the temporary file deleted and the error
+raised.
+"""
+
+import time
+import uuid
+
+from dataclasses import dataclass
+
+from office365.runtime.queries.service_operation import ServiceOperationQuery
+
+from robot_framework import config
+
+
+# File.moveto flag - overwrite the target if it exists
+MOVE_OVERWRITE = 1
+
+
+@dataclass
+class UploadSession:
+    """
+    State of a chunked upload - upload_file is the temporary file the session writes into, target_url the server
+    relative url it is moved to when done, and offset the number of bytes the server has acknowledged.
+    """
+
+    upload_id: str
+    upload_file: object
+    target_url: str
+    size: int
+    offset: int = 0
+
+
+def upload_file(
+    sharepoint_api,
+    file_obj,
+    file_name: str,
+    folder_name: str,
+    chunk_threshold: int = config.UPLOAD_CHUNK_THRESHOLD_BYTES,
+    chunk_size: int = config.UPLOAD_CHUNK_SIZE_BYTES,
+    attempts: int = config.UPLOAD_CHUNK_ATTEMPTS,
+    retry_delay: float = config.UPLOAD_RETRY_DELAY_SECONDS
+) -> None:
+    """
+    Upload a seekable file object to folder_name in the document library of sharepoint_api.
+    Files up to chunk_threshold (or a single chunk) are uploaded in one request, larger files in chunks of chunk_size.
+    """
+
+    size = _file_size(file_obj)
+
+    if size <= max(chunk_threshold, chunk_size):
+        sharepoint_api.upload_file_from_bytes(
+            binary_content=file_obj.read(),
+            file_name=file_name,
+            folder_name=folder_name
+        )
+
+        return
+
+    session = start_session(sharepoint_api, file_name, folder_name, size)
+
+    try:
+        upload_chunks(session, file_obj, chunk_size, attempts, retry_delay)
+
+        _with_retries(lambda: move_into_place(session), attempts, retry_delay)
+
+    except Exception:
+        _discard_session(session)
+
+        raise
+
+    print(f"File '{file_name}' uploaded in chunks of {chunk_size} bytes ({size} bytes in total).")
+
+
+def start_session(sharepoint_api, file_name: str, folder_name: str, size: int) -> UploadSession:
+    """
+    Create an empty temporary file next to the target, which the upload session writes into, and return a new session
+    for it. The target file itself is not touched.
+    """
+
+    folder_url = f"/teams/{sharepoint_api.site_name}/{sharepoint_api.document_library}/{folder_name}"
+
+    upload_id = str(uuid.uuid4())
+
+    target_folder = sharepoint_api.ctx.web.get_folder_by_server_relative_url(folder_url)
+
+    upload_file_obj = target_folder.files.add(f"{file_name}.{upload_id}.partial", b"", overwrite=True).execute_query()
+
+    return UploadSession(upload_id=upload_id, upload_file=upload_file_obj, target_url=f"{folder_url}/{file_name}", size=size)
+
+
+def upload_chunks(session: UploadSession, file_obj, chunk_size: int, attempts: int, retry_delay: float) -> None:
+    """
+    Send the file from session.offset to the end, one chunk at a time. Calling it again with the same session resumes
+    from the last acknowledged offset.
+    """
+
+    while session.offset < session.size:
+        _with_retries(
+            lambda: _send_next_chunk(session, file_obj, chunk_size),
+            attempts,
+            retry_delay,
+            before_retry=lambda: _resync_session(session)
+        )
+
+
+def move_into_place(session: UploadSession) -> None:
+    """Move the committed temporary file over the target, replacing the target if it exists."""
+
+    upload_file_obj = session.upload_file
+
+    upload_file_obj.context.add_query(
+        ServiceOperationQuery(upload_file_obj, "moveto", {"newurl": session.target_url, "flags": MOVE_OVERWRITE})
+    )
+
+    upload_file_obj.context.execute_query()
+
+
+def _send_next_chunk(session: UploadSession, file_obj, chunk_size: int) -> None:
+    """Send the chunk starting at the acknowledged offset and move the offset to what the server reports."""
+
+    file_obj.seek(session.offset)
+
+    chunk = file_obj.read(chunk_size)
+
+    upload_file_obj = session.upload_file
+
+    if session.offset + len(chunk) >= session.size:
+        upload_file_obj.finish_upload(session.upload_id, session.offset, chunk).execute_query()
+
+        session.offset = session.size
+
+        return
+
+    if session.offset == 0:
+        result = upload_file_obj.start_upload(session.upload_id, chunk)
+
+    else:
+        result = upload_file_obj.continue_upload(session.upload_id, session.offset, chunk)
+
+    upload_file_obj.context.execute_query()
+
+    # The server answers with the number of bytes it holds, which is where the next chunk starts
+    session.offset = int(result.value)
+
+
+def _resync_session(session: UploadSession) -> None:
+    """
+    Bring the session in line with the server after a failed request, whose response may have been lost after the
+    server applied it. A start that failed is dropped and retried under a new upload id - the old one may exist on the
+    server. Otherwise the offset is read back from the server, so the retry sends the chunk the server expects.
+    """
+
+    if session.offset == 0:
+        _cancel_upload(session)
+
+        session.upload_id = str(uuid.uuid4())
+
+        return
+
+    try:
+        session.offset = _server_offset(session)
+
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        print(f"Could not read the offset of upload session {session.upload_id}, retrying from {session.offset}: {e}")
+
+
+def _server_offset(session: UploadSession) -> int:
+    """The number of bytes the server holds for the session, from its expected content range ("<offset>-")."""
+
+    upload_file_obj = session.upload_file
+
+    status = upload_file_obj.get_upload_status(session.upload_id)
+
+    upload_file_obj.context.execute_query()
+
+    return int(status.expected_content_range.split("-")[0])
+
+
+def _with_retries(action, attempts: int, retry_delay: float, before_retry=None) -> None:
+    """
+    Run action, retrying with an exponential backoff. before_retry, if given, is called before every retry.
+    The last error is raised when all attempts have failed.
+    """
+
+    for attempt in range(1, attempts + 1):
+        try:
+            action()
+
+            return
+
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            if attempt == attempts:
+                raise
+
+            delay = retry_delay * 2 ** (attempt - 1)
+
+            print(f"Upload request failed (attempt {attempt} of {attempts}), retrying in {delay} seconds: {e}")
+
+            time.sleep(delay)
+
+            if before_retry is not None:
+                before_retry()
+
+
+def _discard_session(session: UploadSession) -> None:
+    """Best effort clean-up after a failed upload - cancel the session and delete the temporary file."""
+
+    _cancel_upload(session)
+
+    try:
+        session.upload_file.delete_object().execute_query()
+
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        print(f"Failed to delete the temporary upload file of session {session.upload_id}: {e}")
+
+
+def _cancel_upload(session: UploadSession) -> None:
+    """Best effort cancel, so SharePoint drops the partial upload."""
+
+    try:
+        session.upload_file.cancel_upload(session.upload_id).execute_query()
+
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        print(f"Failed to cancel upload session {session.upload_id}: {e}")
+
+
+def _file_size(file_obj) -> int:
+    """Size of a seekable file object, leaving it positioned at the start."""
+
+    file_obj.seek(0, 2)
+
+    size = file_obj.tell()
+
+    file_obj.seek(0)
+
+    return size
@@ -0,0 +1,330 @@
+"""
+Persistent local cache of form submissions.
+
+Submissions are stored in a local SQLite file keyed by (form_type, form_id), together with a high-water mark on
+form_submitted_date per form type. A sync only asks the server for rows submitted at or after the mark (minus a small
+overlap for rows that are journalized late), and every older range is served from the local file.
+
+Purged submissions are handled explicitly:
+  - rows that come back purged during a sync (which re-reads the overlap window) replace the cached payload with a
+    tombstone, so they are never served again
+  - reconcile_purged looks up older submissions that were purged on the server after they were cached. It scans the
+    form_data of the form type's whole history, so a sync only runs it when config.SUBMISSION_CACHE_RECONCILE_INTERVAL_DAYS
+    have passed since the last reconcile - the daily sync stays an index seek over the overlap window
+
+The file holds the raw form_data of every cached submission - CPR numbers and the children's and parents' answers - in
+plain text. The cache is therefore off by default (config.SUBMISSION_CACHE_ENABLED). Where it is enabled, the file must
+live on an encrypted volume in a folder only the robot's account can read; on POSIX systems the file is also created
+with owner-only permissions. It keeps the form type's history for as long as the cache is enabled, with purged
+submissions reduced to tombstones at the next reconcile. Clear it when the cache is disabled or the robot is retired.
+
+The cache can be dropped and rebuilt by hand:
+
+    python -m robot_framework.sub_processes.submission_cache clear [form_type]
+    python -m robot_framework.sub_processes.submission_cache rebuild "<odbc connection string>" <form_type>
+"""
+
+import os
+import sqlite3
+import sys
+
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from typing import Iterator
+
+from robot_framework import config
+from robot_framework.sub_processes import database_engines
+from robot_framework.sub_processes import form_decoding
+from robot_framework.sub_processes import helper_functions
+
+
+CachedRow = namedtuple("CachedRow", ["form_id", "form_data", "form_submitted_date"])
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS submissions (
+        form_type TEXT NOT NULL,
+        form_id TEXT NOT NULL,
+        form_submitted_date TEXT NOT NULL,
+        form_data TEXT,
+        purged INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (form_type, form_id)
+    );
+
+    CREATE INDEX IF NOT EXISTS ix_submissions_form_type_date
+        ON submissions (form_type, form_submitted_date);
+
+    CREATE TABLE IF NOT EXISTS sync_state (
+        form_type TEXT PRIMARY KEY,
+        high_water_mark TEXT,
+        synced_at TEXT,
+        reconciled_at TEXT
+    );
+"""
+
+
+def _days(days: float | None) -> timedelta | None:
+    """A number of days from the config as a timedelta - None stays None."""
+
+    return None if days is None else timedelta(days=days)
+
+
+class SubmissionCache:
+    """
+    A local SQLite store of raw submissions with a high-water mark per form type.
+    reconcile_interval is the time between reconciles of purged submissions - None never reconciles.
+    """
+
+    def __init__(
+        self,
+        path: str = config.SUBMISSION_CACHE_PATH,
+        overlap: timedelta = timedelta(days=config.SUBMISSION_CACHE_OVERLAP_DAYS),
+        reconcile_interval: timedelta | None = _days(config.SUBMISSION_CACHE_RECONCILE_INTERVAL_DAYS)
+    ):
+        directory = os.path.dirname(path)
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if not os.path.exists(path):
+            # Only the robot's account may read the raw submissions - Windows relies on the folder's permissions
+            os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+
+        self.path = path
+        self.overlap = overlap
+        self.reconcile_interval = reconcile_interval
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+        # Caches created before reconciles were scheduled have no reconciled_at column
+        if "reconciled_at" not in {column[1] for column in self.connection.execute("PRAGMA table_info(sync_state)")}:
+            with self.connection:
+                self.connection.execute("ALTER TABLE sync_state ADD COLUMN reconciled_at TEXT")
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    def high_water_mark(self, form_type: str) -> datetime | None:
+        """Return the newest form_submitted_date synced for the form type, or None if nothing is cached yet."""
+
+        row = self.connection.execute(
+            "SELECT high_water_mark FROM sync_state WHERE form_type = ?",
+            (form_type,)
+        ).fetchone()
+
+        if row is None or row[0] is None:
+            return None
+
+        return datetime.fromisoformat(row[0])
+
+    def sync(self, conn_string: str, form_type: str) -> int:
+        """
+        Fetch the rows submitted since the high-water mark (minus the overlap) from the server and store them.
+        A form type without a mark is synced from the beginning of its history.
+        Returns the number of rows received from the server.
+        """
+
+        mark = self.high_water_mark(form_type)
+
+        since = mark - self.overlap if mark is not None else None
+
+        received = 0
+        newest = mark
+
+        for batch in helper_functions.iter_form_rows(conn_string, form_type, since=since):
+            received += len(batch)
+
+            self._store(form_type, batch)
+
+            batch_newest = max(helper_functions.to_datetime(row.form_submitted_date) for row in batch)
+
+            if newest is None or batch_newest > newest:
+                newest = batch_newest
+
+        now = _to_iso(datetime.now())
+
+        with self.connection:
+            self.connection.execute(
+                """
+                    INSERT INTO sync_state (form_type, high_water_mark, synced_at) VALUES (?, ?, ?)
+                    ON CONFLICT (form_type) DO UPDATE SET high_water_mark = excluded.high_water_mark, synced_at = excluded.synced_at
+                """,
+                (form_type, _to_iso(newest) if newest is not None else None, now)
+            )
+
+            # A sync from the beginning of the history has just read every purge
+            if mark is None:
+                self.connection.execute("UPDATE sync_state SET reconciled_at = ? WHERE form_type = ?", (now, form_type))
+
+        if mark is not None and self.reconcile_due(form_type):
+            self.reconcile_purged(conn_string, form_type, before=since)
+
+        return received
+
+    def reconcile_due(self, form_type: str) -> bool:
+        """Check whether the reconcile interval has passed since purged submissions were last reconciled."""
+
+        if self.reconcile_interval is None:
+            return False
+
+        row = self.connection.execute("SELECT reconciled_at FROM sync_state WHERE form_type = ?", (form_type,)).fetchone()
+
+        if row is None or row[0] is None:
+            return True
+
+        return datetime.now() - datetime.fromisoformat(row[0]) >= self.reconcile_interval
+
+    def reconcile_purged(self, conn_string: str, form_type: str, before: datetime) -> int:
+        """
+        Replace cached payloads with tombstones for submissions that were purged on the server after being cached.
+        Only submissions older than 'before' are checked - newer ones were just refreshed by the sync.
+        Returns the number of cached submissions that were purged.
+        """
+
+        query = f"""
+            SELECT
+                form_id,
+                form_data
+            FROM
+                {helper_functions.FORMS_TABLE}
+            WHERE
+                form_type = ?
+                AND form_submitted_date < ?
+                AND form_data LIKE '%"purged"%'
+        """
+
+        engine = database_engines.get_engine(conn_string)
+
+        with engine.connect() as connection:
+            rows = connection.exec_driver_sql(query, (form_type, before)).fetchall()
+
+        purged_ids = [str(row.form_id) for row in rows if form_decoding.is_purged(row.form_data)]
+
+        with self.connection:
+            cursor = self.connection.executemany(
+                "UPDATE submissions SET form_data = NULL, purged = 1 WHERE form_type = ? AND form_id = ? AND purged = 0",
+                [(form_type, form_id) for form_id in purged_ids]
+            )
+
+            self.connection.execute("UPDATE sync_state SET reconciled_at = ? WHERE form_type = ?", (_to_iso(datetime.now()), form_type))
+
+        return cursor.rowcount
+
+    def iter_rows(
+        self,
+        form_type: str,
+        target_date: str | date = "",
+        start_date: str | date = "",
+        end_date: str | date = "",
+        batch_size: int = helper_functions.DEFAULT_BATCH_SIZE
+    ) -> Iterator[list]:
+        """
+        Yield the cached, non-purged rows for the form type, newest first, in batches of at most batch_size rows.
+        Takes the same date filters as helper_functions.iter_form_rows.
+        """
+
+        where_clause = ""
+        query_params = (form_type,)
+
+        if start_date and end_date:
+            where_clause = "AND form_submitted_date >= ? AND form_submitted_date < ?"
+
+            query_params += (_to_iso(helper_functions.start_of_day(start_date)), _to_iso(helper_functions.start_of_day(end_date, days_after=1)))
+
+        elif target_date:
+            where_clause = "AND form_submitted_date >= ? AND form_submitted_date < ?"
+
+            query_params += (_to_iso(helper_functions.start_of_day(target_date)), _to_iso(helper_functions.start_of_day(target_date, days_after=1)))
+
+        cursor = self.connection.execute(
+            f"""
+                SELECT form_id, form_data, form_submitted_date
+                FROM submissions
+                WHERE form_type = ? AND purged = 0 {where_clause}
+                ORDER BY form_submitted_date DESC
+            """,
+            query_params
+        )
+
+        while batch := cursor.fetchmany(batch_size):
+            yield [CachedRow(form_id, form_data, datetime.fromisoformat(submitted)) for form_id, form_data, submitted in batch]
+
+    def invalidate(self, form_type: str | None = None) -> None:
+        """
+        Drop the cached submissions and high-water mark for the form type, or for every form type if none is given.
+        The next sync then rebuilds the cache from the whole history.
+        """
+
+        with self.connection:
+            if form_type is None:
+                self.connection.execute("DELETE FROM submissions")
+                self.connection.execute("DELETE FROM sync_state")
+
+            else:
+                self.connection.execute("DELETE FROM submissions WHERE form_type = ?", (form_type,))
+                self.connection.execute("DELETE FROM sync_state WHERE form_type = ?", (form_type,))
+
+    def rebuild(self, conn_string: str, form_type: str) -> int:
+        """
+        Drop everything cached for the form type and sync it again from the whole history.
+        """
+
+        self.invalidate(form_type)
+
+        return self.sync(conn_string, form_type)
+
+    def _store(self, form_type: str, rows) -> None:
+        """Upsert a batch of server rows, storing purged rows as tombstones."""
+
+        records = []
+
+        for row in rows:
+            if form_decoding.is_purged(row.form_data):
+                records.append((form_type, str(row.form_id), _to_iso(row.form_submitted_date), None, 1))
+
+            else:
+                records.append((form_type, str(row.form_id), _to_iso(row.form_submitted_date), row.form_data, 0))
+
+        with self.connection:
+            self.connection.executemany(
+                """
+                    INSERT INTO submissions (form_type, form_id, form_submitted_date, form_data, purged) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (form_type, form_id) DO UPDATE SET
+                        form_submitted_date = excluded.form_submitted_date,
+                        form_data = excluded.form_data,
+                        purged = excluded.purged
+                """,
+                records
+            )
+
+
+def _to_iso(value: datetime | str) -> str:
+    """Format a submission time (a datetime or ISO formatted text) so that the stored strings sort in chronological order."""
+
+    return helper_functions.to_datetime(value).isoformat(sep=" ", timespec="microseconds")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "clear":
+        with SubmissionCache() as submission_cache:
+            submission_cache.invalidate(sys.argv[2] if len(sys.argv) > 2 else None)
+
+        print("Submission cache cleared.")
+
+    elif len(sys.argv) == 4 and sys.argv[1] == "rebuild":
+        with SubmissionCache() as submission_cache:
+            row_count = submission_cache.rebuild(sys.argv[2], sys.argv[3])
+
+        database_engines.dispose_engines()
+
+        print(f"Submission cache rebuilt from {row_count} rows.")
+
+    else:
+        print(__doc__)
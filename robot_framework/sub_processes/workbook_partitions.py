@@ -0,0 +1,365 @@
+"""
+Year- or month-partitioned layout of the ESQ workbooks.
+
+In the partitioned layout a workbook such as "Center for trivsel - ESQ besvarelser fra unge.xlsx" is split into one
+file per period - "... fra unge 2025.xlsx" or "... fra unge 2025-03.xlsx" - plus a small index workbook,
+"... fra unge - oversigt.xlsx", listing every partition with its number of responses. The monthly update then only
+downloads and uploads last month's partition and the index, and a full rebuild writes each partition on its own.
+
+A row belongs to the partition of its 'Gennemført' date - the submission time as written to the workbook - whether it
+is written by a rebuild, appended by the monthly update or read back from an existing workbook by split, so the three
+always agree. Rows without a usable date go to the "uden dato" partition.
+
+Run as a module to split an existing single workbook into partition files and an index in a local folder, ready to be
+uploaded next to it before WORKBOOK_LAYOUT is switched:
+
+    python -m robot_framework.sub_processes.workbook_partitions split <workbook.xlsx> <year|month> [output folder]
+"""
+
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from datetime import date, datetime
+from io import BytesIO
+from typing import Callable, Iterable, Iterator
+
+from openpyxl import Workbook, load_workbook
+
+from robot_framework import config
+from robot_framework import instrumentation
+from robot_framework.sub_processes import excel_writer
+from robot_framework.sub_processes import run_plan
+from robot_framework.sub_processes import workbook_update
+
+
+GRANULARITIES = ("year", "month")
+
+INDEX_SHEET_NAME = "Oversigt"
+INDEX_HEADER = ["Periode", "Fil", "Antal besvarelser", "Opdateret"]
+
+# The workbook column rows are partitioned by
+SUBMITTED_COLUMN = "Gennemført"
+
+# Partition of rows without a usable submission date
+UNDATED_PARTITION = "uden dato"
+
+
+def partition_key(day: date, granularity: str) -> str:
+    """The partition a day belongs to - "2025" for yearly partitions, "2025-03" for monthly partitions."""
+
+    if granularity == "year":
+        return f"{day.year}"
+
+    if granularity == "month":
+        return f"{day.year}-{day.month:02d}"
+
+    raise ValueError(f"Unknown workbook partition granularity '{granularity}' - expected one of {GRANULARITIES}")
+
+
+def partition_file_name(workbook_name: str, key: str) -> str:
+    """The file name of a partition of the workbook, e.g. "... fra unge 2025.xlsx"."""
+
+    stem, suffix = os.path.splitext(workbook_name)
+
+    return f"{stem} {key}{suffix}"
+
+
+def index_file_name(workbook_name: str) -> str:
+    """The file name of the index workbook, e.g. "... fra unge - oversigt.xlsx"."""
+
+    stem, suffix = os.path.splitext(workbook_name)
+
+    return f"{stem} - oversigt{suffix}"
+
+
+def row_partition_key(submitted, granularity: str) -> str:
+    """
+    The partition of a row from its 'Gennemført' value, which is a "%Y-%m-%d %H:%M:%S" string, or a datetime if Excel
+    converted it.
+    """
+
+    if isinstance(submitted, str):
+        try:
+            submitted = datetime.fromisoformat(submitted)
+
+        except ValueError:
+            return UNDATED_PARTITION
+
+    if isinstance(submitted, date):
+        return partition_key(submitted, granularity)
+
+    return UNDATED_PARTITION
+
+
+def group_rows(rows: Iterable[dict], granularity: str) -> dict[str, list[dict]]:
+    """Group workbook rows by the partition of their submission date, keeping their order within a partition."""
+
+    partitions = {}
+
+    for row in rows:
+        partitions.setdefault(row_partition_key(row.get(SUBMITTED_COLUMN), granularity), []).append(row)
+
+    return partitions
+
+
+class PartitionSpool:
+    """
+    Transformed workbook rows spooled to a temporary SQLite file by partition, so a full rebuild can write each
+    partition sorted and formatted without holding the whole history in memory. Only the header, the length of the
+    longest value of each column and the row count of each partition are kept in memory.
+
+    The rows hold personal data, so the spool is written to a private folder like the submissions snapshot's (see
+    run_plan.SubmissionsSnapshot) and deleted on close.
+    """
+
+    def __init__(self, folder: str | None = None):
+        self.folder = tempfile.mkdtemp(prefix=f"{run_plan.SPOOL_PREFIX}partitions_", dir=folder)
+
+        self._connection = sqlite3.connect(os.path.join(self.folder, "partitions.sqlite3"))
+        self._connection.execute("CREATE TABLE rows (position INTEGER PRIMARY KEY, partition TEXT NOT NULL, sort_key TEXT NOT NULL, row_values TEXT NOT NULL)")
+
+        self.partitions = {}
+
+    def __enter__(self) -> "PartitionSpool":
+        return self
+
+    def __exit__(self, *_exc_info) -> None:
+        self.close()
+
+    def add(self, rows: Iterable[dict], granularity: str, batch_size: int = 1000) -> None:
+        """Spool workbook rows under the partition of their 'Gennemført' date, with column A as text like merge_sorted_rows."""
+
+        for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+            records = []
+
+            for row in batch:
+                key = row_partition_key(row.get(SUBMITTED_COLUMN), granularity)
+
+                if key not in self.partitions:
+                    self.partitions[key] = {"header": list(row), "max_lengths": [len(str(column)) for column in row], "row_count": 0}
+
+                layout = self.partitions[key]
+
+                values = [row.get(column) for column in layout["header"]]
+                values[0] = str(values[0])
+
+                layout["max_lengths"] = [max(max_len, len(str(value or ""))) for max_len, value in zip(layout["max_lengths"], values)]
+                layout["row_count"] += 1
+
+                records.append((key, values[0], json.dumps(values, ensure_ascii=False)))
+
+            with self._connection:
+                self._connection.executemany("INSERT INTO rows (partition, sort_key, row_values) VALUES (?, ?, ?)", records)
+
+    def rows(self, key: str) -> Iterator[list]:
+        """The rows of a partition in workbook order - column A descending, rows with the same value in spool order."""
+
+        cursor = self._connection.execute("SELECT row_values FROM rows WHERE partition = ? ORDER BY sort_key DESC, position", (key,))
+
+        for (row_values,) in cursor:
+            yield json.loads(row_values)
+
+    def close(self) -> None:
+        """Close and delete the spool folder."""
+
+        self._connection.close()
+
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+def rebuild_partitions(
+    sharepoint_api,
+    folder_name: str,
+    workbook_name: str,
+    rows: Iterable,
+    transform: Callable[[Iterable], Iterable[dict]],
+    granularity: str,
+    sheet_name: str = "Besvarelser",
+    column_width_cap: int = 100,
+    freeze_panes: str | None = "A2"
+) -> dict[str, int]:
+    """
+    Write every partition of the workbook from the raw submission rows and replace the index.
+    transform turns the raw rows into workbook rows, which are spooled by partition in one pass. Each partition is
+    then streamed from the spool into a write-only sheet, sorted and formatted like update_workbook leaves it, and
+    uploaded before the next partition is read. Returns the number of rows written per partition.
+    """
+
+    row_counts = {}
+
+    with PartitionSpool(config.SNAPSHOT_SPOOL_FOLDER) as spool:
+        spool.add(iter(transform(rows)), granularity)
+
+        for key, layout in spool.partitions.items():
+            widths, wrapped = workbook_update.layout_from_lengths(layout["max_lengths"], column_width_cap)
+
+            workbook = workbook_update.stream_workbook(sheet_name, layout["header"], spool.rows(key), widths, wrapped, freeze_panes)
+
+            file_name = partition_file_name(workbook_name, key)
+
+            excel_writer.upload_workbook(sharepoint_api, excel_writer.save_workbook(workbook), file_name=file_name, folder_name=folder_name)
+
+            print(f"Wrote {layout['row_count']} rows to partition '{file_name}'.")
+
+            row_counts[key] = layout["row_count"]
+
+    upload_index(sharepoint_api, folder_name, workbook_name, row_counts, replace=True)
+
+    return row_counts
+
+
+def append_to_partition(
+    sharepoint_api,
+    folder_name: str,
+    workbook_name: str,
+    new_rows: list[dict],
+    existing_files: Iterable[str],
+    granularity: str,
+    sheet_name: str = "Besvarelser"
+) -> None:
+    """
+    Add new rows to the partitions of the workbook they belong to - normally just last month's - creating a partition
+    if it does not exist yet, and update their entries in the index.
+    """
+
+    if not new_rows:
+        print(f"No new rows for the partitions of '{workbook_name}'.")
+
+        return
+
+    existing_files = set(existing_files)
+
+    row_counts = {}
+
+    for key, partition_rows in group_rows(new_rows, granularity).items():
+        file_name = partition_file_name(workbook_name, key)
+
+        if file_name in existing_files:
+            row_counts[key] = workbook_update.update_workbook(sharepoint_api, folder_name, file_name, sheet_name, partition_rows)
+
+            continue
+
+        header = list(partition_rows[0])
+
+        workbook = workbook_update.build_workbook(sheet_name, header, [[row.get(column, "") for column in header] for row in partition_rows])
+
+        excel_writer.upload_workbook(sharepoint_api, excel_writer.save_workbook(workbook), file_name=file_name, folder_name=folder_name)
+
+        print(f"Created partition '{file_name}' with {len(partition_rows)} rows.")
+
+        row_counts[key] = len(partition_rows)
+
+    upload_index(sharepoint_api, folder_name, workbook_name, row_counts)
+
+
+def upload_index(sharepoint_api, folder_name: str, workbook_name: str, row_counts: dict[str, int], replace: bool = False) -> None:
+    """
+    Write the index workbook with the given row count per partition. Unless replace is set, the entries of other
+    partitions are kept from the current index.
+    """
+
+    file_name = index_file_name(workbook_name)
+
+    entries = {}
+
+    if not replace:
+        with instrumentation.span("sharepoint_download"):
+            binary_file = sharepoint_api.fetch_file_using_open_binary(file_name, folder_name)
+
+        if binary_file is not None:
+            with instrumentation.span("workbook_io"):
+                entries = read_index(BytesIO(binary_file))
+
+    workbook = build_index(workbook_name, row_counts, entries)
+
+    excel_writer.upload_workbook(sharepoint_api, excel_writer.save_workbook(workbook), file_name=file_name, folder_name=folder_name)
+
+
+def read_index(index_file) -> dict[str, list]:
+    """Read the entries of an index workbook, keyed by partition."""
+
+    workbook = load_workbook(index_file, read_only=True)
+
+    try:
+        rows = workbook[INDEX_SHEET_NAME].iter_rows(min_row=2, values_only=True)
+
+        return {str(row[0]): list(row) for row in rows if row[0] is not None}
+
+    finally:
+        workbook.close()
+
+
+def build_index(workbook_name: str, row_counts: dict[str, int], entries: dict[str, list] | None = None) -> Workbook:
+    """Build the index workbook from the current entries, with the given partitions added or updated."""
+
+    entries = dict(entries or {})
+
+    updated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    for key, row_count in row_counts.items():
+        entries[key] = [key, partition_file_name(workbook_name, key), row_count, updated]
+
+    return workbook_update.build_workbook(INDEX_SHEET_NAME, INDEX_HEADER, list(entries.values()))
+
+
+def split_workbook(path: str, granularity: str, output_folder: str, sheet_name: str = "Besvarelser") -> dict[str, int]:
+    """
+    Split a single workbook into partition files and an index workbook in output_folder.
+    Rows are partitioned by their 'Gennemført' date, like rebuild_partitions and append_to_partition do. Returns the
+    number of rows per partition.
+    """
+
+    workbook_name = os.path.basename(path)
+
+    workbook = load_workbook(path, read_only=True)
+
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+
+        header = list(next(rows))
+
+        submitted_column = header.index(SUBMITTED_COLUMN)
+
+        partitions = {}
+
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+
+            key = row_partition_key(row[submitted_column], granularity)
+
+            partitions.setdefault(key, []).append(list(row))
+
+    finally:
+        workbook.close()
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    for key, partition_rows in partitions.items():
+        workbook_update.build_workbook(sheet_name, header, partition_rows).save(os.path.join(output_folder, partition_file_name(workbook_name, key)))
+
+    row_counts = {key: len(partition_rows) for key, partition_rows in partitions.items()}
+
+    build_index(workbook_name, row_counts).save(os.path.join(output_folder, index_file_name(workbook_name)))
+
+    return row_counts
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in (4, 5) and sys.argv[1] == "split":
+        output = sys.argv[4] if len(sys.argv) == 5 else os.path.dirname(os.path.abspath(sys.argv[2]))
+
+        split_row_counts = split_workbook(sys.argv[2], sys.argv[3], output)
+
+        for partition, partition_row_count in sorted(split_row_counts.items()):
+            print(f"{partition}: {partition_row_count} rows")
+
+        print(f"Wrote {len(split_row_counts)} partitions and an index to '{output}'.")
+
+    else:
+        print(__doc__)
@@ -0,0 +1,267 @@
+"""
+Local append, sort and format of an existing workbook in a single SharePoint round trip.
+
+append_row_to_sharepoint_excel and format_and_sort_excel_file each download the workbook, change it and upload it
+again, and the sort goes through a DataFrame of the whole sheet every month. Here the workbook is downloaded once, the
+new rows are merged into the existing rows, the sheet is rewritten and formatted in one pass, and the result is
+uploaded once.
+
+The sheet keeps the order format_and_sort_excel_file gave it - column A as text, descending - so the existing rows are
+already sorted and only the new rows need sorting before the two are merged. A sheet that is not in order (e.g. after
+manual edits) is sorted in full.
+
+A new workbook is written sorted and formatted by write_workbook through a write-only sheet and uploaded once.
+"""
+
+import heapq
+import itertools
+import math
+
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from typing import Iterable
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font
+from openpyxl.utils import get_column_letter
+
+from robot_framework import config
+from robot_framework import instrumentation
+from robot_framework.sub_processes import excel_writer
+
+
+def update_workbook(
+    sharepoint_api,
+    folder_name: str,
+    excel_file_name: str,
+    sheet_name: str,
+    new_rows: list[dict],
+    column_width_cap: int = 100,
+    freeze_panes: str | None = "A2"
+) -> int:
+    """
+    Download the workbook, add new_rows to the sheet, sort it by column A (descending), format it and upload it.
+    With no new rows the sheet is only sorted where needed and formatted. Returns the number of data rows in the sheet.
+    """
+
+    with instrumentation.span("sharepoint_download"):
+        binary_file = sharepoint_api.fetch_file_using_open_binary(excel_file_name, folder_name)
+
+    if binary_file is None:
+        raise FileNotFoundError(f"File '{excel_file_name}' not found in folder '{folder_name}'.")
+
+    with instrumentation.span("workbook_io"):
+        workbook = load_workbook(BytesIO(binary_file))
+
+    if sheet_name not in workbook.sheetnames:
+        raise ValueError(f"Sheet '{sheet_name}' not found in '{excel_file_name}'")
+
+    sheet = workbook[sheet_name]
+
+    header, existing_rows = read_sheet(sheet)
+
+    added_rows = [[row.get(column, "") for column in header] for row in new_rows]
+
+    rows = merge_sorted_rows(existing_rows, added_rows)
+
+    write_sheet(sheet, header, rows, column_width_cap, freeze_panes)
+
+    excel_writer.upload_workbook(sharepoint_api, excel_writer.save_workbook(workbook), file_name=excel_file_name, folder_name=folder_name)
+
+    print(f"Added {len(added_rows)} rows to, sorted and formatted '{sheet_name}' in '{excel_file_name}'.")
+
+    return len(rows)
+
+
+def write_workbook(
+    rows: Iterable[dict],
+    sheet_name: str,
+    column_width_cap: int = 100,
+    freeze_panes: str | None = "A2",
+    spool_threshold: int = config.EXCEL_SPOOL_THRESHOLD_BYTES
+) -> SpooledTemporaryFile:
+    """
+    Write dict rows to a new workbook, sorted and formatted the way update_workbook leaves a sheet, and return it as a
+    file-like object ready for a single upload. The header is taken from the keys of the first row. The caller is
+    responsible for closing the returned file.
+    """
+
+    header = None
+    values = []
+
+    for row in rows:
+        if header is None:
+            header = list(row)
+
+        values.append([row.get(column) for column in header])
+
+    return excel_writer.save_workbook(build_workbook(sheet_name, header or [], values, column_width_cap, freeze_panes), spool_threshold)
+
+
+def build_workbook(sheet_name: str, header: list, rows: list[list], column_width_cap: int = 100, freeze_panes: str | None = "A2") -> Workbook:
+    """
+    Build a new write-only workbook holding the rows, sorted and formatted the way update_workbook leaves a sheet.
+    The sheet is streamed out when the workbook is saved, so the workbook can only be saved once.
+    """
+
+    rows = merge_sorted_rows([], rows)
+
+    widths, wrapped = column_layout(header, rows, column_width_cap)
+
+    return stream_workbook(sheet_name, header, rows, widths, wrapped, freeze_panes)
+
+
+def stream_workbook(sheet_name: str, header: list, rows: Iterable[list], widths: list[int], wrapped: list[bool], freeze_panes: str | None = "A2") -> Workbook:
+    """
+    Write rows that are already sorted to a new write-only workbook, formatted with the given column layout.
+    Rows are written out as they are read, so the rows can be a generator over more rows than fit in memory.
+    """
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+
+    for column_index, width in enumerate(widths, start=1):
+        sheet.column_dimensions[get_column_letter(column_index)].width = width
+
+    if freeze_panes:
+        sheet.freeze_panes = freeze_panes
+
+    if not header:
+        return workbook
+
+    fonts = {True: Font(bold=True), False: Font(bold=False, italic=False)}
+    alignments = {wrap: Alignment(horizontal="left", vertical="top", wrap_text=wrap) for wrap in (True, False)}
+
+    for row_number, row in enumerate(itertools.chain([header], rows), start=1):
+        cells = []
+
+        for column_index, value in enumerate(row):
+            cell = WriteOnlyCell(sheet, value=value)
+            cell.font = fonts[row_number == 1]
+            cell.alignment = alignments[wrapped[column_index]]
+
+            cells.append(cell)
+
+        sheet.row_dimensions[row_number].height = row_line_count(row, widths, wrapped) * 20
+
+        sheet.append(cells)
+
+    return workbook
+
+
+def read_sheet(sheet) -> tuple[list, list[list]]:
+    """Return the header and the data rows of a sheet, skipping rows where every cell is empty."""
+
+    rows = sheet.iter_rows(values_only=True)
+
+    header = list(next(rows, ()))
+
+    return header, [list(row) for row in rows if any(value is not None for value in row)]
+
+
+def merge_sorted_rows(existing_rows: list[list], new_rows: list[list]) -> list[list]:
+    """
+    Sort rows by column A as text, descending, with column A stored as text - the same result as sorting with
+    format_and_sort_excel_file. Existing rows that are already in order are merged with the sorted new rows instead
+    of being sorted again.
+    """
+
+    for row in new_rows:
+        row[0] = str(row[0])
+
+    new_rows.sort(key=_sort_key, reverse=True)
+
+    if _is_sorted(existing_rows):
+        return list(heapq.merge(existing_rows, new_rows, key=_sort_key, reverse=True))
+
+    for row in existing_rows:
+        row[0] = str(row[0])
+
+    return sorted(existing_rows + new_rows, key=_sort_key, reverse=True)
+
+
+def _sort_key(row: list) -> str:
+    return row[0]
+
+
+def _is_sorted(rows: list[list]) -> bool:
+    """Whether column A holds text in descending order."""
+
+    if not all(isinstance(row[0], str) for row in rows):
+        return False
+
+    return all(current[0] >= following[0] for current, following in zip(rows, rows[1:]))
+
+
+def column_layout(header: list, rows: list[list], column_width_cap: int) -> tuple[list[int], list[bool]]:
+    """
+    The width of each column - its longest value plus 2, up to column_width_cap - and whether it is wrapped because
+    its content is wider than the cap.
+    """
+
+    max_lengths = [max(len(str(row[column_index] or "")) for row in [header] + rows) for column_index in range(len(header))]
+
+    return layout_from_lengths(max_lengths, column_width_cap)
+
+
+def layout_from_lengths(max_lengths: list[int], column_width_cap: int) -> tuple[list[int], list[bool]]:
+    """The column layout of column_layout from the length of the longest value of each column."""
+
+    widths = [max_len + 2 if max_len + 2 <= column_width_cap else column_width_cap for max_len in max_lengths]
+    wrapped = [max_len + 2 > column_width_cap for max_len in max_lengths]
+
+    return widths, wrapped
+
+
+def row_line_count(row: list, widths: list[int], wrapped: list[bool]) -> int:
+    """The number of lines the tallest wrapped cell of a row needs, at least 1."""
+
+    max_line_count = 1
+
+    for column_index, value in enumerate(row):
+        if value and wrapped[column_index]:
+            chars_per_line = widths[column_index] * 1.2
+            line_count = sum(math.ceil(len(line) / chars_per_line) for line in str(value).split("\n"))
+            max_line_count = max(max_line_count, line_count)
+
+    return max_line_count
+
+
+def write_sheet(sheet, header: list, rows: list[list], column_width_cap: int, freeze_panes: str | None) -> None:
+    """
+    Write the rows below the header and format the sheet like format_and_sort_excel_file does with a bold header,
+    left/top alignment and an int column width: columns are sized to their content up to column_width_cap, wider
+    columns are capped and wrapped, and rows with wrapped cells get room for every line.
+    """
+
+    all_rows = [header] + rows
+
+    widths, wrapped = column_layout(header, rows, column_width_cap)
+
+    for column_index, width in enumerate(widths, start=1):
+        sheet.column_dimensions[get_column_letter(column_index)].width = width
+
+    # Shared style objects - one per distinct style instead of one per cell
+    fonts = {True: Font(bold=True), False: Font(bold=False, italic=False)}
+    alignments = {wrap: Alignment(horizontal="left", vertical="top", wrap_text=wrap) for wrap in (True, False)}
+
+    for row_number, row in enumerate(all_rows, start=1):
+        font = fonts[row_number == 1]
+
+        for column_index, value in enumerate(row):
+            # Assigned separately, as sheet.cell ignores a value of None and would keep the old value of the cell
+            cell = sheet.cell(row=row_number, column=column_index + 1)
+            cell.value = value
+
+            cell.font = font
+            cell.alignment = alignments[wrapped[column_index]]
+
+        sheet.row_dimensions[row_number].height = row_line_count(row, widths, wrapped) * 20
+
+    # Rows left over from empty rows that were skipped
+    if sheet.max_row > len(all_rows):
+        sheet.delete_rows(len(all_rows) + 1, sheet.max_row - len(all_rows))
+
+    if freeze_panes:
+        sheet.freeze_panes = freeze_panes
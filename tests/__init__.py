@@ -0,0 +1 @@
+"""Tests for the ESQ robot. Run with python -m pytest."""
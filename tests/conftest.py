@@ -0,0 +1,40 @@
+"""Shared fixtures - a local SQLite stand-in for the Forms table and a local SMTP server."""
+
+import pytest
+
+from benchmarks import suite
+
+from robot_framework.sub_processes import database_engines
+from robot_framework.sub_processes import helper_functions
+
+from tests.smtp_standin import SmtpStandIn
+
+
+FORM_TYPE = suite.FORM_TYPE
+
+
+@pytest.fixture
+def forms_database(tmp_path_factory, monkeypatch):
+    """
+    Return a function that creates a SQLite Forms table with the given number of synthetic rows and returns its
+    connection string. The robot's queries are pointed at the stand-in table for the duration of the test.
+    """
+
+    monkeypatch.setattr(helper_functions, "FORMS_TABLE", "Forms")
+
+    data_dir = tmp_path_factory.mktemp("forms")
+
+    def create(size: int, seed: int = 42) -> str:
+        return f"sqlite:///{suite.forms_database(size, str(data_dir), seed=seed)}"
+
+    yield create
+
+    database_engines.dispose_engines()
+
+
+@pytest.fixture
+def smtp_server():
+    """A local SMTP stand-in that records the messages it accepts - see tests.smtp_standin."""
+
+    with SmtpStandIn() as standin:
+        yield standin
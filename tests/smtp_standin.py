@@ -0,0 +1,119 @@
+"""A local SMTP stand-in - a minimal threaded server that records messages and can be told to fail."""
+
+import socketserver
+import threading
+
+from email import message_from_bytes, policy
+
+
+class SmtpStandIn:
+    """
+    Accepts plain SMTP (no STARTTLS) on a free local port and records every accepted message.
+
+    refused_recipients are answered 550 at RCPT. data_replies is a list of reply codes used, in order, instead of 250
+    at the end of DATA, and drop_data is the number of DATA commands after which the connection is closed without a
+    reply, like a server that goes away mid-send.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.refused_recipients = set()
+        self.data_replies = []
+        self.drop_data = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+        standin = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            """One SMTP session."""
+
+            def handle(self):
+                with standin.lock:
+                    standin.connections += 1
+
+                self.reply("220 localhost ESMTP stand-in")
+
+                recipients = []
+
+                while line := self.rfile.readline():
+                    command = line.decode().strip()
+                    verb = command.split(" ", 1)[0].upper()
+
+                    if verb == "EHLO":
+                        self.reply("250-localhost", "250 8BITMIME")
+
+                    elif verb == "RCPT":
+                        address = command.split(":", 1)[1].strip().strip("<>")
+
+                        if address in standin.refused_recipients:
+                            self.reply("550 No such user")
+
+                        else:
+                            recipients.append(address)
+                            self.reply("250 OK")
+
+                    elif verb == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+
+                        if not self.receive_data(recipients):
+                            return
+
+                        recipients = []
+
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+
+                        return
+
+                    else:  # HELO, MAIL, RSET, NOOP
+                        if verb == "RSET":
+                            recipients = []
+
+                        self.reply("250 OK")
+
+            def receive_data(self, recipients: list[str]) -> bool:
+                """Read the message and answer it. Returns False if the connection was dropped."""
+
+                lines = []
+
+                while (line := self.rfile.readline()) not in (b".\r\n", b""):
+                    lines.append(line[1:] if line.startswith(b"..") else line)
+
+                with standin.lock:
+                    if standin.drop_data:
+                        standin.drop_data -= 1
+
+                        return False
+
+                    code = standin.data_replies.pop(0) if standin.data_replies else 250
+
+                    if code == 250:
+                        standin.messages.append((recipients, message_from_bytes(b"".join(lines), policy=policy.default)))
+
+                self.reply(f"{code} {'OK' if code == 250 else 'Failed'}")
+
+                return True
+
+            def reply(self, *lines: str) -> None:
+                """Write reply lines."""
+
+                self.wfile.write("".join(f"{line}\r\n" for line in lines).encode())
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def port(self) -> int:
+        """The port the stand-in listens on."""
+
+        return self.server.server_address[1]
+
+    def __enter__(self) -> "SmtpStandIn":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,90 @@
+"""Parity tests for the answer normaliser against the ast.literal_eval normaliser it replaced."""
+
+import random
+
+import pytest
+
+from benchmarks.answer_parsing import normalize_literal_eval
+
+from robot_framework.sub_processes import answer_parsing
+
+
+NESTED = [
+    "[['a', 'b'], 'c']",
+    "[[1, 2], [3]]",
+    "[['Ja'], []]",
+    "[{'a': 1}, 'b']",
+    "[('a', 'b')]",
+]
+
+QUOTED = [
+    "['a, b', 'c']",
+    "['[x]', 'y']",
+    '["a]", "b"]',
+    "['Ja, dagligt', \"Nej, aldrig\"]",
+    "[\"it's\", 'b']",
+    "['a\\'b']",
+    "['a' 'b']",
+    "['Mor [biologisk]']",
+]
+
+EMPTY = [
+    "",
+    "[]",
+    "[ ]",
+    "['']",
+    "[,]",
+    "['', '']",
+    "[ 'a' , ]",
+]
+
+NOT_LISTS = [
+    "[1, 2",
+    "1, 2]",
+    "(1, 2)",
+    "[01]",
+    "[1.5, -2]",
+    "[True, None]",
+    "[0x10]",
+    "['a'] + ['b']",
+    "[a, b]",
+    "Almindelig tekst",
+    "['a'\n, 'b']",
+    "Linje 1\r\nLinje 2",
+    None,
+    3,
+    1.5,
+    ["a", 1],
+    [],
+]
+
+
+@pytest.mark.parametrize("value", NESTED + QUOTED + EMPTY + NOT_LISTS)
+def test_same_output_as_literal_eval(value):
+    """Nested lists, quoted strings with commas or brackets, empty values and non-list input match the old normaliser."""
+
+    assert answer_parsing.normalize_value(value) == normalize_literal_eval(value)
+
+
+# Backslashes in the random strings are invalid escapes to the Python parser behind ast.literal_eval
+@pytest.mark.filterwarnings("ignore::DeprecationWarning", "ignore::SyntaxWarning")
+def test_random_bracketed_strings_match_literal_eval():
+    """Random list-like strings built from the characters that matter to the parser match the old normaliser."""
+
+    rng = random.Random(42)
+
+    alphabet = ["'", '"', ",", " ", "[", "]", "a", "b", "1", "-", "\\", "\n"]
+
+    for _ in range(20000):
+        value = "[" + "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12))) + "]"
+
+        assert answer_parsing.normalize_value(value) == normalize_literal_eval(value), value
+
+
+def test_parser_hands_unsupported_shapes_to_literal_eval():
+    """The dedicated parser only answers for flat lists of quoted strings and integers."""
+
+    assert answer_parsing.parse_list_literal("['a', \"b\", 3, -4,]") == ["a", "b", 3, -4]
+    assert answer_parsing.parse_list_literal("[['a']]") is answer_parsing.UNSUPPORTED
+    assert answer_parsing.parse_list_literal("['a\\'b']") is answer_parsing.UNSUPPORTED
+    assert answer_parsing.parse_list_literal("[1.5]") is answer_parsing.UNSUPPORTED
@@ -0,0 +1,71 @@
+"""Tests for the columnar build_df, which must give the same DataFrame as the row-wise one."""
+
+import copy
+
+import pandas as pd
+import pytest
+
+from benchmarks import synthetic
+
+from robot_framework.sub_processes import formular_mappings
+from robot_framework.sub_processes import helper_functions
+
+
+@pytest.mark.parametrize("role", list(formular_mappings.ROLE_MAPPINGS))
+def test_columnar_matches_row_wise(role):
+    """Both paths build the same DataFrame from the synthetic submissions of each role."""
+
+    submissions = synthetic.generate_submissions(2000, seed=7)
+    mapping = formular_mappings.ROLE_MAPPINGS[role]
+
+    row_wise = helper_functions.build_df(submissions, role, mapping)
+    columnar = helper_functions.build_df(submissions, role, mapping, columnar=True)
+
+    assert len(row_wise) > 0
+
+    pd.testing.assert_frame_equal(columnar, row_wise)
+
+
+def test_missing_and_invalid_dates_match_row_wise():
+    """A missing or unparseable date gives None for both dates of the row on both paths."""
+
+    role, mapping = next(iter(formular_mappings.ROLE_MAPPINGS.items()))
+
+    submissions = [copy.deepcopy(submission) for submission in synthetic.generate_submissions(200, seed=3) if submission["data"]["hvem_udfylder_spoergeskemaet"] == role][:3]
+
+    submissions[0]["entity"]["created"] = []
+    submissions[1]["entity"]["completed"][0]["value"] = "not a date"
+
+    row_wise = helper_functions.build_df(submissions, role, mapping)
+    columnar = helper_functions.build_df(submissions, role, mapping, columnar=True)
+
+    pd.testing.assert_frame_equal(columnar, row_wise)
+
+    assert columnar["Oprettet"].isna().tolist()[:3] == [True, True, False]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_non_string_dates_raise_on_both_paths(columnar):
+    """A date that is present but not a string is a TypeError, whichever path builds the DataFrame."""
+
+    role, mapping = next(iter(formular_mappings.ROLE_MAPPINGS.items()))
+
+    submission = copy.deepcopy(next(submission for submission in synthetic.generate_submissions(50, seed=3) if submission["data"]["hvem_udfylder_spoergeskemaet"] == role))
+    submission["entity"]["created"][0]["value"] = 1700000000
+
+    with pytest.raises(TypeError):
+        helper_functions.build_df([submission], role, mapping, columnar=columnar)
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_nested_table_must_be_a_dict_on_both_paths(columnar):
+    """A nested answer table that is not a dict raises the same TypeError on both paths."""
+
+    role, mapping = next(iter(formular_mappings.ROLE_MAPPINGS.items()))
+    table_key = next(key for key, target in mapping.items() if isinstance(target, dict))
+
+    submission = copy.deepcopy(next(submission for submission in synthetic.generate_submissions(50, seed=3) if submission["data"]["hvem_udfylder_spoergeskemaet"] == role))
+    submission["data"][table_key] = ["not", "a", "dict"]
+
+    with pytest.raises(TypeError, match=f"Expected nested data for '{table_key}'"):
+        helper_functions.build_df([submission], role, mapping, columnar=columnar)
@@ -0,0 +1,205 @@
+"""Tests for the asyncio email pipeline against the synchronous email flow, with a local SMTP stand-in."""
+
+import re
+import threading
+import time
+
+from benchmarks import synthetic
+
+from robot_framework.sub_processes import email_pipeline
+from robot_framework.sub_processes import email_rendering
+from robot_framework.sub_processes import formular_mappings
+from robot_framework.sub_processes import mail_dispatcher
+
+
+NAME_PATTERN = re.compile(r"Barnets/Den unges navn</strong></td><td>([^<]*)</td>")
+
+
+def forms(count: int = 120, children: int = 9) -> list[dict]:
+    """Synthetic submissions of both roles, spread over a few children so most emails hold several sections."""
+
+    submissions = synthetic.generate_submissions(count, seed=21)
+
+    for position, submission in enumerate(submissions):
+        submission["data"]["cpr_nummer_manuelt" if is_youth(submission) else "cpr_nummer_barnet_manuelt"] = f"01010{position % children}1234"
+
+    # A role without an email is skipped
+    submissions[5]["data"]["hvem_udfylder_spoergeskemaet"] = "Andet"
+
+    return submissions
+
+
+def is_youth(form: dict) -> bool:
+    """Whether the youth filled in the form."""
+
+    return form["data"]["hvem_udfylder_spoergeskemaet"] == synthetic.ROLES[0]
+
+
+def cpr_of(form: dict) -> str:
+    """The child's CPR number of a submission."""
+
+    return form["data"]["cpr_nummer_manuelt" if is_youth(form) else "cpr_nummer_barnet_manuelt"]
+
+
+def name_of(form: dict) -> str:
+    """The child's name of a submission."""
+
+    return form["data"]["navn_manuelt" if is_youth(form) else "barnets_navn_manuelt"]
+
+
+def recipient_for(transformed_row: dict) -> str:
+    """A recipient per AZ-ident, so the receiver of an email shows which entry it was taken from."""
+
+    return f"{transformed_row['AZ-ident'].lower()}@example.dk"
+
+
+def synchronous_emails(submissions: list[dict]) -> list[mail_dispatcher.OutgoingEmail]:
+    """The emails of the synchronous flow in process.process - transform, group by CPR, render in one batch."""
+
+    forms_by_cpr = {}
+
+    for form in submissions:
+        role = form["data"]["hvem_udfylder_spoergeskemaet"]
+
+        if role not in formular_mappings.ROLE_MAPPINGS:
+            continue
+
+        transformed_row = formular_mappings.transform_form_submission(form["entity"]["serial"][0]["value"], form, formular_mappings.ROLE_MAPPINGS[role])
+        transformed_row["Tilkoblet email"] = recipient_for(transformed_row)
+
+        forms_by_cpr.setdefault(transformed_row["Barnets/Den unges CPR-nummer"], []).append({"form": form, "transformed": transformed_row, "role": role})
+
+    email_bodies = email_rendering.render_emails(forms_by_cpr)
+
+    return [
+        mail_dispatcher.OutgoingEmail(receiver=entries[-1]["transformed"]["Tilkoblet email"], subject=email_pipeline.SUBJECT, html_body=email_bodies[cpr])
+        for cpr, entries in forms_by_cpr.items()
+    ]
+
+
+def received(smtp_server) -> set[tuple]:
+    """The recipients, subject and HTML body of every message the stand-in accepted."""
+
+    return {(tuple(recipients), message["subject"], message.get_body(("html",)).get_content()) for recipients, message in smtp_server.messages}
+
+
+def dispatcher_for(smtp_server, connections: int = 1) -> mail_dispatcher.MailDispatcher:
+    """A dispatcher sending to the stand-in without STARTTLS."""
+
+    settings = mail_dispatcher.SmtpSettings(server="127.0.0.1", port=smtp_server.port, sender="robot@example.dk", starttls=False, timeout=5)
+
+    return mail_dispatcher.MailDispatcher(settings, connections=connections)
+
+
+class StubDispatcher:  # pylint: disable=too-few-public-methods
+    """Records the emails it is given. fail_on names a receiver whose send raises, pause the seconds the first send takes."""
+
+    def __init__(self, fail_on: str | None = None, pause: float = 0.0, on_first_send=None):
+        self.fail_on = fail_on
+        self.pause = pause
+        self.on_first_send = on_first_send
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send(self, email: mail_dispatcher.OutgoingEmail) -> mail_dispatcher.Delivery:
+        """Pretend to send the email."""
+
+        with self.lock:
+            first = not self.sent
+            self.sent.append(email)
+
+        if first and self.pause:
+            time.sleep(self.pause)
+
+            if self.on_first_send:
+                self.on_first_send()
+
+        if email.receiver == self.fail_on:
+            raise RuntimeError("Template error")
+
+        return mail_dispatcher.Delivery(email, 0.0, 1)
+
+
+def test_pipeline_sends_the_same_messages_as_the_synchronous_flow(smtp_server):
+    """The stand-in receives the same messages from the pipeline as from rendering and sending synchronously."""
+
+    submissions = forms()
+
+    with dispatcher_for(smtp_server) as dispatcher:
+        dispatcher.send_all(synchronous_emails(submissions))
+
+    synchronous = received(smtp_server)
+    smtp_server.messages.clear()
+
+    with dispatcher_for(smtp_server, connections=2) as dispatcher:
+        result = email_pipeline.run_pipeline(submissions, recipient_for, dispatcher, send_concurrency=2, queue_size=4, fetch_batch_size=7)
+
+    assert len(synchronous) == 9
+    assert received(smtp_server) == synchronous
+    assert all(delivery.ok for delivery in result.deliveries)
+    assert result.skipped_forms == 1
+
+
+def test_entries_are_grouped_per_child_in_submission_order():
+    """Each child gets one email with its sections in submission order, sent to the recipient of its last entry."""
+
+    submissions = forms()
+
+    dispatcher = StubDispatcher()
+
+    email_pipeline.run_pipeline(submissions, recipient_for, dispatcher, send_concurrency=1, queue_size=2, fetch_batch_size=5)
+
+    expected = {email.html_body: email for email in synchronous_emails(submissions)}
+
+    assert len(dispatcher.sent) == len(expected)
+
+    for email in dispatcher.sent:
+        assert email.receiver == expected[email.html_body].receiver
+
+        cpr = re.search(r"CPR: <strong>([^<]*)</strong>", email.html_body).group(1)
+
+        names = [name_of(form) for form in submissions if form["data"]["hvem_udfylder_spoergeskemaet"] in formular_mappings.ROLE_MAPPINGS and cpr_of(form) == cpr]
+
+        assert NAME_PATTERN.findall(email.html_body) == names
+
+
+def test_full_queue_holds_back_rendering(monkeypatch):
+    """While the first send is slow, rendering stops once the send queue is full instead of rendering every email."""
+
+    rendered = []
+    render_email = email_rendering.render_email
+
+    def counting_render(cpr, entries):
+        rendered.append(cpr)
+
+        return render_email(cpr, entries)
+
+    monkeypatch.setattr(email_rendering, "render_email", counting_render)
+
+    rendered_during_first_send = []
+
+    dispatcher = StubDispatcher(pause=0.3, on_first_send=lambda: rendered_during_first_send.append(len(rendered)))
+
+    result = email_pipeline.run_pipeline(forms(200, children=40), recipient_for, dispatcher, send_concurrency=1, queue_size=2, fetch_batch_size=10)
+
+    # One email being sent, two in the queue and one rendered and waiting for room
+    assert rendered_during_first_send[0] <= 4
+    assert len(rendered) == len(dispatcher.sent) == 40
+    assert result.stages["render"].blocked_on_output >= 0.2
+
+
+def test_unexpected_send_error_is_recorded_and_the_rest_are_sent():
+    """An error the dispatcher does not handle fails only its own email - every other email is still sent."""
+
+    submissions = forms()
+
+    failing = synchronous_emails(submissions)[3].receiver
+
+    dispatcher = StubDispatcher(fail_on=failing)
+
+    result = email_pipeline.run_pipeline(submissions, recipient_for, dispatcher, send_concurrency=2, queue_size=2)
+
+    failed = [delivery for delivery in result.deliveries if not delivery.ok]
+
+    assert len(result.deliveries) == len(dispatcher.sent) == 9
+    assert len(failed) == 1 and failed[0].email.receiver == failing and isinstance(failed[0].error, RuntimeError)
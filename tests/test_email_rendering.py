@@ -0,0 +1,92 @@
+"""Tests for the daily email rendering - escaping, and the same HTML as the table_att rendering it replaced."""
+
+import random
+
+from datetime import datetime
+
+from benchmarks import synthetic
+from benchmarks.email_rendering import make_entries, render_with_concatenation
+
+from robot_framework.sub_processes import email_rendering
+from robot_framework.sub_processes import formular_mappings
+
+
+def fixed_entries() -> dict:
+    """One youth and one parent submission for the same child, with list-like answers and multi-line free text."""
+
+    rng = random.Random(2024)
+
+    submissions = {}
+
+    for serial in range(1, 40):
+        submission = synthetic.make_submission(rng, serial, datetime(2024, 5, 1, 10, serial))
+        submissions.setdefault(submission["data"]["hvem_udfylder_spoergeskemaet"], submission)
+
+    youth = submissions[email_rendering.YOUTH_ROLE]
+    parent = submissions[email_rendering.PARENT_ROLE]
+
+    youth["data"]["behandling"] = "['Individuel samtale', 'Forældresamtale']"
+    youth["data"]["her_er_plads_til_at_du_kan_skrive_hvad_du_taenker_eller_foeler_o"] = "Godt.\r\nTak for hjælpen"
+    parent["data"]["cpr_nummer_barnet_manuelt"] = youth["data"]["cpr_nummer_manuelt"]
+
+    entries = []
+
+    for role, submission in ((email_rendering.YOUTH_ROLE, youth), (email_rendering.PARENT_ROLE, parent)):
+        mapping = formular_mappings.center_for_trivsel_esq_barn_mapping if role == email_rendering.YOUTH_ROLE else formular_mappings.center_for_trivsel_esq_foraelder_mapping
+
+        entries.append({"role": role, "transformed": formular_mappings.transform_form_submission(submission["entity"]["serial"][0]["value"], submission, mapping)})
+
+    return {youth["data"]["cpr_nummer_manuelt"]: entries}
+
+
+def test_same_html_as_table_att_rendering():
+    """Without characters to escape, a fixed youth and parent submission render exactly as before."""
+
+    entries_by_cpr = fixed_entries()
+
+    rendered = email_rendering.render_emails(entries_by_cpr)
+
+    assert rendered == render_with_concatenation(entries_by_cpr)
+    assert rendered[next(iter(entries_by_cpr))].count("<table") == 2
+
+
+def test_same_html_as_table_att_rendering_on_synthetic_submissions():
+    """Synthetic submissions of both roles, grouped by CPR number, render exactly as before."""
+
+    entries_by_cpr = make_entries(400)
+
+    assert email_rendering.render_emails(entries_by_cpr) == render_with_concatenation(entries_by_cpr)
+
+
+def test_values_are_escaped():
+    """Answer text, names and the CPR number are HTML-escaped, so they are shown as written."""
+
+    entries_by_cpr = fixed_entries()
+    cpr, entries = next(iter(entries_by_cpr.items()))
+
+    youth = entries[0]["transformed"]
+    youth["Barnets/Den unges navn"] = "Anna <b>& Bo</b>"
+    youth["Her er plads til, at du kan skrive, hvad du tænker eller føler om behandlingen"] = "Jeg sagde \"nej\" & 'måske' <script>"
+
+    html = email_rendering.render_email(f"{cpr}<", entries)
+
+    assert "Anna &lt;b&gt;&amp; Bo&lt;/b&gt;" in html
+    assert "Jeg sagde &quot;nej&quot; &amp; &#x27;måske&#x27; &lt;script&gt;" in html
+    assert f"<strong>{cpr}&lt;</strong>" in html
+    assert "<script>" not in html and "<b>" not in html
+
+
+def test_labels_and_role_are_escaped():
+    """Question labels and the role heading are escaped when the section is compiled."""
+
+    template = email_rendering.compile_section(email_rendering.YOUTH_ROLE, {"spoergsmaal_barn_tabel": {"spg_1": "Er 1 < 2 & \"altid\" 'sandt'?"}})
+
+    parts = []
+    template.render_into(parts, {"Er 1 < 2 & \"altid\" 'sandt'?": "Sandt"})
+
+    html = "".join(parts)
+
+    assert "<strong>Er 1 &lt; 2 &amp; &quot;altid&quot; &#x27;sandt&#x27;?</strong></td><td>Sandt</td>" in html
+    assert template.head.startswith("<p><strong>Udfylder rolle:</strong> Ung/selvbesvarelse</p>")
+
+    assert email_rendering.row_prefix("<i>") == "  <tr><td><strong>&lt;i&gt;</strong></td><td>"
@@ -0,0 +1,113 @@
+"""Tests for the background error reports, with a fake image source and a local SMTP stand-in."""
+
+import threading
+
+from io import BytesIO
+
+import pytest
+
+from robot_framework import error_screenshot
+from robot_framework.sub_processes.mail_dispatcher import SmtpSettings
+
+
+class FakeImage:
+    """Stands in for a PIL screenshot. Encoding it waits until the gate is opened, like a slow report."""
+
+    mode = "RGB"
+
+    def __init__(self, gate: threading.Event):
+        self.gate = gate
+        self.size = None
+
+    def thumbnail(self, size):
+        """Wait for the gate, then remember the size it was downscaled to."""
+
+        self.gate.wait(5)
+
+        self.size = size
+
+    def save(self, buffer, **_options):
+        """Write placeholder image bytes."""
+
+        buffer.write(b"fake image")
+
+
+def reporter_for(smtp_server, image_source) -> error_screenshot.ErrorReporter:
+    """A reporter sending to the stand-in without STARTTLS."""
+
+    return error_screenshot.ErrorReporter(
+        smtp=SmtpSettings(server="127.0.0.1", port=smtp_server.port, sender="robot@example.dk", starttls=False, timeout=5),
+        image_source=image_source,
+        screenshot=error_screenshot.ScreenshotSettings(max_size=(640, 640), image_format="JPEG", quality=50)
+    )
+
+
+def test_report_is_sent_in_the_background(smtp_server):
+    """report returns before the screenshot is encoded and sent, and flush waits for the send up to its timeout."""
+
+    gate = threading.Event()
+    image = FakeImage(gate)
+
+    reporter = reporter_for(smtp_server, lambda: image)
+
+    reporter.report("drift@example.dk", ValueError("Forkert svar"), "ESQ")
+
+    assert reporter.flush(0.1) == 1
+    assert not smtp_server.messages
+
+    gate.set()
+
+    assert reporter.flush(5) == 0
+    assert reporter.stats == {"reports_sent": 1, "reports_failed": 0}
+    assert image.size == (640, 640)
+
+    recipients, message = smtp_server.messages[0]
+    attachment = next(message.iter_attachments())
+
+    assert recipients == ["drift@example.dk"]
+    assert message["subject"] == "Error screenshot: ESQ"
+    assert attachment.get_filename() == "screenshot.jpg"
+    assert attachment.get_payload(decode=True) == b"fake image"
+
+
+def test_report_without_screenshot(smtp_server):
+    """A screenshot that cannot be taken does not stop the report."""
+
+    def no_screen():
+        raise OSError("No display")
+
+    reporter = reporter_for(smtp_server, no_screen)
+
+    reporter.report("drift@example.dk", ValueError("Forkert svar"), "ESQ")
+
+    assert reporter.flush(5) == 0
+
+    _, message = smtp_server.messages[0]
+
+    assert not list(message.iter_attachments())
+    assert "No screenshot could be taken." in message.get_body(("html",)).get_content()
+
+
+def test_failed_send_is_counted(smtp_server):
+    """A report the server refuses is counted as failed instead of raising on the background thread."""
+
+    smtp_server.refused_recipients = {"ukendt@example.dk"}
+
+    reporter = reporter_for(smtp_server, lambda: None)
+
+    reporter.report("ukendt@example.dk", ValueError("Forkert svar"), "ESQ")
+
+    assert reporter.flush(5) == 0
+    assert reporter.stats == {"reports_sent": 0, "reports_failed": 1}
+
+
+def test_screenshots_are_downscaled_and_converted():
+    """A large RGBA screenshot is downscaled within max_size and encoded as JPEG."""
+
+    pil_image = pytest.importorskip("PIL.Image")
+
+    encoded = error_screenshot.encode_screenshot(pil_image.new("RGBA", (4000, 2000)), max_size=(1280, 1280), image_format="JPEG", quality=70)
+
+    with pil_image.open(BytesIO(encoded)) as image:
+        assert image.format == "JPEG"
+        assert image.size == (1280, 640)
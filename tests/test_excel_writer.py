@@ -0,0 +1,77 @@
+"""Tests for the streaming workbook writer."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from openpyxl import load_workbook
+
+from robot_framework.sub_processes import excel_writer
+
+
+# Writes a workbook in a fresh interpreter and prints the growth of its peak RSS in MB. ru_maxrss is in KB on Linux
+PEAK_RSS_SCRIPT = """
+import resource
+import sys
+
+from benchmarks import excel_writing, synthetic
+
+writer, count = sys.argv[1], int(sys.argv[2])
+
+rows = synthetic.iter_rows(count) if writer == "write_streaming" else synthetic.generate_rows(count)
+
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+getattr(excel_writing, writer)(rows)
+
+print((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024)
+"""
+
+
+def peak_rss_growth(writer: str, count: int) -> float:
+    """Peak RSS growth in MB of one benchmarks.excel_writing writer over count synthetic rows, in a fresh interpreter."""
+
+    completed = subprocess.run(
+        [sys.executable, "-c", PEAK_RSS_SCRIPT, writer, str(count)],
+        capture_output=True, text=True, check=False, env=os.environ, cwd=os.path.dirname(os.path.dirname(__file__))
+    )
+
+    assert completed.returncode == 0, completed.stderr[-2000:]
+
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def test_write_workbook_round_trip():
+    """The header comes from the first row's keys and every row is written in order."""
+
+    rows = [{"Serial number": serial, "Svar": f"Svar {serial}"} for serial in range(5)]
+
+    with excel_writer.write_workbook(iter(rows)) as workbook_file:
+        sheet = load_workbook(workbook_file, read_only=True)["Besvarelser"]
+
+        values = [list(row) for row in sheet.iter_rows(values_only=True)]
+
+    assert values == [["Serial number", "Svar"]] + [[row["Serial number"], row["Svar"]] for row in rows]
+
+
+def test_streaming_writer_peak_rss(record_property):
+    """
+    The streaming writer's peak RSS stays flat as the row count grows, and well below the DataFrame path's.
+    The measured peaks are reported as test properties and printed (pytest -s).
+    """
+
+    pytest.importorskip("resource")
+
+    small = peak_rss_growth("write_streaming", 1000)
+    large = peak_rss_growth("write_streaming", 10000)
+    dataframe = peak_rss_growth("write_with_dataframe", 10000)
+
+    for name, value in (("streaming_1000_mb", small), ("streaming_10000_mb", large), ("dataframe_10000_mb", dataframe)):
+        record_property(name, value)
+
+    print(f"Peak RSS growth: streaming {small:.1f} MB (1000 rows), {large:.1f} MB (10000 rows); DataFrame {dataframe:.1f} MB (10000 rows)")
+
+    assert large - small < 16
+    assert large < dataframe / 2
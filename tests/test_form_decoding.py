@@ -0,0 +1,97 @@
+"""Tests for form_data decoding - the schema projection, purged detection and rejection of malformed documents."""
+
+import json
+
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks import synthetic
+
+from robot_framework.sub_processes import form_decoding
+from robot_framework.sub_processes import formular_mappings
+from robot_framework.sub_processes import helper_functions
+
+
+SCHEMA = form_decoding.FormSchema.from_mappings(
+    formular_mappings.center_for_trivsel_esq_barn_mapping,
+    formular_mappings.center_for_trivsel_esq_foraelder_mapping
+)
+
+MALFORMED = ["{", "", "[]", "[{\"data\": {}}]", "\"x\"", "3", "null", "true"]
+
+
+def row(form_data: str) -> SimpleNamespace:
+    """A Forms row holding the given form_data."""
+
+    return SimpleNamespace(form_id="1", form_data=form_data, form_submitted_date=None)
+
+
+def test_projection_keeps_only_the_mapped_fields():
+    """Only the fields the mappings read are kept, and transforming the projection gives the same row."""
+
+    for raw in (raw_row.form_data for raw_row in synthetic.generate_rows(300, purged_ratio=0.0)):
+        document = json.loads(raw)
+        projected = SCHEMA.decode(raw)
+
+        assert set(projected["entity"]) == set(form_decoding.ENTITY_FIELDS)
+        assert set(projected["data"]) == set(document["data"]) & set(SCHEMA.data_fields)
+        assert "adresse" in document["data"] and "adresse" not in projected["data"]
+
+        mapping = formular_mappings.center_for_trivsel_esq_barn_mapping if document["data"][form_decoding.ROLE_FIELD] == synthetic.ROLES[0] else formular_mappings.center_for_trivsel_esq_foraelder_mapping
+
+        assert formular_mappings.transform_form_submission(1, projected, mapping) == formular_mappings.transform_form_submission(1, document, mapping)
+
+
+def test_schema_covers_every_mapped_source_field():
+    """The role field and every non-metadata key of both mappings are in the schema."""
+
+    assert form_decoding.ROLE_FIELD in SCHEMA.data_fields
+    assert "spoergsmaal_barn_tabel" in SCHEMA.data_fields and "spoergsmaal_foraelder_tabel" in SCHEMA.data_fields
+    assert formular_mappings.INVERTED_KEYS not in SCHEMA.data_fields
+
+
+@pytest.mark.parametrize("raw, purged", [
+    ('{"purged": "2024-01-01"}', True),
+    ('{"purged": null, "data": {}}', True),
+    ('{"data": {"note": "purged"}}', False),
+    ('{"data": {"purged": true}}', False),
+    ('["purged"]', False),
+    ('{"purged"', False),
+    ('{"data": {}}', False),
+])
+def test_purged_detection(raw, purged):
+    """Only a top-level "purged" key marks a purged submission - the word elsewhere does not."""
+
+    assert form_decoding.is_purged(raw) is purged
+
+
+def test_purged_documents_decode_to_none():
+    """The schema decoder returns None for a purged submission."""
+
+    assert SCHEMA.decode('{"purged": "2024-01-01"}') is None
+    assert SCHEMA.decode('{"data": {"behandling": "purged"}, "entity": {}}') == {"data": {"behandling": "purged"}, "entity": {}}
+
+
+@pytest.mark.parametrize("raw", MALFORMED)
+def test_malformed_documents_are_rejected(raw):
+    """Invalid JSON and JSON values that are not objects raise ValueError."""
+
+    with pytest.raises(ValueError):
+        SCHEMA.decode(raw)
+
+    with pytest.raises(ValueError):
+        form_decoding.loads_document(raw)
+
+
+@pytest.mark.parametrize("schema", [None, SCHEMA])
+def test_decode_form_rows_skips_malformed_and_purged_rows(schema):
+    """Malformed and purged rows are skipped on both decoding paths, and the valid rows are kept in order."""
+
+    valid = [raw_row.form_data for raw_row in synthetic.generate_rows(3, purged_ratio=0.0)]
+
+    rows = [row(raw) for raw in MALFORMED] + [row(valid[0]), row('{"purged": "2024-01-01"}'), row(valid[1]), row(valid[2])]
+
+    decoded = helper_functions.decode_form_rows(rows, schema=schema)
+
+    assert [submission["entity"]["serial"][0]["value"] for submission in decoded] == [json.loads(raw)["entity"]["serial"][0]["value"] for raw in valid]
@@ -0,0 +1,148 @@
+"""Tests for the compiled mapping plan, which must give exactly the rows of the per-row transform it replaced."""
+
+# pylint: disable=duplicate-code
+
+import copy
+import random
+
+from datetime import datetime
+
+import pytest
+
+from benchmarks import synthetic
+from benchmarks.answer_parsing import normalize_literal_eval
+
+from robot_framework.sub_processes import formular_mappings
+
+
+YOUTH = formular_mappings.center_for_trivsel_esq_barn_mapping
+PARENT = formular_mappings.center_for_trivsel_esq_foraelder_mapping
+
+MAPPINGS = formular_mappings.ROLE_MAPPINGS
+
+
+def transform_row_by_row(form_serial_number, form: dict, mapping: dict) -> dict:
+    """
+    transform_form_submission as it was before compile_mapping - it walked the mapping for every row, and took the
+    inverted keys from which mapping it was given.
+    """
+
+    transformed = {}
+    form_data = form.get("data", {})
+
+    total_score = 0
+    score_count = 0
+
+    inverted_keys = mapping[formular_mappings.INVERTED_KEYS]
+
+    answer_scores = {"Ikke sandt": 0, "Delvist sandt": 1, "Sandt": 2}
+    inverted_answer_scores = {"Ikke sandt": 0, "Delvist sandt": -1, "Sandt": -2}
+
+    for source_key, target in mapping.items():
+        if source_key in formular_mappings.METADATA_KEYS:
+            continue
+
+        if isinstance(target, dict):
+            nested_data = form_data.get(source_key, {})
+
+            if not isinstance(nested_data, dict):
+                raise TypeError(f"Expected nested data for '{source_key}' to be a dict, but got {type(nested_data).__name__}")
+
+            for nested_key, nested_target_column in target.items():
+                value = nested_data.get(nested_key, None)
+
+                if value in answer_scores:
+                    total_score += inverted_answer_scores[value] if nested_key in inverted_keys else answer_scores[value]
+                    score_count += 1
+
+                transformed[nested_target_column] = normalize_literal_eval(value)
+
+        else:
+            transformed[target] = normalize_literal_eval(form_data.get(source_key, None))
+
+    try:
+        transformed["Oprettet"] = datetime.fromisoformat(form["entity"]["created"][0]["value"]).strftime("%Y-%m-%d %H:%M:%S")
+        transformed["Gennemført"] = datetime.fromisoformat(form["entity"]["completed"][0]["value"]).strftime("%Y-%m-%d %H:%M:%S")
+
+    except (KeyError, IndexError, ValueError):
+        transformed["Oprettet"] = None
+        transformed["Gennemført"] = None
+
+    transformed["Serial number"] = form_serial_number
+
+    transformed["Average answer score"] = round(total_score / score_count, 2) if score_count else None
+
+    return transformed
+
+
+def assert_same_row(form: dict, mapping: dict) -> dict:
+    """Both transforms give the same columns in the same order with the same values and types."""
+
+    compiled = formular_mappings.transform_form_submission(7, form, mapping)
+    row_by_row = transform_row_by_row(7, form, mapping)
+
+    assert repr(compiled) == repr(row_by_row)
+
+    return compiled
+
+
+@pytest.mark.parametrize("role", synthetic.ROLES)
+def test_compiled_plan_matches_row_by_row(role):
+    """Synthetic youth and parent submissions give identical rows."""
+
+    submissions = [submission for submission in synthetic.generate_submissions(1000, seed=11) if submission["data"]["hvem_udfylder_spoergeskemaet"] == role]
+
+    assert submissions
+
+    for submission in submissions:
+        assert_same_row(submission, MAPPINGS[role])
+
+
+@pytest.mark.parametrize("mapping", [YOUTH, PARENT])
+def test_inverted_questions_subtract_from_the_score(mapping):
+    """Every question answered "Sandt" scores 2, except the questions listed under inverted_keys, which score -2."""
+
+    table_key, questions = next((key, target) for key, target in mapping.items() if isinstance(target, dict))
+
+    form = {"data": {table_key: {question: "Sandt" for question in questions}}, "entity": {}}
+
+    row = assert_same_row(form, mapping)
+
+    inverted = len(mapping[formular_mappings.INVERTED_KEYS])
+
+    assert inverted
+    assert row["Average answer score"] == round((2 * (len(questions) - inverted) - 2 * inverted) / len(questions), 2)
+
+    plan_weights = {field.source_key: field.score_weight for group in formular_mappings.compile_mapping(mapping) for field in group.fields}
+
+    assert {key for key, weight in plan_weights.items() if weight == -1} == mapping[formular_mappings.INVERTED_KEYS]
+
+
+@pytest.mark.parametrize("mapping", [YOUTH, PARENT])
+def test_missing_keys_match_row_by_row(mapping):
+    """Missing data, flat fields, nested tables, questions and dates give the same None values on both paths."""
+
+    rng = random.Random(5)
+
+    role = next(role for role, role_mapping in MAPPINGS.items() if role_mapping is mapping)
+    submission = next(submission for submission in (synthetic.make_submission(rng, serial, synthetic.START) for serial in range(50)) if submission["data"]["hvem_udfylder_spoergeskemaet"] == role)
+
+    table_key = next(key for key, target in mapping.items() if isinstance(target, dict))
+
+    without_table = copy.deepcopy(submission)
+    del without_table["data"][table_key]
+
+    partial_table = copy.deepcopy(submission)
+    partial_table["data"][table_key] = dict(list(partial_table["data"][table_key].items())[:3])
+
+    without_flat_fields = copy.deepcopy(submission)
+    for key in ("az", "behandling", "navn_manuelt"):
+        del without_flat_fields["data"][key]
+
+    without_dates = copy.deepcopy(submission)
+    del without_dates["entity"]["completed"]
+
+    for form in (without_table, partial_table, without_flat_fields, without_dates, {"data": {}}, {}):
+        assert_same_row(form, mapping)
+
+    assert formular_mappings.transform_form_submission(7, {}, mapping)["Average answer score"] is None
@@ -0,0 +1,197 @@
+"""Tests for the Forms query builder and the streaming Forms reader in helper_functions."""
+
+import sqlite3
+import tracemalloc
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from robot_framework.sub_processes import database_engines
+from robot_framework.sub_processes import helper_functions
+
+from tests.conftest import FORM_TYPE
+
+
+def peak_memory(function, *args, **kwargs) -> int:
+    """Run the function and return the peak traced memory in bytes."""
+
+    tracemalloc.start()
+
+    try:
+        function(*args, **kwargs)
+
+        return tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+
+def consume(iterator) -> int:
+    """Exhaust the iterator and return the number of items."""
+
+    return sum(1 for _ in iterator)
+
+
+def test_iter_forms_data_yields_same_submissions_as_get_forms_data(forms_database):
+    """The streaming reader and the list wrapper return the same submissions in the same order."""
+
+    conn_string = forms_database(1200)
+
+    streamed = list(helper_functions.iter_forms_data(conn_string, FORM_TYPE, batch_size=100))
+
+    assert streamed == helper_functions.get_forms_data(conn_string, FORM_TYPE)
+    assert 1000 < len(streamed) < 1200  # purged rows are skipped
+
+
+def test_iter_form_rows_yields_bounded_batches(forms_database):
+    """Rows come from the cursor in batches of at most batch_size."""
+
+    conn_string = forms_database(1050)
+
+    batch_sizes = [len(batch) for batch in helper_functions.iter_form_rows(conn_string, FORM_TYPE, batch_size=100)]
+
+    assert sum(batch_sizes) == 1050
+    assert max(batch_sizes) == 100
+
+
+def test_iter_forms_data_peak_memory_is_flat(forms_database):
+    """
+    Memory regression test: streaming four times as many rows must not raise the peak noticeably, while collecting
+    them into a list grows with the history.
+    """
+
+    small = forms_database(2000)
+    large = forms_database(8000)
+
+    # Warm up the engine registry, the dialect and the decoder caches so they are not counted as row memory
+    consume(helper_functions.iter_forms_data(small, FORM_TYPE, batch_size=100))
+
+    streamed_small = peak_memory(consume, helper_functions.iter_forms_data(small, FORM_TYPE, batch_size=100))
+    streamed_large = peak_memory(consume, helper_functions.iter_forms_data(large, FORM_TYPE, batch_size=100))
+    collected_large = peak_memory(helper_functions.get_forms_data, large, FORM_TYPE)
+
+    assert streamed_large < streamed_small * 1.5
+    assert streamed_large * 4 < collected_large
+
+
+# Instants around the edges of 10-11 March 2024, including the last tick of a datetime (3.33 ms) and a datetime2 (100 ns)
+BOUNDARY_INSTANTS = [
+    datetime(2024, 3, 9, 23, 59, 59, 997000),
+    datetime(2024, 3, 9, 23, 59, 59, 999999),
+    datetime(2024, 3, 10, 0, 0, 0),
+    datetime(2024, 3, 10, 0, 0, 0, 3000),
+    datetime(2024, 3, 10, 12, 0, 0),
+    datetime(2024, 3, 11, 23, 59, 59, 997000),
+    datetime(2024, 3, 11, 23, 59, 59, 999999),
+    datetime(2024, 3, 12, 0, 0, 0),
+    datetime(2024, 3, 12, 0, 0, 0, 3000),
+]
+
+# (filter arguments, the days CAST(form_submitted_date AS date) = day / BETWEEN start AND end selects)
+DATE_FILTERS = [
+    ({"target_date": "2024-03-10"}, (date(2024, 3, 10), date(2024, 3, 10))),
+    ({"target_date": date(2024, 3, 11)}, (date(2024, 3, 11), date(2024, 3, 11))),
+    ({"start_date": "2024-03-10", "end_date": "2024-03-11"}, (date(2024, 3, 10), date(2024, 3, 11))),
+    ({"start_date": datetime(2024, 3, 10, 15, 30), "end_date": date(2024, 3, 10)}, (date(2024, 3, 10), date(2024, 3, 10))),
+]
+
+
+def cast_selects(submitted: datetime, days: tuple[date, date]) -> bool:
+    """The previous filter - CAST(form_submitted_date AS date) BETWEEN start AND end."""
+
+    return days[0] <= submitted.date() <= days[1]
+
+
+@pytest.mark.parametrize("column_type", ["datetime", "datetime2", "smalldatetime"])
+@pytest.mark.parametrize("filter_arguments, days", DATE_FILTERS)
+def test_half_open_range_selects_the_same_rows_as_cast(column_type, filter_arguments, days):
+    """For datetime columns, day <= form_submitted_date < day + 1 selects exactly the rows the CAST filter did."""
+
+    query, query_params = helper_functions.build_forms_query("esq", column_type=column_type, **filter_arguments)
+
+    assert "AND form_submitted_date >= ? AND form_submitted_date < ?" in query
+    assert "CAST(form_submitted_date AS date)" not in query
+
+    _, lower, upper = query_params
+
+    for submitted in BOUNDARY_INSTANTS:
+        assert (lower <= submitted < upper) == cast_selects(submitted, days), submitted
+
+
+@pytest.mark.parametrize("filter_arguments, days", DATE_FILTERS)
+def test_datetimeoffset_range_covers_every_offset(filter_arguments, days):
+    """
+    datetimeoffset values are compared in UTC, so the seekable range is widened and the exact CAST filter on the
+    stored local date is kept. Every row the CAST filter selects, at any offset, must fall inside the widened range.
+    """
+
+    query, query_params = helper_functions.build_forms_query("esq", column_type="datetimeoffset", **filter_arguments)
+
+    assert "AND form_submitted_date >= ? AND form_submitted_date < ? AND CAST(form_submitted_date AS date) BETWEEN ? AND ?" in query
+
+    _, lower, upper, first_day, last_day = query_params
+
+    assert (first_day, last_day) == days
+
+    for local_time in BOUNDARY_INSTANTS:
+        for offset_hours in range(-12, 15):
+            utc_time = local_time - timedelta(hours=offset_hours)
+
+            if cast_selects(local_time, days):
+                assert lower <= utc_time < upper, (local_time, offset_hours)
+
+
+@pytest.mark.parametrize("column_type", [None, "varchar", "nvarchar"])
+def test_unknown_column_type_keeps_the_cast_filter(column_type):
+    """Without a known datetime type the query keeps the CAST filter, so the rows selected cannot change."""
+
+    query, query_params = helper_functions.build_forms_query("esq", start_date="2024-03-10", end_date="2024-03-11", column_type=column_type)
+
+    assert "AND CAST(form_submitted_date AS date) BETWEEN ? AND ?" in query
+    assert "form_submitted_date >= ?" not in query
+    assert query_params == ("esq", date(2024, 3, 10), date(2024, 3, 11))
+
+
+@pytest.mark.parametrize("column_type, expected_clause, expected_params", [
+    ("datetime", "AND form_submitted_date >= ?", (datetime(2024, 3, 10, 8),)),
+    ("datetimeoffset", "AND form_submitted_date >= ? AND CAST(form_submitted_date AS datetime) >= ?", (datetime(2024, 3, 9, 8), datetime(2024, 3, 10, 8))),
+    (None, "AND CAST(form_submitted_date AS datetime) >= ?", (datetime(2024, 3, 10, 8),)),
+])
+def test_since_filter_by_column_type(column_type, expected_clause, expected_params):
+    """The high-water mark filter compares the same value the query selects."""
+
+    query, query_params = helper_functions.build_forms_query("esq", since=datetime(2024, 3, 10, 8), column_type=column_type)
+
+    assert expected_clause in query
+    assert query_params == ("esq",) + expected_params
+
+
+def test_sqlite_stand_in_selects_boundary_rows(tmp_path, monkeypatch):
+    """Against the SQLite stand-in, rows exactly on the day boundaries land on the right side of the range."""
+
+    monkeypatch.setattr(helper_functions, "FORMS_TABLE", "Forms")
+
+    path = tmp_path / "boundaries.sqlite3"
+
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE Forms (form_id TEXT, form_type TEXT, form_data TEXT, form_submitted_date TEXT)")
+        connection.executemany(
+            "INSERT INTO Forms VALUES (?, 'esq', '{}', ?)",
+            [(str(index), submitted.isoformat(sep=" ")) for index, submitted in enumerate(BOUNDARY_INSTANTS)]
+        )
+
+    conn_string = f"sqlite:///{path}"
+
+    try:
+        assert helper_functions.submitted_date_type(conn_string) == helper_functions.ISO_TEXT_TYPE
+
+        for filter_arguments, days in DATE_FILTERS:
+            rows = [row for batch in helper_functions.iter_form_rows(conn_string, "esq", **filter_arguments) for row in batch]
+
+            selected = sorted(datetime.fromisoformat(row.form_submitted_date) for row in rows)
+
+            assert selected == [submitted for submitted in BOUNDARY_INSTANTS if cast_selects(submitted, days)], filter_arguments
+
+    finally:
+        database_engines.dispose_engines()
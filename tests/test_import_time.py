@@ -0,0 +1,25 @@
+"""Start-up regression test - robot_framework.linear_framework is imported in fresh interpreters, as the robot starts."""
+
+import statistics
+
+from benchmarks import import_time
+
+from robot_framework import config
+
+
+def test_start_up_imports_stay_lazy_and_within_budget():
+    """Start-up loads none of config.LAZY_IMPORTS and takes no longer than config.IMPORT_TIME_BUDGET_SECONDS."""
+
+    measurements = [import_time.measure() for _ in range(3)]
+
+    assert import_time.ENTRY_MODULE in measurements[-1].modules
+    assert not import_time.lazy_violations(measurements[-1].modules)
+    assert statistics.median(measurement.seconds for measurement in measurements) <= config.IMPORT_TIME_BUDGET_SECONDS
+
+
+def test_lazy_violations_match_whole_package_names():
+    """A package counts when it or one of its submodules is imported, not when another name starts with it."""
+
+    modules = {"pandas.core.frame", "pandas_flavor", "mbu_dev_shared_components.database"}
+
+    assert import_time.lazy_violations(modules, ("pandas", "pyarrow", "mbu_dev_shared_components.msoffice365")) == ["pandas"]
@@ -0,0 +1,54 @@
+"""Tests for the retry loop of the linear framework, with the orchestrator, reset and process steps stubbed out."""
+
+import json
+import sys
+
+from robot_framework import instrumentation
+from robot_framework import linear_framework
+
+
+class FakeOrchestratorConnection:  # pylint: disable=too-few-public-methods
+    """Records the trace log."""
+
+    process_name = "ESQ"
+    process_arguments = "{}"
+
+    def __init__(self):
+        self.traces = []
+
+    def log_trace(self, message: str) -> None:
+        """Record a trace message."""
+
+        self.traces.append(message)
+
+
+def test_summary_is_reset_for_every_attempt(monkeypatch):
+    """A failed attempt is summarised on its own, and the run summary only covers the attempt that finished the run."""
+
+    orchestrator_connection = FakeOrchestratorConnection()
+
+    attempts = []
+
+    def process(_orchestrator_connection):
+        attempts.append(len(attempts) + 1)
+
+        instrumentation.count("rows_fetched", 10 * len(attempts))
+
+        if len(attempts) == 1:
+            raise RuntimeError("SharePoint timed out")
+
+    monkeypatch.setattr(linear_framework.OrchestratorConnection, "create_connection_from_args", lambda: orchestrator_connection)
+    monkeypatch.setattr(linear_framework.process, "process", process)
+    monkeypatch.setattr(linear_framework, "handle_error", lambda *_args: None)
+    monkeypatch.setattr(sys, "excepthook", sys.excepthook)
+
+    for module, name in ((linear_framework.initialize, "initialize"), (linear_framework.reset, "reset"), (linear_framework.reset, "clean_up"), (linear_framework.reset, "close_all"), (linear_framework.reset, "kill_all")):
+        monkeypatch.setattr(module, name, lambda _orchestrator_connection: None)
+
+    linear_framework.main()
+
+    summaries = {trace.split(":", 1)[0]: json.loads(trace.split(": ", 1)[1]) for trace in orchestrator_connection.traces if "summary: " in trace}
+
+    assert attempts == [1, 2]
+    assert summaries["Attempt 1 summary"]["counters"] == {"rows_fetched": 10}
+    assert summaries["Run summary"]["counters"] == {"rows_fetched": 20}
@@ -0,0 +1,83 @@
+"""Tests for the persistent SMTP dispatcher, against a local SMTP stand-in."""
+
+import smtplib
+
+from robot_framework.sub_processes import mail_dispatcher
+
+
+def dispatcher_for(smtp_server, **kwargs) -> mail_dispatcher.MailDispatcher:
+    """A dispatcher sending to the stand-in without STARTTLS."""
+
+    settings = mail_dispatcher.SmtpSettings(server="127.0.0.1", port=smtp_server.port, sender="robot@example.dk", starttls=False, timeout=5)
+
+    return mail_dispatcher.MailDispatcher(settings, **kwargs)
+
+
+def email(receiver: str = "trivsel@example.dk", subject: str = "Ny(e) ESQ besvarelse(r)") -> mail_dispatcher.OutgoingEmail:
+    """An email with a small HTML body."""
+
+    return mail_dispatcher.OutgoingEmail(receiver=receiver, subject=subject, html_body="<p>Besvarelse</p>")
+
+
+def test_emails_share_one_connection(smtp_server):
+    """Every email of a run is sent over the same connection."""
+
+    with dispatcher_for(smtp_server) as dispatcher:
+        deliveries = dispatcher.send_all([email(subject=f"Besvarelse {number}") for number in range(3)])
+
+    assert all(delivery.ok and delivery.attempts == 1 for delivery in deliveries)
+    assert [message["subject"] for _, message in smtp_server.messages] == ["Besvarelse 0", "Besvarelse 1", "Besvarelse 2"]
+    assert smtp_server.connections == 1
+
+
+def test_dropped_connection_is_retried_on_a_new_one(smtp_server):
+    """A connection that goes away mid-send is transient - the email is sent again on a fresh connection."""
+
+    smtp_server.drop_data = 1
+
+    with dispatcher_for(smtp_server, attempts=2) as dispatcher:
+        delivery = dispatcher.send(email())
+
+    assert delivery.ok and delivery.attempts == 2
+    assert len(smtp_server.messages) == 1
+    assert smtp_server.connections == 2
+
+
+def test_temporary_reply_is_retried(smtp_server):
+    """A 4xx reply is retried."""
+
+    smtp_server.data_replies = [451]
+
+    with dispatcher_for(smtp_server, attempts=2) as dispatcher:
+        delivery = dispatcher.send(email())
+
+    assert delivery.ok and delivery.attempts == 2
+
+
+def test_permanent_errors_are_not_retried(smtp_server):
+    """Refused recipients and 5xx replies fail at once, and the next email still goes out on the same connection."""
+
+    smtp_server.refused_recipients = {"ukendt@example.dk"}
+    smtp_server.data_replies = [554]
+
+    with dispatcher_for(smtp_server, attempts=3) as dispatcher:
+        refused = dispatcher.send(email("ukendt@example.dk"))
+        rejected = dispatcher.send(email())
+        sent = dispatcher.send(email())
+
+    assert isinstance(refused.error, smtplib.SMTPRecipientsRefused) and refused.attempts == 1
+    assert isinstance(rejected.error, smtplib.SMTPResponseException) and rejected.error.smtp_code == 554 and rejected.attempts == 1
+    assert sent.ok
+    assert smtp_server.connections == 1
+    assert dispatcher.stats == {"connections_opened": 1, "messages_sent": 1, "messages_failed": 2}
+
+
+def test_malformed_email_fails_on_its_own(smtp_server):
+    """An email that cannot be built gets an error on its delivery, and the other emails are still sent."""
+
+    with dispatcher_for(smtp_server) as dispatcher:
+        deliveries = dispatcher.send_all([email(subject="Linje 1\nLinje 2"), email()])
+
+    assert isinstance(deliveries[0].error, ValueError) and deliveries[0].attempts == 0
+    assert deliveries[1].ok
+    assert len(smtp_server.messages) == 1
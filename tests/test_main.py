@@ -0,0 +1,103 @@
+"""Tests for the virtual environment bootstrap in main.py, with pip and venv replaced by a recorder."""
+
+import os
+
+import pytest
+
+import main
+
+
+@pytest.fixture(name="robot_folder")
+def robot_folder_fixture(tmp_path, monkeypatch):
+    """A robot folder with a pyproject.toml and some code, as the working directory."""
+
+    (tmp_path / "pyproject.toml").write_text("[project]\nname = \"robot\"\ndependencies = [\"openpyxl\"]\n")
+    (tmp_path / "robot_framework").mkdir()
+    (tmp_path / "robot_framework" / "process.py").write_text("print('process')\n")
+
+    monkeypatch.chdir(tmp_path)
+
+    return tmp_path
+
+
+@pytest.fixture(name="commands")
+def commands_fixture(monkeypatch) -> list[list[str]]:
+    """The commands bootstrap runs. Creating a venv creates its python executable, like python -m venv does."""
+
+    commands = []
+
+    def run(command, check):
+        assert check
+
+        commands.append(command)
+
+        if command[1:3] == ["-m", "venv"]:
+            python = os.path.join(main.VENV_FOLDER, main.SCRIPTS_FOLDER, "python.exe" if os.name == "nt" else "python")
+
+            os.makedirs(os.path.dirname(python))
+            with open(python, "w", encoding="utf-8"):
+                pass
+
+    monkeypatch.setattr(main.subprocess, "run", run)
+
+    return commands
+
+
+def pip(*args: str) -> list[str]:
+    """A pip command run in the virtual environment."""
+
+    return [os.path.join(main.VENV_FOLDER, main.SCRIPTS_FOLDER, "pip"), *args]
+
+
+def test_stamp_match_reuses_the_environment(robot_folder, commands):
+    """The first start builds the environment, and a start with unchanged hashes runs nothing."""
+
+    assert main.bootstrap() == "rebuilt the virtual environment"
+    assert commands[-1] == pip("install", ".")
+
+    commands.clear()
+
+    assert main.bootstrap() == "reused the virtual environment"
+    assert not commands
+    assert main.read_stamp() == {"dependencies": main.dependency_hash(), "code": main.code_hash()}
+    assert robot_folder.joinpath(main.VENV_FOLDER, main.STAMP_FILE).exists()
+
+
+def test_code_only_change_reinstalls_without_dependencies(robot_folder, commands):
+    """A change to the robot's code reinstalls just the robot, and the new code hash is stored."""
+
+    main.bootstrap()
+    commands.clear()
+
+    (robot_folder / "robot_framework" / "process.py").write_text("print('changed')\n")
+
+    assert main.bootstrap() == "reinstalled the robot"
+    assert commands == [pip("install", "--no-deps", ".")]
+    assert main.read_stamp()["code"] == main.code_hash()
+
+    # Compiled files are not code changes
+    commands.clear()
+    (robot_folder / "robot_framework" / "process.cpython-311.pyc").write_bytes(b"\0")
+
+    assert main.bootstrap() == "reused the virtual environment"
+
+
+@pytest.mark.parametrize("change", ["dependencies", "stamp", "venv"])
+def test_stamp_mismatch_rebuilds_from_scratch(robot_folder, commands, change):
+    """Changed dependencies, a missing or broken stamp, or a missing environment give a full reinstall."""
+
+    main.bootstrap()
+    commands.clear()
+
+    if change == "dependencies":
+        (robot_folder / "pyproject.toml").write_text("[project]\nname = \"robot\"\ndependencies = [\"openpyxl\", \"pandas\"]\n")
+
+    elif change == "stamp":
+        (robot_folder / main.VENV_FOLDER / main.STAMP_FILE).write_text("{not json")
+
+    else:
+        os.remove(os.path.join(main.VENV_FOLDER, main.SCRIPTS_FOLDER, "python.exe" if os.name == "nt" else "python"))
+
+    assert main.bootstrap() == "rebuilt the virtual environment"
+    assert commands[-1] == pip("install", ".")
+    assert main.read_stamp() == {"dependencies": main.dependency_hash(), "code": main.code_hash()}
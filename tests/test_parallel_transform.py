@@ -0,0 +1,45 @@
+"""Tests for the process-pool transform, which must yield the same rows in the same order as the serial path."""
+
+import pytest
+
+from benchmarks import synthetic
+
+from robot_framework import instrumentation
+from robot_framework.sub_processes import form_decoding
+from robot_framework.sub_processes import formular_mappings
+from robot_framework.sub_processes import parallel_transform
+
+
+SCHEMA = form_decoding.FormSchema.from_mappings(*formular_mappings.ROLE_MAPPINGS.values())
+
+
+def transformed(rows, role: str, workers: int) -> tuple[list[dict], dict]:
+    """The transformed rows and the counters recorded while producing them."""
+
+    instrumentation.reset()
+
+    mapping = formular_mappings.ROLE_MAPPINGS[role]
+
+    result = list(parallel_transform.iter_transformed_rows(rows, role, mapping, schema=SCHEMA, workers=workers, chunk_size=97, min_parallel_rows=0))
+
+    return result, instrumentation.summary()["counters"]
+
+
+@pytest.mark.parametrize("role", synthetic.ROLES)
+def test_pool_matches_serial_path(role):
+    """workers=2 gives the same rows in the same order as workers=1, and the workers' counters reach the run."""
+
+    rows = synthetic.generate_rows(1500, seed=9, purged_ratio=0.05)
+    rows.insert(10, synthetic.SyntheticRow("0", "[]", None))
+
+    serial, serial_counters = transformed(rows, role, workers=1)
+    pooled, pooled_counters = transformed(rows, role, workers=2)
+
+    assert len(serial) > 500
+    assert [row["Serial number"] for row in pooled] == [row["Serial number"] for row in serial]
+    assert pooled == serial
+
+    assert serial_counters["purged_rows_skipped"] > 0
+    assert pooled_counters == serial_counters
+
+    instrumentation.reset()
@@ -0,0 +1,122 @@
+"""Tests for the Parquet archive of transformed submissions."""
+
+import os
+
+import pytest
+
+from robot_framework.sub_processes import parquet_archive
+
+# pyarrow is the optional 'archive' extra
+ds = pytest.importorskip("pyarrow.dataset")
+
+
+ROLE = "Ung/selvbesvarelse"
+
+
+def row(serial: int, submitted: str | None, score: float | None = 2.0, answer: str | None = "Sandt") -> dict:
+    """A transformed row with the columns the archive types."""
+
+    return {
+        "Oprettet": submitted,
+        "Gennemført": submitted,
+        "Spørgsmål": answer,
+        "Serial number": serial,
+        "Average answer score": score,
+    }
+
+
+def archived_serials(archive: parquet_archive.ParquetArchive, filter_expression=None) -> list[int]:
+    """The serial numbers in the archive, sorted."""
+
+    return sorted(archive.read(columns=["Serial number"], filter_expression=filter_expression)["Serial number"].tolist())
+
+
+@pytest.fixture(name="archive")
+def archive_fixture(tmp_path):
+    """An empty archive in a temporary folder."""
+
+    return parquet_archive.ParquetArchive(str(tmp_path / "archive"))
+
+
+def test_archive_needs_an_absolute_path():
+    """Without an explicit absolute folder the archive refuses to start."""
+
+    for path in (None, "", "esq_archive"):
+        with pytest.raises(ValueError):
+            parquet_archive.ParquetArchive(path)
+
+
+def test_to_table_types_and_nulls():
+    """Dates, scores and serials are typed, and missing values become nulls rather than strings."""
+
+    table = parquet_archive.to_table([row(1, "2025-03-01 10:00:00"), row(2, None, score=None, answer=None), row(3, "ikke en dato", answer=float("nan"))])
+
+    assert str(table.schema.field("Gennemført").type) == "timestamp[s]"
+    assert table.column("Spørgsmål").to_pylist() == ["Sandt", None, None]
+    assert table.column("Average answer score").to_pylist() == [2.0, None, 2.0]
+    assert table.column("Gennemført").null_count == 2
+
+
+def test_rebuild_records_rows_on_their_way_through(archive):
+    """Rows pass through record unchanged and end up in the month of their 'Gennemført' date."""
+
+    rows = [row(3, "2025-03-01 00:00:05"), row(2, "2025-02-28 23:59:55"), row(1, None)]
+
+    with archive.rebuild_role(ROLE) as rebuild:
+        assert list(rebuild.record(iter(rows))) == rows
+
+    assert rebuild.row_counts == {"2025-03": 1, "2025-02": 1, None: 1}
+    assert archived_serials(archive) == [1, 2, 3]
+    assert archived_serials(archive, ds.field("month") == "2025-02") == [2]
+
+    # The undated row is in the null partition, which month filters never match
+    assert archived_serials(archive, ds.field("month") >= "2025-01") == [2, 3]
+
+
+def test_rebuild_replaces_the_role_and_keeps_it_on_failure(archive):
+    """A finished rebuild replaces every partition of the role; a failed one leaves the previous partitions."""
+
+    with archive.rebuild_role(ROLE) as rebuild:
+        list(rebuild.record([row(1, "2024-01-10 12:00:00")]))
+
+    with archive.rebuild_role(ROLE) as rebuild:
+        list(rebuild.record([row(2, "2025-01-10 12:00:00")]))
+
+    assert archived_serials(archive) == [2]
+
+    with pytest.raises(RuntimeError):
+        with archive.rebuild_role(ROLE) as rebuild:
+            list(rebuild.record([row(3, "2025-02-10 12:00:00")]))
+
+            raise RuntimeError("the workbook upload failed")
+
+    assert archived_serials(archive) == [2]
+    assert not os.path.exists(rebuild.staging_folder)
+
+
+def test_interrupted_swap_is_completed(archive):
+    """If a swap stopped after moving the old partitions aside, the next start puts them back."""
+
+    with archive.rebuild_role(ROLE) as rebuild:
+        list(rebuild.record([row(1, "2025-01-10 12:00:00")]))
+
+    os.replace(archive.role_path(ROLE), rebuild.replaced_folder)
+
+    restarted = parquet_archive.ParquetArchive(archive.path)
+
+    assert archived_serials(restarted) == [1]
+    assert not os.path.exists(rebuild.replaced_folder)
+
+
+def test_merge_rows_replaces_rows_by_serial_number(archive):
+    """Merging the same month twice gives the same archive, and changed rows replace their archived version."""
+
+    archive.merge_rows(ROLE, [row(1, "2025-01-10 12:00:00"), row(2, "2025-01-11 12:00:00")])
+    archive.merge_rows(ROLE, [row(2, "2025-01-11 12:00:00", score=3.0), row(3, "2025-02-01 08:00:00")])
+    archive.merge_rows(ROLE, [row(2, "2025-01-11 12:00:00", score=3.0), row(3, "2025-02-01 08:00:00")])
+
+    archived = archive.read(columns=["Serial number", "Average answer score", "month"]).sort_values("Serial number")
+
+    assert archived["Serial number"].tolist() == [1, 2, 3]
+    assert archived["Average answer score"].tolist() == [2.0, 3.0, 2.0]
+    assert archived["month"].tolist() == ["2025-01", "2025-01", "2025-02"]
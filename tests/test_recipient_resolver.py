@@ -0,0 +1,145 @@
+"""Tests for the approved-emails recipient resolver, with a fake SharePoint API and a local cache file."""
+
+from io import BytesIO
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from robot_framework.sub_processes import recipient_resolver
+
+
+FALLBACK = "trivsel@example.dk"
+
+
+class FakeSharepoint:
+    """Serves one "Godkendte emails.xlsx" with a settable ETag and counts its downloads."""
+
+    def __init__(self, rows: list[dict], etag: str | None = "\"1\""):
+        self.site_name = "site"
+        self.document_library = "Delte dokumenter"
+        self.etag = etag
+        self.downloads = 0
+        self.set_rows(rows)
+
+        sharepoint_file = SimpleNamespace(properties={})
+
+        def load_properties(_file, _properties):
+            sharepoint_file.properties = {"ETag": self.etag}
+
+        self.ctx = SimpleNamespace(
+            web=SimpleNamespace(get_file_by_server_relative_url=lambda _url: sharepoint_file),
+            load=load_properties,
+            execute_query=lambda: None
+        )
+
+    def set_rows(self, rows: list[dict]) -> None:
+        """Replace the workbook content."""
+
+        workbook = BytesIO()
+
+        pd.DataFrame(rows, columns=["az-ident", "email"]).to_excel(workbook, index=False)
+
+        self.content = workbook.getvalue()
+
+    def fetch_file_using_open_binary(self, _file_name: str, _folder_name: str) -> bytes | None:
+        """Download the workbook."""
+
+        self.downloads += 1
+
+        return self.content
+
+
+@pytest.fixture(name="cache_path")
+def cache_path_fixture(tmp_path) -> str:
+    """A cache file in a temporary folder that does not exist yet."""
+
+    return str(tmp_path / "cache" / "approved_emails.json")
+
+
+def load(sharepoint_api, cache_path: str) -> recipient_resolver.RecipientResolver:
+    """Load the resolver for the ESQ folder."""
+
+    return recipient_resolver.RecipientResolver.load(sharepoint_api, folder_name="ESQ", fallback=FALLBACK, cache_path=cache_path)
+
+
+def test_az_idents_and_emails_are_normalised():
+    """Both sides are stripped and lowercased, and rows missing either value are skipped."""
+
+    index = recipient_resolver.build_index(pd.DataFrame({
+        "az-ident": [" AZ123 ", "az456", None, "az789"],
+        "email": ["Laege@Example.dk ", None, "ingen@example.dk", float("nan")],
+    }))
+
+    assert index == {"az123": "laege@example.dk"}
+
+    resolver = recipient_resolver.RecipientResolver(index, FALLBACK)
+
+    assert resolver.resolve("az123") == "laege@example.dk"
+    assert resolver.resolve("  Az123") == "laege@example.dk"
+    assert resolver.resolve("AZ456") == FALLBACK
+    assert resolver.resolve(None) == FALLBACK
+
+
+def test_recipient_for_uses_the_az_ident_of_the_row():
+    """The recipient of a transformed row is the approved email of its AZ-ident, and the fallback without an index."""
+
+    resolver = recipient_resolver.RecipientResolver({"az123": "laege@example.dk"}, FALLBACK)
+
+    assert resolver.recipient_for({"AZ-ident": "AZ123"}) == "laege@example.dk"
+    assert resolver.recipient_for({"AZ-ident": "AZ999"}) == FALLBACK
+    assert recipient_resolver.RecipientResolver({}, FALLBACK).recipient_for({"AZ-ident": "AZ123"}) == FALLBACK
+
+
+def test_unchanged_workbook_is_served_from_the_cache(cache_path):
+    """The first load downloads and caches the index, and a load with the same ETag does not download again."""
+
+    sharepoint_api = FakeSharepoint([{"az-ident": "AZ123", "email": "laege@example.dk"}])
+
+    first = load(sharepoint_api, cache_path)
+    second = load(sharepoint_api, cache_path)
+
+    assert sharepoint_api.downloads == 1
+    assert first.index == second.index == {"az123": "laege@example.dk"}
+    assert second.version == "\"1\""
+
+
+def test_changed_workbook_is_downloaded_again(cache_path):
+    """A new ETag is a cache miss - the workbook is downloaded and parsed again."""
+
+    sharepoint_api = FakeSharepoint([{"az-ident": "AZ123", "email": "laege@example.dk"}])
+
+    load(sharepoint_api, cache_path)
+
+    sharepoint_api.set_rows([{"az-ident": "AZ123", "email": "ny.laege@example.dk"}])
+    sharepoint_api.etag = "\"2\""
+
+    resolver = load(sharepoint_api, cache_path)
+
+    assert sharepoint_api.downloads == 2
+    assert resolver.resolve("AZ123") == "ny.laege@example.dk"
+
+
+def test_workbook_without_version_is_not_cached(cache_path):
+    """Without an ETag or last-modified time the next run cannot tell whether the file changed, so it downloads."""
+
+    sharepoint_api = FakeSharepoint([{"az-ident": "AZ123", "email": "laege@example.dk"}], etag=None)
+
+    load(sharepoint_api, cache_path)
+    load(sharepoint_api, cache_path)
+
+    assert sharepoint_api.downloads == 2
+
+
+def test_failed_download_uses_the_stale_cache(cache_path):
+    """If the changed workbook cannot be downloaded, the cached index is used, and without a cache the fallback."""
+
+    sharepoint_api = FakeSharepoint([{"az-ident": "AZ123", "email": "laege@example.dk"}])
+
+    load(sharepoint_api, cache_path)
+
+    sharepoint_api.etag = "\"2\""
+    sharepoint_api.content = None
+
+    assert load(sharepoint_api, cache_path).resolve("AZ123") == "laege@example.dk"
+    assert load(sharepoint_api, f"{cache_path}.missing").resolve("AZ123") == FALLBACK
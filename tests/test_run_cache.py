@@ -0,0 +1,115 @@
+"""Tests for the run-scoped constant and credential cache, with the OpenOrchestrator connection replaced by a fake."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from robot_framework import run_cache
+
+
+class FakeOrchestratorConnection:
+    """Constants and credentials of several processes, counting every lookup by name."""
+
+    def __init__(self):
+        self.constants = {"DbConnectionString": "sqlite://", "Andet robots token": "hemmelig"}
+        self.credentials = {"SvcRpaMBU002": ("svc", "secret"), "Andet robots login": ("andet", "hemmelig")}
+        self.lookups = []
+
+    def get_constant(self, name: str) -> SimpleNamespace:
+        """A constant by name, raising like OpenOrchestrator if it does not exist."""
+
+        self.lookups.append(name)
+
+        if name not in self.constants:
+            raise ValueError(f"No constant with name '{name}' was found.")
+
+        return SimpleNamespace(name=name, value=self.constants[name])
+
+    def get_credential(self, name: str) -> SimpleNamespace:
+        """A decrypted credential by name."""
+
+        self.lookups.append(name)
+
+        username, password = self.credentials[name]
+
+        return SimpleNamespace(name=name, username=username, password=password)
+
+
+def test_only_used_names_are_fetched_once_each():
+    """Each name is looked up on its first use and served from memory after that - other names are never read."""
+
+    orchestrator_connection = FakeOrchestratorConnection()
+
+    cache = run_cache.RunCache(orchestrator_connection)
+
+    assert cache.get_constant("DbConnectionString").value == "sqlite://"
+    assert cache.get_constant("DbConnectionString").value == "sqlite://"
+    assert cache.get_credential("SvcRpaMBU002").password == "secret"
+    assert cache.get_credential("SvcRpaMBU002").username == "svc"
+
+    assert orchestrator_connection.lookups == ["DbConnectionString", "SvcRpaMBU002"]
+    assert cache.stats == {"hits": 2, "misses": 2}
+
+
+def test_missing_names_raise_and_are_not_cached():
+    """A name that does not exist raises on every lookup, so it is found once it is created."""
+
+    orchestrator_connection = FakeOrchestratorConnection()
+
+    cache = run_cache.RunCache(orchestrator_connection)
+
+    with pytest.raises(ValueError):
+        cache.get_constant("center_for_trivsel_mail")
+
+    orchestrator_connection.constants["center_for_trivsel_mail"] = "trivsel@example.dk"
+
+    assert cache.get_constant("center_for_trivsel_mail").value == "trivsel@example.dk"
+
+
+def test_clear_and_ttl_fetch_again(monkeypatch):
+    """Clearing the cache, as every attempt does, and entries older than the TTL are looked up again."""
+
+    orchestrator_connection = FakeOrchestratorConnection()
+
+    now = [100.0]
+
+    monkeypatch.setattr(run_cache.time, "monotonic", lambda: now[0])
+
+    cache = run_cache.RunCache(orchestrator_connection, ttl=60)
+
+    cache.get_credential("SvcRpaMBU002")
+
+    orchestrator_connection.credentials["SvcRpaMBU002"] = ("svc", "rotated")
+    now[0] += 30
+
+    assert cache.get_credential("SvcRpaMBU002").password == "secret"
+
+    now[0] += 31
+
+    assert cache.get_credential("SvcRpaMBU002").password == "rotated"
+
+    cache.clear()
+    cache.get_credential("SvcRpaMBU002")
+
+    assert orchestrator_connection.lookups == ["SvcRpaMBU002"] * 3
+
+
+def test_shared_constants_are_fetched_per_name_and_environment(monkeypatch):
+    """Shared RPA constants are cached per (name, db_env), leaving db_env to the library default when it is not given."""
+
+    calls = []
+
+    def get_constant(name, **kwargs):
+        calls.append((name, kwargs))
+
+        return {"value": f"{name}:{kwargs.get('db_env', 'default')}"}
+
+    monkeypatch.setattr(run_cache.constants, "get_constant", get_constant, raising=False)
+
+    cache = run_cache.RunCache(FakeOrchestratorConnection())
+
+    assert cache.get_shared_constant("smtp_server", db_env="PROD")["value"] == "smtp_server:PROD"
+    assert cache.get_shared_constant("smtp_server", db_env="PROD")["value"] == "smtp_server:PROD"
+    assert cache.get_shared_constant("e-mail_noreply")["value"] == "e-mail_noreply:default"
+
+    assert calls == [("smtp_server", {"db_env": "PROD"}), ("e-mail_noreply", {})]
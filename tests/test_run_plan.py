@@ -0,0 +1,119 @@
+"""Tests for the run plan and the spooled submissions snapshot."""
+
+import os
+import stat
+import time
+import tracemalloc
+
+from datetime import date, datetime
+
+import pytest
+
+from robot_framework.sub_processes import run_plan
+
+from tests.conftest import FORM_TYPE
+
+
+def test_plan_run_on_the_first_of_the_month():
+    """Missing workbooks get the whole history, existing ones last month, and the fetch covers all of it."""
+
+    plan = run_plan.plan_run(date(2024, 3, 1), ["unge.xlsx", "foraeldre.xlsx"], missing_workbooks=["foraeldre.xlsx"])
+
+    assert plan.email_window == run_plan.DateWindow(date(2024, 2, 29), date(2024, 2, 29))
+    assert plan.workbook_windows["unge.xlsx"] == run_plan.DateWindow(date(2024, 2, 1), date(2024, 2, 29))
+    assert plan.workbook_windows["foraeldre.xlsx"] == run_plan.DateWindow()
+    assert plan.fetch_window == run_plan.DateWindow()
+
+
+def test_snapshot_views_match_the_rows_of_their_window(forms_database):
+    """Every view returns exactly the rows of its window, newest first, and can be read more than once."""
+
+    conn_string = forms_database(3000)
+
+    with run_plan.fetch_snapshot(conn_string, FORM_TYPE, run_plan.DateWindow()) as snapshot:
+        everything = list(snapshot.rows_in(run_plan.DateWindow()))
+
+        assert len(snapshot) == len(everything) == 3000
+        assert [row.form_submitted_date for row in everything] == sorted((row.form_submitted_date for row in everything), reverse=True)
+
+        window = run_plan.DateWindow(date(2021, 1, 3), date(2021, 1, 5))
+
+        expected = [row for row in everything if window.contains(row.form_submitted_date)]
+
+        assert expected
+        assert list(snapshot.rows_in(window)) == expected
+        assert list(snapshot.rows_in(window)) == expected
+
+        assert isinstance(everything[0].form_submitted_date, datetime)
+
+
+def test_snapshot_is_deleted_on_close(forms_database):
+    """The spool folder only lives as long as the snapshot, and only the robot's user can open it."""
+
+    snapshot = run_plan.fetch_snapshot(forms_database(10), FORM_TYPE, run_plan.DateWindow())
+
+    assert os.path.exists(snapshot.path)
+    assert os.path.dirname(snapshot.path) == snapshot.folder
+
+    if os.name == "posix":
+        assert stat.S_IMODE(os.stat(snapshot.folder).st_mode) == 0o700
+
+    snapshot.close()
+
+    assert not os.path.exists(snapshot.folder)
+
+
+def test_snapshot_is_deleted_when_a_consumer_fails(tmp_path):
+    """Leaving the with block on an error deletes the spool folder with the raw form data."""
+
+    with pytest.raises(RuntimeError):
+        with run_plan.SubmissionsSnapshot(str(tmp_path)) as snapshot:
+            snapshot.add([run_plan.SnapshotRow("1", '{"data": {"cpr": "0101011234"}}', datetime(2025, 3, 1))])
+
+            raise RuntimeError("Upload failed")
+
+    assert not os.listdir(tmp_path)
+
+
+def test_leftover_spools_of_a_killed_run_are_deleted(tmp_path):
+    """Spool folders older than a day are deleted when the next snapshot is created; recent ones and other folders are kept."""
+
+    leftover = tmp_path / f"{run_plan.SPOOL_PREFIX}old"
+    recent = tmp_path / f"{run_plan.SPOOL_PREFIX}recent"
+    unrelated = tmp_path / "other_old"
+
+    for folder in (leftover, recent, unrelated):
+        folder.mkdir()
+        (folder / "snapshot.sqlite3").write_text("raw form data")
+
+    stale = time.time() - run_plan.SPOOL_LEFTOVER_AGE.total_seconds() - 60
+
+    for folder in (leftover, unrelated):
+        os.utime(folder, (stale, stale))
+
+    with run_plan.SubmissionsSnapshot(str(tmp_path)):
+        pass
+
+    assert sorted(os.listdir(tmp_path)) == ["esq_snapshot_recent", "other_old"]
+
+
+def test_snapshot_peak_memory_is_flat(forms_database):
+    """Fetching and reading four times as many rows must not raise the peak noticeably."""
+
+    peaks = []
+
+    for size in (2000, 8000):
+        conn_string = forms_database(size)
+
+        tracemalloc.start()
+
+        with run_plan.fetch_snapshot(conn_string, FORM_TYPE, run_plan.DateWindow()) as snapshot:
+            count = sum(1 for _ in snapshot.forms(run_plan.DateWindow()))
+
+        peaks.append(tracemalloc.get_traced_memory()[1])
+
+        tracemalloc.stop()
+
+        assert count > size * 0.9
+
+    assert peaks[1] < peaks[0] * 1.5
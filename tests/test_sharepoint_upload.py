@@ -0,0 +1,310 @@
+"""Tests for the chunked SharePoint upload, against a local HTTP stand-in for the SharePoint REST API."""
+
+import json
+import re
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from types import SimpleNamespace
+from urllib.parse import unquote
+
+import pytest
+
+from office365.runtime.auth.token_response import TokenResponse
+from office365.sharepoint.client_context import ClientContext
+
+from robot_framework.sub_processes import sharepoint_upload
+
+
+SITE = "site"
+LIBRARY = "Delte dokumenter"
+FOLDER = "ESQ"
+FOLDER_URL = f"/teams/{SITE}/{LIBRARY}/{FOLDER}"
+TARGET_URL = f"{FOLDER_URL}/Besvarelser.xlsx"
+
+CHUNK_SIZE = 1024
+
+FILE_PATTERN = re.compile(r"/_api/Web/getFileByServerRelativeUrl\('(?P<url>[^']*)'\)(?:/(?P<operation>\w+)(?:\((?P<params>[^)]*)\))?)?$")
+ADD_PATTERN = re.compile(r"/_api/Web/getFolderByServerRelativeUrl\('(?P<folder>[^']*)'\)/Files/add\((?P<params>[^)]*)\)$")
+
+
+class SharePointStandIn:
+    """
+    The files and upload sessions of a SharePoint document library. faults maps an operation name to a list of
+    failures for its next calls - "drop" applies the request but never answers, "error" answers 500 without applying it.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.sessions = {}
+        self.faults = {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def handle(self, path: str, headers, body: bytes) -> tuple[int, dict | None]:
+        """Apply a request and return (status, JSON answer) - a None answer drops the connection."""
+
+        path = unquote(path)
+
+        if path.endswith("/_api/contextInfo"):
+            return 200, {"FormDigestValue": "digest", "FormDigestTimeoutSeconds": 1800}
+
+        if match := ADD_PATTERN.search(path):
+            params = _params(match["params"])
+            url = f"{match['folder']}/{params['url']}"
+
+            self.files[url] = body
+
+            return 200, _file_json(url)
+
+        match = FILE_PATTERN.search(path)
+
+        if match is None:
+            return 404, _error(f"Unknown request {path}")
+
+        url, operation, params = match["url"], match["operation"] or "", _params(match["params"] or "")
+
+        if headers.get("X-HTTP-Method") == "DELETE":
+            operation = "delete"
+
+        self.calls.append((operation, params.get("uploadID") or (json.loads(body).get("uploadId") if body.startswith(b"{") else None)))
+
+        fault = self.faults.get(operation, [None]).pop(0) if self.faults.get(operation) else None
+
+        if fault == "error":
+            return 500, _error(f"{operation} failed")
+
+        status, answer = self.apply(url, operation, params, body)
+
+        return (status, None) if fault == "drop" else (status, answer)
+
+    def apply(self, url: str, operation: str, params: dict, body: bytes) -> tuple[int, dict]:
+        """Apply one file operation."""
+
+        if url not in self.files:
+            return 404, _error(f"File {url} not found")
+
+        handler = {
+            "startUpload": self.start_upload,
+            "continueUpload": self.continue_upload,
+            "finishUpload": self.continue_upload,
+            "GetUploadStatus": self.upload_status,
+            "CancelUpload": self.cancel_upload,
+            "moveto": self.move,
+            "delete": self.delete,
+        }.get(operation)
+
+        if handler is None:
+            return 400, _error(f"Unsupported operation {operation}")
+
+        return handler(url, operation, params, body)
+
+    def start_upload(self, url: str, _operation: str, params: dict, body: bytes) -> tuple[int, dict]:
+        """StartUpload - a new session holding the first chunk."""
+
+        if params["uploadID"] in self.sessions:
+            return 400, _error("Upload session already exists")
+
+        self.sessions[params["uploadID"]] = (url, bytearray(body))
+
+        return 200, {"value": str(len(body))}
+
+    def continue_upload(self, url: str, operation: str, params: dict, body: bytes) -> tuple[int, dict]:
+        """ContinueUpload and FinishUpload - the chunk must start where the session ends. Finishing commits the file."""
+
+        session_url, data = self.sessions.get(params["uploadID"], (None, None))
+
+        if session_url != url or int(params["fileOffset"]) != len(data):
+            return 400, _error("Unexpected upload session or offset")
+
+        data.extend(body)
+
+        if operation == "continueUpload":
+            return 200, {"value": str(len(data))}
+
+        self.files[url] = bytes(data)
+        del self.sessions[params["uploadID"]]
+
+        return 200, _file_json(url)
+
+    def upload_status(self, _url: str, _operation: str, _params: dict, body: bytes) -> tuple[int, dict]:
+        """GetUploadStatus - the offset the next chunk must start at."""
+
+        upload_id = json.loads(body)["uploadId"]
+
+        if upload_id not in self.sessions:
+            return 404, _error("Upload session not found")
+
+        return 200, {"ExpectedContentRange": f"{len(self.sessions[upload_id][1])}-", "UploadId": upload_id}
+
+    def cancel_upload(self, _url: str, _operation: str, _params: dict, body: bytes) -> tuple[int, dict]:
+        """CancelUpload - drop the session."""
+
+        self.sessions.pop(json.loads(body)["uploadId"], None)
+
+        return 200, {}
+
+    def move(self, url: str, _operation: str, params: dict, _body: bytes) -> tuple[int, dict]:
+        """moveto - rename the file, replacing the target."""
+
+        self.files[params["newurl"]] = self.files.pop(url)
+
+        return 200, {}
+
+    def delete(self, url: str, _operation: str, _params: dict, _body: bytes) -> tuple[int, dict]:
+        """Delete the file."""
+
+        del self.files[url]
+
+        return 200, {}
+
+
+def _params(text: str) -> dict:
+    """Parse OData call parameters like uploadID='x',fileOffset=5."""
+
+    return {key: value.strip("'") for key, value in (pair.split("=", 1) for pair in re.split(r",(?=\w+=)", text) if pair)}
+
+
+def _file_json(url: str) -> dict:
+    return {"ServerRelativeUrl": url, "Name": url.rsplit("/", 1)[-1]}
+
+
+def _error(message: str) -> dict:
+    return {"odata.error": {"code": "-1, Microsoft.SharePoint.Client.InvalidClientQueryException", "message": {"lang": "en-US", "value": message}}}
+
+
+@pytest.fixture(name="sharepoint")
+def sharepoint_fixture():
+    """A SharePoint stand-in served over HTTP, and a Sharepoint API object whose client context talks to it."""
+
+    standin = SharePointStandIn()
+
+    class Handler(BaseHTTPRequestHandler):
+        """Route every request to the stand-in."""
+
+        def do_POST(self):  # pylint: disable=invalid-name
+            """Answer a REST call, or drop the connection when the stand-in says so."""
+
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            with standin.lock:
+                status, answer = standin.handle(self.path, self.headers, body)
+
+            if answer is None:
+                self.close_connection = True
+
+                return
+
+            data = json.dumps(answer).encode()
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json;odata=nometadata")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            """Keep the test output quiet."""
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    ctx = ClientContext(f"http://127.0.0.1:{server.server_port}/teams/{SITE}").with_access_token(lambda: TokenResponse(access_token="token", token_type="Bearer"))
+
+    uploads = []
+
+    sharepoint_api = SimpleNamespace(
+        site_name=SITE,
+        document_library=LIBRARY,
+        ctx=ctx,
+        upload_file_from_bytes=lambda binary_content, file_name, folder_name: uploads.append((file_name, folder_name, binary_content))
+    )
+
+    yield standin, sharepoint_api, uploads
+
+    server.shutdown()
+    server.server_close()
+
+
+def upload(sharepoint_api, content: bytes, attempts: int = 3) -> None:
+    """Upload content as the target workbook in chunks of CHUNK_SIZE, without waiting between retries."""
+
+    sharepoint_upload.upload_file(
+        sharepoint_api, BytesIO(content), "Besvarelser.xlsx", FOLDER,
+        chunk_threshold=CHUNK_SIZE, chunk_size=CHUNK_SIZE, attempts=attempts, retry_delay=0
+    )
+
+
+def test_small_files_are_uploaded_in_one_request(sharepoint):
+    """Files below the threshold go through upload_file_from_bytes."""
+
+    standin, sharepoint_api, uploads = sharepoint
+
+    upload(sharepoint_api, b"small")
+
+    assert uploads == [("Besvarelser.xlsx", FOLDER, b"small")]
+    assert not standin.calls
+
+
+def test_chunked_upload_replaces_the_target_when_complete(sharepoint):
+    """The chunks are written to a temporary file, which is moved over the existing target after the last chunk."""
+
+    standin, sharepoint_api, _ = sharepoint
+    standin.files[TARGET_URL] = b"old workbook"
+
+    content = bytes(range(256)) * 20
+
+    upload(sharepoint_api, content)
+
+    assert standin.files == {TARGET_URL: content}
+    assert not standin.sessions
+    assert [operation for operation, _ in standin.calls] == ["startUpload"] + ["continueUpload"] * 3 + ["finishUpload", "moveto"]
+
+
+def test_failed_upload_leaves_the_target_intact(sharepoint):
+    """When a chunk keeps failing, the session is cancelled, the temporary file deleted and the old target kept."""
+
+    standin, sharepoint_api, _ = sharepoint
+    standin.files[TARGET_URL] = b"old workbook"
+    standin.faults["continueUpload"] = ["error"] * 3
+
+    with pytest.raises(Exception):
+        upload(sharepoint_api, bytes(5000))
+
+    assert standin.files == {TARGET_URL: b"old workbook"}
+    assert not standin.sessions
+
+
+def test_lost_chunk_response_resumes_from_the_server_offset(sharepoint):
+    """A chunk the server applied without answering is not sent again - the retry starts at the server's offset."""
+
+    standin, sharepoint_api, _ = sharepoint
+    standin.faults["continueUpload"] = [None, "drop"]
+
+    content = bytes(range(256)) * 20
+
+    upload(sharepoint_api, content)
+
+    assert standin.files == {TARGET_URL: content}
+    assert "GetUploadStatus" in [operation for operation, _ in standin.calls]
+
+
+def test_lost_start_response_retries_with_a_new_upload_id(sharepoint):
+    """A start whose response was lost is cancelled and started again under a new upload id."""
+
+    standin, sharepoint_api, _ = sharepoint
+    standin.faults["startUpload"] = ["drop"]
+
+    content = bytes(range(256)) * 20
+
+    upload(sharepoint_api, content)
+
+    starts = [upload_id for operation, upload_id in standin.calls if operation == "startUpload"]
+
+    assert len(starts) == 2 and starts[0] != starts[1]
+    assert ("CancelUpload", starts[0]) in standin.calls
+    assert standin.files == {TARGET_URL: content}
+    assert not standin.sessions
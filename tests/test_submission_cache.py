@@ -0,0 +1,141 @@
+"""Tests for the local submission cache, synced from the SQLite stand-in for the Forms table."""
+
+import json
+import os
+import sqlite3
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from robot_framework.sub_processes import helper_functions
+from robot_framework.sub_processes import submission_cache
+
+from tests.conftest import FORM_TYPE
+
+
+@pytest.fixture(name="cache")
+def cache_fixture(tmp_path):
+    """An empty cache in a temporary folder."""
+
+    with submission_cache.SubmissionCache(str(tmp_path / "cache" / "submissions.sqlite3"), overlap=timedelta(days=7), reconcile_interval=timedelta(days=30)) as submission_cache_instance:
+        yield submission_cache_instance
+
+
+def database_path(conn_string: str) -> str:
+    """The file of a sqlite:/// connection string."""
+
+    return conn_string[len("sqlite:///"):]
+
+
+def cached_rows(cache_instance, **filters) -> list:
+    """Every row the cache serves for the form type."""
+
+    return [row for batch in cache_instance.iter_rows(FORM_TYPE, **filters) for row in batch]
+
+
+def server_rows(conn_string: str, **filters) -> list:
+    """Every non-purged row the server returns."""
+
+    return [
+        row for batch in helper_functions.iter_form_rows(conn_string, FORM_TYPE, **filters) for row in batch
+        if "purged" not in json.loads(row.form_data)
+    ]
+
+
+def test_first_sync_stores_the_whole_history(forms_database, cache):
+    """A cache without a high-water mark is filled from the beginning and serves the same rows as the server."""
+
+    conn_string = forms_database(1500)
+
+    assert cache.sync(conn_string, FORM_TYPE) == 1500
+
+    assert [row.form_id for row in cached_rows(cache)] == [row.form_id for row in server_rows(conn_string)]
+    assert cache.high_water_mark(FORM_TYPE) == max(helper_functions.to_datetime(row.form_submitted_date) for row in server_rows(conn_string))
+
+
+def test_incremental_sync_only_fetches_the_overlap_window(forms_database, cache):
+    """Once the cache has a high-water mark, a sync only receives the rows inside the overlap window."""
+
+    conn_string = forms_database(1500)
+
+    cache.sync(conn_string, FORM_TYPE)
+
+    since = cache.high_water_mark(FORM_TYPE) - timedelta(days=7)
+
+    with sqlite3.connect(database_path(conn_string)) as connection:
+        submitted_dates = [helper_functions.to_datetime(submitted) for submitted, in connection.execute("SELECT form_submitted_date FROM Forms")]
+
+    expected = sum(1 for submitted in submitted_dates if submitted >= since)
+
+    assert 0 < expected < 1500
+    assert cache.sync(conn_string, FORM_TYPE) == expected
+
+
+def test_incremental_sync_picks_up_new_and_purged_rows(forms_database, cache):
+    """New rows are added, and rows purged inside the overlap window become tombstones."""
+
+    conn_string = forms_database(1000)
+
+    cache.sync(conn_string, FORM_TYPE)
+
+    newest = cached_rows(cache)[0]
+
+    with sqlite3.connect(database_path(conn_string)) as connection:
+        connection.execute("UPDATE Forms SET form_data = ? WHERE form_id = ?", (json.dumps({"purged": "2024-01-01"}), newest.form_id))
+        connection.execute(
+            "INSERT INTO Forms VALUES ('new-form', ?, ?, ?)",
+            (FORM_TYPE, json.dumps({"data": {}, "entity": {}}), (newest.form_submitted_date + timedelta(hours=1)).isoformat(sep=" "))
+        )
+
+    cache.sync(conn_string, FORM_TYPE)
+
+    form_ids = [row.form_id for row in cached_rows(cache)]
+
+    assert form_ids[0] == "new-form"
+    assert newest.form_id not in form_ids
+
+
+def test_reconcile_runs_only_when_due(forms_database, cache, monkeypatch):
+    """The full-history purge scan is skipped on daily syncs and runs once the interval has passed."""
+
+    conn_string = forms_database(500)
+
+    reconciles = []
+
+    monkeypatch.setattr(cache, "reconcile_purged", lambda *args, **kwargs: reconciles.append(kwargs["before"]))
+
+    cache.sync(conn_string, FORM_TYPE)
+    cache.sync(conn_string, FORM_TYPE)
+
+    assert not reconciles
+
+    with cache.connection:
+        cache.connection.execute("UPDATE sync_state SET reconciled_at = ?", ((datetime.now() - timedelta(days=31)).isoformat(sep=" "),))
+
+    cache.sync(conn_string, FORM_TYPE)
+
+    assert reconciles == [cache.high_water_mark(FORM_TYPE) - timedelta(days=7)]
+
+
+def test_reconcile_purged_tombstones_old_rows(forms_database, cache):
+    """Rows purged on the server before the overlap window are reduced to tombstones by a reconcile."""
+
+    conn_string = forms_database(1000)
+
+    cache.sync(conn_string, FORM_TYPE)
+
+    oldest = cached_rows(cache)[-1]
+
+    with sqlite3.connect(database_path(conn_string)) as connection:
+        connection.execute("UPDATE Forms SET form_data = ? WHERE form_id = ?", (json.dumps({"purged": "2024-01-01"}), oldest.form_id))
+
+    assert cache.reconcile_purged(conn_string, FORM_TYPE, before=cache.high_water_mark(FORM_TYPE)) == 1
+    assert oldest.form_id not in [row.form_id for row in cached_rows(cache)]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="file modes are only enforced on POSIX")
+def test_cache_file_is_private(cache):
+    """The cache file holds CPR numbers, so only its owner may read it."""
+
+    assert os.stat(cache.path).st_mode & 0o077 == 0
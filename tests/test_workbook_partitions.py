@@ -0,0 +1,180 @@
+"""Tests for the partitioned workbook layout."""
+
+import json
+import random
+
+from datetime import timedelta
+from io import BytesIO
+
+import pytest
+
+from openpyxl import load_workbook
+
+from benchmarks import synthetic
+
+from robot_framework.sub_processes import excel_writer
+from robot_framework.sub_processes import formular_mappings
+from robot_framework.sub_processes import parallel_transform
+from robot_framework.sub_processes import workbook_partitions
+from robot_framework.sub_processes import workbook_update
+
+from tests.test_workbook_update import sheet_layout
+
+
+ROLE = "Forælder (inklusiv plejeforældre)"
+MAPPING = formular_mappings.center_for_trivsel_esq_foraelder_mapping
+WORKBOOK_NAME = "Besvarelser.xlsx"
+FOLDER = "ESQ"
+
+
+class FakeSharepoint:
+    """The files of a SharePoint folder, by name."""
+
+    def __init__(self):
+        self.files = {}
+
+    def fetch_file_using_open_binary(self, file_name, folder_name):
+        """The content of a file, or None if it does not exist."""
+
+        assert folder_name == FOLDER
+
+        return self.files.get(file_name)
+
+    def upload_file_from_bytes(self, binary_content, file_name, folder_name):
+        """Store a file, replacing it if it exists."""
+
+        assert folder_name == FOLDER
+
+        self.files[file_name] = binary_content
+
+
+def sheet_rows(content: bytes, sheet_name: str = "Besvarelser") -> list[tuple]:
+    """The data rows of a sheet of a workbook file."""
+
+    workbook = load_workbook(BytesIO(content), read_only=True)
+
+    try:
+        return list(workbook[sheet_name].iter_rows(min_row=2, values_only=True))
+
+    finally:
+        workbook.close()
+
+
+def transform(rows):
+    """Transform raw rows into workbook rows in this process."""
+
+    return parallel_transform.iter_transformed_rows(rows, ROLE, MAPPING, workers=1)
+
+
+def test_row_partition_key():
+    """Strings and datetimes from the 'Gennemført' column map to their period, anything else to the undated partition."""
+
+    assert workbook_partitions.row_partition_key("2025-03-31 23:59:59", "month") == "2025-03"
+    assert workbook_partitions.row_partition_key("2025-03-31 23:59:59", "year") == "2025"
+    assert workbook_partitions.row_partition_key(None, "month") == workbook_partitions.UNDATED_PARTITION
+    assert workbook_partitions.row_partition_key("ikke en dato", "month") == workbook_partitions.UNDATED_PARTITION
+
+
+def daily_rows(days: int = 120) -> list[synthetic.SyntheticRow]:
+    """One raw submission a day, newest first."""
+
+    rng = random.Random(5)
+    submitted_dates = [synthetic.START + timedelta(days=day, hours=15) for day in range(days)]
+
+    return [
+        synthetic.SyntheticRow(str(serial), json.dumps(synthetic.make_submission(rng, serial, submitted), ensure_ascii=False), submitted)
+        for serial, submitted in reversed(list(enumerate(submitted_dates, start=1)))
+    ]
+
+
+def test_rebuild_and_split_agree(tmp_path):
+    """Splitting the single workbook gives the same partitions as rebuilding them from the raw rows."""
+
+    raw_rows = daily_rows()
+
+    sharepoint_api = FakeSharepoint()
+
+    rebuilt_counts = workbook_partitions.rebuild_partitions(sharepoint_api, FOLDER, WORKBOOK_NAME, raw_rows, transform, "month")
+
+    single_path = tmp_path / WORKBOOK_NAME
+
+    with excel_writer.write_workbook(transform(raw_rows)) as workbook_file:
+        single_path.write_bytes(workbook_file.read())
+
+    split_counts = workbook_partitions.split_workbook(str(single_path), "month", str(tmp_path / "split"))
+
+    assert len(rebuilt_counts) > 1
+    assert split_counts == rebuilt_counts
+
+    for key in rebuilt_counts:
+        file_name = workbook_partitions.partition_file_name(WORKBOOK_NAME, key)
+
+        assert sorted(sheet_rows((tmp_path / "split" / file_name).read_bytes())) == sorted(sheet_rows(sharepoint_api.files[file_name]))
+
+
+def test_append_puts_rows_in_the_partition_of_their_date():
+    """Appended rows go to the partition of their own 'Gennemført' date, and the index counts them there."""
+
+    sharepoint_api = FakeSharepoint()
+
+    rows = [
+        {"Serial number": 3, "Gennemført": "2025-03-01 00:00:05"},
+        {"Serial number": 2, "Gennemført": "2025-02-28 23:59:55"},
+        {"Serial number": 1, "Gennemført": None},
+    ]
+
+    workbook_partitions.append_to_partition(sharepoint_api, FOLDER, WORKBOOK_NAME, rows[1:], existing_files=[], granularity="month")
+    workbook_partitions.append_to_partition(sharepoint_api, FOLDER, WORKBOOK_NAME, rows[:1], existing_files=list(sharepoint_api.files), granularity="month")
+
+    assert sheet_rows(sharepoint_api.files[workbook_partitions.partition_file_name(WORKBOOK_NAME, "2025-03")]) == [("3", "2025-03-01 00:00:05")]
+    assert sheet_rows(sharepoint_api.files[workbook_partitions.partition_file_name(WORKBOOK_NAME, "2025-02")]) == [("2", "2025-02-28 23:59:55")]
+
+    index = sheet_rows(sharepoint_api.files[workbook_partitions.index_file_name(WORKBOOK_NAME)], workbook_partitions.INDEX_SHEET_NAME)
+
+    assert {row[0]: row[2] for row in index} == {"2025-02": 1, "2025-03": 1, workbook_partitions.UNDATED_PARTITION: 1}
+
+
+def test_streamed_partitions_match_the_in_memory_build(tmp_path, monkeypatch):
+    """Each partition streamed from the spool is sorted and formatted exactly like building it from all its rows in memory."""
+
+    monkeypatch.setattr(workbook_partitions.config, "SNAPSHOT_SPOOL_FOLDER", str(tmp_path))
+
+    raw_rows = daily_rows()
+
+    sharepoint_api = FakeSharepoint()
+
+    workbook_partitions.rebuild_partitions(sharepoint_api, FOLDER, WORKBOOK_NAME, iter(raw_rows), transform, "month", column_width_cap=40)
+
+    partitions = workbook_partitions.group_rows(transform(raw_rows), "month")
+
+    assert len(partitions) > 1
+
+    for key, partition_rows in partitions.items():
+        header = list(partition_rows[0])
+
+        with excel_writer.save_workbook(workbook_update.build_workbook("Besvarelser", header, [[row.get(column) for column in header] for row in partition_rows], column_width_cap=40)) as workbook_file:
+            expected = sheet_layout(workbook_file.read())
+
+        assert sheet_layout(sharepoint_api.files[workbook_partitions.partition_file_name(WORKBOOK_NAME, key)]) == expected
+
+    # The spool with the transformed rows is gone
+    assert not list(tmp_path.iterdir())
+
+
+def test_spool_is_deleted_when_the_rebuild_fails(tmp_path, monkeypatch):
+    """An error while the rows are transformed still deletes the spool, and no partition is uploaded."""
+
+    monkeypatch.setattr(workbook_partitions.config, "SNAPSHOT_SPOOL_FOLDER", str(tmp_path))
+
+    def failing_transform(rows):
+        yield from transform(rows[:10])
+
+        raise RuntimeError("Transform failed")
+
+    sharepoint_api = FakeSharepoint()
+
+    with pytest.raises(RuntimeError):
+        workbook_partitions.rebuild_partitions(sharepoint_api, FOLDER, WORKBOOK_NAME, daily_rows(), failing_transform, "month")
+
+    assert not list(tmp_path.iterdir())
+    assert not sharepoint_api.files
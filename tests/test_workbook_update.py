@@ -0,0 +1,157 @@
+"""Tests for the local merge, sort and format of the ESQ workbooks."""
+
+from io import BytesIO
+
+from openpyxl import Workbook, load_workbook
+
+from robot_framework.sub_processes import excel_writer
+from robot_framework.sub_processes import workbook_update
+
+
+FOLDER = "ESQ"
+FILE_NAME = "Besvarelser.xlsx"
+
+
+class FakeSharepoint:
+    """A SharePoint folder that records every download and upload."""
+
+    def __init__(self, files: dict[str, bytes] | None = None):
+        self.files = dict(files or {})
+        self.downloads = 0
+        self.uploads = 0
+
+    def fetch_file_using_open_binary(self, file_name, folder_name):
+        """The content of a file, or None if it does not exist."""
+
+        assert folder_name == FOLDER
+
+        self.downloads += 1
+
+        return self.files.get(file_name)
+
+    def upload_file_from_bytes(self, binary_content, file_name, folder_name):
+        """Store a file, replacing it if it exists."""
+
+        assert folder_name == FOLDER
+
+        self.uploads += 1
+        self.files[file_name] = binary_content
+
+
+def workbook_bytes(rows: list[list], sheet_name: str = "Besvarelser") -> bytes:
+    """A plain workbook file holding the rows, the first row being the header."""
+
+    workbook = Workbook()
+    workbook.active.title = sheet_name
+
+    for row in rows:
+        workbook.active.append(row)
+
+    with excel_writer.save_workbook(workbook) as workbook_file:
+        return workbook_file.read()
+
+
+def sheet_layout(content: bytes, sheet_name: str = "Besvarelser") -> dict:
+    """The values and the formatting of a sheet, in a form that can be compared."""
+
+    sheet = load_workbook(BytesIO(content))[sheet_name]
+
+    return {
+        "values": [list(row) for row in sheet.iter_rows(values_only=True)],
+        "bold": [[cell.font.b for cell in row] for row in sheet.iter_rows()],
+        "wrap": [[bool(cell.alignment.wrap_text) for cell in row] for row in sheet.iter_rows()],
+        "alignment": {(cell.alignment.horizontal, cell.alignment.vertical) for row in sheet.iter_rows() for cell in row},
+        "widths": {letter: dimension.width for letter, dimension in sheet.column_dimensions.items()},
+        "heights": [sheet.row_dimensions[row_number].height for row_number in range(1, sheet.max_row + 1)],
+        "freeze_panes": sheet.freeze_panes,
+    }
+
+
+def test_merge_sorted_rows_orders_column_a_as_text_descending():
+    """New rows are merged into sorted existing rows by column A as text - "9" sorts above "10" - with column A stored as text."""
+
+    existing = [["9", "a"], ["5", "b"], ["10", "c"]]
+    new = [[7, "d"], [11, "e"], [5, "f"]]
+
+    rows = workbook_update.merge_sorted_rows(existing, new)
+
+    assert [row[0] for row in rows] == ["9", "7", "5", "5", "11", "10"]
+    assert all(isinstance(row[0], str) for row in rows)
+
+    # Duplicates are kept, existing rows first
+    assert [row[1] for row in rows if row[0] == "5"] == ["b", "f"]
+
+
+def test_merge_sorted_rows_sorts_an_unsorted_sheet_in_full():
+    """A sheet that is out of order, or holds numbers in column A, is sorted with the new rows instead of merged."""
+
+    existing = [[1, "a"], ["3", "b"], [2, "c"]]
+
+    rows = workbook_update.merge_sorted_rows(existing, [["4", "d"]])
+
+    assert rows == [["4", "d"], ["3", "b"], ["2", "c"], ["1", "a"]]
+
+
+def test_read_sheet_skips_empty_rows():
+    """Rows where every cell is empty - left behind by deleted submissions - are not read."""
+
+    sheet = load_workbook(BytesIO(workbook_bytes([["Serial number", "Svar"], ["2", "Ja"], [None, None], ["1", None]]))).active
+
+    header, rows = workbook_update.read_sheet(sheet)
+
+    assert header == ["Serial number", "Svar"]
+    assert rows == [["2", "Ja"], ["1", None]]
+
+
+def test_write_sheet_formats_header_widths_and_wrapping():
+    """The header is bold, columns are sized to their content up to the cap, and wider columns are wrapped with taller rows."""
+
+    sheet = Workbook().active
+
+    workbook_update.write_sheet(sheet, ["Serial number", "Svar"], [["1", "x" * 300], ["2", "Nej"]], column_width_cap=100, freeze_panes="A2")
+
+    assert [cell.font.b for cell in sheet[1]] == [True, True]
+    assert [cell.font.b for cell in sheet[2]] == [False, False]
+    assert sheet.column_dimensions["A"].width == len("Serial number") + 2
+    assert sheet.column_dimensions["B"].width == 100
+    assert [cell.alignment.wrap_text for cell in sheet[2]] == [False, True]
+    assert sheet.row_dimensions[2].height == 60
+    assert sheet.row_dimensions[3].height == 20
+    assert sheet.freeze_panes == "A2"
+
+
+def test_update_workbook_adds_rows_and_drops_purged_rows_in_one_round_trip():
+    """New rows are merged in order, empty rows are removed, and the workbook is downloaded and uploaded once."""
+
+    sharepoint_api = FakeSharepoint({FILE_NAME: workbook_bytes([["Serial number", "Svar"], ["3", "Ja"], [None, None], ["1", "Nej"], [None, None]])})
+
+    row_count = workbook_update.update_workbook(sharepoint_api, FOLDER, FILE_NAME, "Besvarelser", [{"Serial number": 2, "Svar": "Måske"}, {"Serial number": 4}])
+
+    assert row_count == 4
+    assert (sharepoint_api.downloads, sharepoint_api.uploads) == (1, 1)
+    assert sheet_layout(sharepoint_api.files[FILE_NAME])["values"] == [["Serial number", "Svar"], ["4", None], ["3", "Ja"], ["2", "Måske"], ["1", "Nej"]]
+
+
+def test_write_workbook_matches_writing_then_updating():
+    """The new workbook is sorted and formatted like writing it and then running update_workbook on it."""
+
+    rows = [{"Serial number": serial, "Svar": "lang " * serial, "Gennemført": f"2025-03-{serial:02d} 12:00:00"} for serial in (3, 12, 25, 1)]
+
+    sharepoint_api = FakeSharepoint()
+
+    excel_writer.upload_workbook(sharepoint_api, excel_writer.write_workbook(iter(rows)), file_name=FILE_NAME, folder_name=FOLDER)
+    workbook_update.update_workbook(sharepoint_api, FOLDER, FILE_NAME, "Besvarelser", new_rows=[], column_width_cap=40)
+
+    with workbook_update.write_workbook(iter(rows), "Besvarelser", column_width_cap=40) as workbook_file:
+        written = sheet_layout(workbook_file.read())
+
+    assert written == sheet_layout(sharepoint_api.files[FILE_NAME])
+    assert [row[0] for row in written["values"][1:]] == ["3", "25", "12", "1"]
+    assert written["bold"][0] == [True, True, True]
+
+
+def test_write_workbook_without_rows_gives_an_empty_sheet():
+    """An empty input gives an empty sheet, like the streaming writer."""
+
+    with workbook_update.write_workbook(iter([]), "Besvarelser") as workbook_file:
+        assert sheet_layout(workbook_file.read())["values"] == []